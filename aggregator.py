@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Edge aggregator for a hierarchical federation.
+
+Every client connecting straight to ``server.py`` makes one process handle
+the whole fan-in. An aggregator sits in between: it is a Flower server on
+its own port for a subset of the clients, and a single Flower client of the
+root server. When the root asks it to fit, it runs the round on its clients,
+folds their updates into a running weighted mean as they arrive (see
+``strategy.StreamingFedAvg``) and sends the root one partial aggregate whose
+example count is the total of its clients', so the root's weighted average
+is the same as if it had seen every client. The root then handles
+O(aggregators) updates per round instead of O(clients).
+
+    python server.py --num-clients 2 --min-fit-clients 2 --data-clients 4
+    python aggregator.py --index 0 --port 8082 --num-clients 2
+    python aggregator.py --index 1 --port 8083 --num-clients 2
+    python client_sim.py --server localhost:8082 --first-client 0 --total-clients 4
+    python client_sim.py --server localhost:8083 --first-client 2 --total-clients 4
+
+or all of it at once with ``python run_hierarchy.py``. Server optimizers,
+checkpoints and centralized evaluation stay on the root; an aggregator only
+averages. The partial aggregate is encoded with the codec the root asks for,
+and the clients below use the aggregator's own ``--codec``. It reports its
+largest client epsilon upwards, so a root ``--max-epsilon`` drops a whole
+aggregator, while ``--max-epsilon`` here drops single clients. A round in
+which none of its clients returns a result (all out of budget, or none done
+by ``--round-deadline``) fails upstream: the aggregator drops its connection,
+so the root counts it among the round's failures, and then reconnects.
+"""
+
+import argparse
+import threading
+import time
+
+import flwr as fl
+from flwr.common import (
+    Code, EvaluateRes, FitRes, GetParametersRes, Status, ndarrays_to_parameters,
+)
+
+from codec import CODECS, make_codec
+from launch import EDGE_PORT, SERVER_PORT
+from scheduler import ScheduledClientManager
+from servers import EdgeServer
+from strategy import StreamingFedAvg, parameters_vector
+from telemetry import get_telemetry
+
+
+def weighted_accuracy(metrics):
+    """Example-weighted mean of the clients' evaluation accuracy."""
+    metrics = [(n, m["accuracy"]) for n, m in metrics if "accuracy" in m]
+    total = sum(n for n, _ in metrics)
+    return {"accuracy": sum(n * a for n, a in metrics) / total} if total else {}
+
+
+class EdgeRoundError(RuntimeError):
+    """An edge round ended without a single client result."""
+
+
+class EdgeClient(fl.client.Client):
+    """The aggregator as seen by the root: every call becomes a request to ``server``."""
+
+    def __init__(self, index, server):
+        self.index = index
+        self.name = f"edge-{index}"
+        self.server = server
+        # One codec per spec, so error-feedback state persists across rounds
+        self.codecs = {}
+
+    def get_parameters(self, ins):
+        parameters = self.server.submit("get_parameters", None, ins.config).result()
+        return GetParametersRes(status=Status(Code.OK, ""), parameters=parameters)
+
+    def fit(self, ins):
+        start = time.perf_counter()
+        result = self.server.submit("fit", ins.parameters, ins.config).result()
+        if result is None:
+            raise EdgeRoundError(f"no client results to fit round {ins.config.get('server_round')}")
+        aggregate, num_examples, metrics = result
+        fit_time = time.perf_counter() - start
+
+        encode_start = time.perf_counter()
+        spec = ins.config.get("codec", "none")
+        if spec != "none":
+            if spec not in self.codecs:
+                self.codecs[spec] = make_codec(spec)
+            aggregate = ndarrays_to_parameters(self.codecs[spec].encode(
+                parameters_vector(aggregate), parameters_vector(ins.parameters)))
+        metrics.update(client_id=self.name, fit_time=fit_time,
+                       serialize_time=time.perf_counter() - encode_start)
+        if self.server.strategy.privacy.epsilons:
+            metrics["epsilon"] = max(self.server.strategy.privacy.epsilons.values())
+        print(f"[Edge {self.index}] Round {ins.config.get('server_round')}: forwarded the "
+              f"average of {metrics.get('clients', 0)} clients ({num_examples} examples)")
+        return FitRes(status=Status(Code.OK, ""), parameters=aggregate,
+                      num_examples=num_examples, metrics=metrics)
+
+    def evaluate(self, ins):
+        result = self.server.submit("evaluate", ins.parameters, ins.config).result()
+        if result is None:
+            raise EdgeRoundError(f"no client results to evaluate round {ins.config.get('server_round')}")
+        loss, num_examples, metrics = result
+        return EvaluateRes(status=Status(Code.OK, ""), loss=float(loss),
+                           num_examples=num_examples, metrics=metrics)
+
+
+def connect_upstream(address, client, server):
+    """Serve the root on this thread; the edge loop ends once the root hangs up."""
+    try:
+        while True:
+            print(f"[Edge {client.index}] Connecting to the root server at {address}...")
+            try:
+                fl.client.start_client(server_address=address, client=client)
+            except EdgeRoundError as e:
+                # The dropped connection is the root's failure for this round
+                print(f"[Edge {client.index}] {e}; reconnecting")
+                continue
+            print(f"[Edge {client.index}] Root server closed the connection")
+            break
+    except Exception as e:
+        print(f"[Edge {client.index}] Error: {e}")
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Edge aggregator between clients and server.py.")
+    parser.add_argument("--index", type=int, default=0, help="Aggregator number, used in logs")
+    parser.add_argument("--port", type=int, default=EDGE_PORT,
+                        help="Port the clients of this aggregator connect to")
+    parser.add_argument("--server", default=f"localhost:{SERVER_PORT}",
+                        help="Address of the root server")
+    parser.add_argument("--num-clients", type=int, default=2,
+                        help="Clients behind this aggregator; rounds start once they are connected")
+    parser.add_argument("--fraction-fit", type=float, default=1.0,
+                        help="Fraction of this aggregator's clients sampled for each round")
+    parser.add_argument("--codec", default="none",
+                        help=f"Compression for the clients' updates: {', '.join(CODECS)}")
+    parser.add_argument("--max-epsilon", type=float, default=None,
+                        help="Stop sampling clients once their reported epsilon reaches this budget")
+    parser.add_argument("--round-deadline", type=float, default=None,
+                        help="Forward the updates so far after this many seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for cohort sampling")
+    args = parser.parse_args()
+
+    # The root decides when clients evaluate, so serve every evaluate request
+    strategy = StreamingFedAvg(
+        codec=args.codec,
+        max_epsilon=args.max_epsilon,
+        evaluate_every=1,
+        fraction_fit=args.fraction_fit,
+        fraction_evaluate=1.0,
+        min_fit_clients=1,
+        min_evaluate_clients=1,
+        min_available_clients=args.num_clients,
+        evaluate_metrics_aggregation_fn=weighted_accuracy,
+    )
+    server = EdgeServer(client_manager=ScheduledClientManager(seed=args.seed), strategy=strategy,
+                        round_deadline=args.round_deadline, telemetry=get_telemetry(f"aggregator_{args.index}"))
+
+    upstream = threading.Thread(target=connect_upstream,
+                                args=(args.server, EdgeClient(args.index, server), server), daemon=True)
+    upstream.start()
+
+    print(f"[Edge {args.index}] Serving {args.num_clients} clients on 0.0.0.0:{args.port}")
+    fl.server.start_server(
+        server_address=f"0.0.0.0:{args.port}",
+        config=fl.server.ServerConfig(num_rounds=1),
+        server=server,
+        strategy=strategy,
+    )
+    upstream.join(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark DP training: microbatch-looped vs vectorized per-example gradients.
+
+Times local training (the same epochs and batch size as a client) for each
+available implementation on the same data and prints the speedup over the
+original ``DPKerasAdamOptimizer``. Keras models are timed both through
+``model.fit`` and through the compiled local-training loop (trainer.py).
+Keras rows are skipped when TensorFlow or tensorflow-privacy is not installed.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from models import (
+    HIDDEN_UNITS, INPUT_DIM, L2_NORM_CLIP, LEARNING_RATE, NOISE_MULTIPLIER, NUM_MICROBATCHES,
+    KerasAdapter, create_keras_model,
+)
+from numpy_mlp import NumpyMLP
+
+
+def _keras_available():
+    try:
+        import tensorflow  # noqa: F401
+        import tensorflow_privacy  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def time_fit(model, X, y, epochs, batch_size, repeats, trainer="fit"):
+    train = model.train if isinstance(model, NumpyMLP) else KerasAdapter(model, trainer).train
+    # Warm-up call absorbs graph tracing and first-call allocation
+    train(X, y, epochs, batch_size)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        train(X, y, epochs, batch_size)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4096,
+                        help="Training rows (a multiple of the batch size)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=NUM_MICROBATCHES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, INPUT_DIM)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] > 0).astype(np.float32)
+
+    candidates = []
+    if _keras_available():
+        candidates += [
+            ("keras-dp-microbatch", lambda: create_keras_model(HIDDEN_UNITS, dp=True, dp_mode="microbatch"), "fit"),
+            ("keras-dp-vectorized", lambda: create_keras_model(HIDDEN_UNITS, dp=True, dp_mode="vectorized"), "fit"),
+            ("keras-dp-vec compiled", lambda: create_keras_model(HIDDEN_UNITS, dp=True, dp_mode="vectorized"), "compiled"),
+            ("keras-adam (no DP)", lambda: create_keras_model(HIDDEN_UNITS, dp=False), "fit"),
+            ("keras-adam compiled", lambda: create_keras_model(HIDDEN_UNITS, dp=False), "compiled"),
+        ]
+    else:
+        print("TensorFlow / tensorflow-privacy not installed: skipping Keras rows\n")
+    candidates += [
+        ("numpy-dp-vectorized", lambda: NumpyMLP(INPUT_DIM, HIDDEN_UNITS, LEARNING_RATE, seed=0,
+                                                 l2_norm_clip=L2_NORM_CLIP,
+                                                 noise_multiplier=NOISE_MULTIPLIER), None),
+        ("numpy-adam (no DP)", lambda: NumpyMLP(INPUT_DIM, HIDDEN_UNITS, LEARNING_RATE, seed=0), None),
+    ]
+
+    results = {}
+    for name, build, trainer in candidates:
+        results[name] = time_fit(build(), X, y, args.epochs, args.batch_size, args.repeats, trainer)
+
+    baseline = results.get("keras-dp-microbatch")
+    print(f"{'implementation':<24}{'seconds':>10}{'examples/s':>14}{'speedup':>10}")
+    print("-" * 58)
+    for name, seconds in results.items():
+        speedup = f"{baseline / seconds:.1f}x" if baseline else "-"
+        print(f"{name:<24}{seconds:>10.3f}{args.rows * args.epochs / seconds:>14.0f}{speedup:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": args.rows, "epochs": args.epochs, "batch_size": args.batch_size,
+                       "seconds": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
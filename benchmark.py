@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Federated training benchmark suite.
+
+Sweeps client count, model width, local epochs, batch size, DP on/off and
+model backend, and for every configuration measures rounds/s, training
+samples/s, peak RSS and the time (and rounds) to reach a target accuracy.
+Two stacks can be benchmarked:
+
+- ``inproc``: the in-process FedAvg simulation (simulation.py), which runs
+  the same models and weighted averaging as the Flower server
+- ``flower``: server.py and client_sim.py over gRPC on localhost; only the
+  client count and backend vary, the rest is fixed by client_sim.py; the
+  server start-up latency (until its port accepts connections) is reported too
+
+Every configuration runs ``--repeats`` times, each in a fresh subprocess so
+its peak RSS is its own, and the fastest run is kept. Models are seeded.
+Data is a synthetic CSV in the UCI layout, generated locally with a fixed
+seed (``--data real`` uses ``FL_DATA_PATH``/the cached UCI data instead), so
+the suite runs offline. ``--save-baseline`` stores the results as JSON and
+``--check`` exits non-zero when a configuration regresses against it.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _csv_list(cast):
+    return lambda text: [cast(item) for item in text.split(",") if item]
+
+
+def _hidden_list(text):
+    return [tuple(int(u) for u in spec.split("x")) for spec in text.split(",") if spec]
+
+
+def synthetic_csv(path, rows, seed=0):
+    """Write a learnable heart-disease-like CSV (13 features, target 0-4) to ``path``."""
+    rng = np.random.default_rng(seed)
+    features = rng.normal(50.0, 10.0, (rows, 13))
+    weights = rng.normal(0.0, 1.0, 13)
+    logits = (features - 50.0) @ weights / 10.0 + rng.normal(0.0, 0.5, rows)
+    target = np.where(logits > 0, rng.integers(1, 5, rows), 0)
+    table = np.column_stack([np.round(features, 1), target])
+    tmp = f"{path}.tmp"
+    np.savetxt(tmp, table, delimiter=",", fmt=["%.1f"] * 13 + ["%d"])
+    os.replace(tmp, path)
+    return path
+
+
+def config_key(config):
+    hidden = "x".join(str(u) for u in config["hidden_units"])
+    key = (f"{config['stack']}/{config['backend']}/clients={config['clients']}/hidden={hidden}/"
+           f"epochs={config['epochs']}/batch={config['batch_size']}/dp={'on' if config['dp'] else 'off'}")
+    # Only non-default axes are part of the key, so older baselines still match
+    if config.get("partition", "iid") != "iid":
+        key += f"/partition={config['partition']}"
+    if config.get("server_opt", "none") != "none":
+        key += f"/opt={config['server_opt']}"
+    return key
+
+
+def build_configs(args):
+    from client_sim import CLIENT_EPOCHS
+    from models import HIDDEN_UNITS
+
+    configs = {}
+    for stack, backend, clients, hidden, epochs, batch_size, dp, server_opt in itertools.product(
+            args.stacks, args.backends, args.clients, args.hidden, args.epochs, args.batch_sizes,
+            args.dp, args.server_opts):
+        if stack == "flower":
+            # client_sim.py fixes everything but the client count and backend
+            hidden, epochs, batch_size, dp = tuple(HIDDEN_UNITS), CLIENT_EPOCHS, 32, True
+        config = {"stack": stack, "backend": backend, "clients": clients,
+                  "hidden_units": list(hidden), "epochs": epochs, "batch_size": batch_size,
+                  "dp": dp, "rounds": args.rounds, "target": args.target, "seed": args.seed,
+                  "workers": args.workers, "partition": args.partition, "server_opt": server_opt}
+        configs[config_key(config)] = config
+    return list(configs.values())
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / 2 ** 20
+
+
+def _to_target(accuracies, times, target):
+    for round_num, (accuracy, elapsed) in enumerate(zip(accuracies, times), 1):
+        if accuracy >= target:
+            return elapsed, round_num
+    return None, None
+
+
+def run_inproc(config):
+    from functools import partial
+
+    from executor import ProcessPoolClientExecutor
+    from simulation import Simulation, build_flat_model
+
+    executor = ProcessPoolClientExecutor(config["workers"]) if config["workers"] > 0 else None
+    model_fn = partial(build_flat_model, config["backend"], tuple(config["hidden_units"]),
+                       config["dp"], config["seed"])
+    plan = None
+    if config["partition"] != "iid":
+        from dataset import get_loader
+        from partitioner import build_plan
+        _, y = get_loader().arrays()
+        plan = build_plan(config["partition"], y, config["clients"], seed=config["seed"])
+    sim = Simulation(config["clients"], model_fn, config["epochs"], config["batch_size"],
+                     seed=config["seed"], plan=plan, executor=executor,
+                     server_opt=config["server_opt"])
+    try:
+        start = time.perf_counter()
+        history = sim.run(config["rounds"], verbose=False)
+        total = time.perf_counter() - start
+        samples = int(sim.num_train.sum()) * config["epochs"] * len(history)
+    finally:
+        sim.close()
+    elapsed = list(itertools.accumulate(r["wall_time"] for r in history))
+    return total, samples, [r["accuracy"] for r in history], elapsed, None
+
+
+def run_flower(config):
+    from launch import SERVER_PORT, wait_for_port
+    from telemetry import read_events
+
+    telemetry_dir = tempfile.mkdtemp(prefix="fl_bench_")
+    env = dict(os.environ, FL_TELEMETRY_DIR=telemetry_dir)
+    n = str(config["clients"])
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "server.py"), "--num-clients", n,
+         "--min-fit-clients", n, "--checkpoint-every", "0", "--server-opt", config["server_opt"]],
+        env=env, cwd=telemetry_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_for_port(SERVER_PORT, timeout=60, process=server)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(HERE, "client_sim.py"), "--num-clients", n],
+                       env=env, cwd=telemetry_dir, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        total = time.perf_counter() - start
+        server.wait(timeout=60)
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+    events = read_events(telemetry_dir)
+    rounds = [e for e in events if e["event"] == "round"]
+    samples = sum(e["num_examples"] * config["epochs"] for e in events if e["event"] == "fit")
+    first = min((e["time"] for e in events), default=0.0)
+    return (total, samples, [e.get("accuracy") or 0.0 for e in rounds],
+            [e["time"] - first for e in rounds], startup)
+
+
+def run_config(config):
+    """Run one configuration in this process and return its measurements."""
+    run = run_flower if config["stack"] == "flower" else run_inproc
+    total, samples, accuracies, elapsed, startup = run(config)
+    time_to_target, rounds_to_target = _to_target(accuracies, elapsed, config["target"])
+    return {
+        "rounds": len(accuracies),
+        "rounds_per_sec": len(accuracies) / total,
+        "samples_per_sec": samples / total,
+        "peak_rss_mb": _peak_rss_mb(),
+        "time_to_target": time_to_target,
+        "rounds_to_target": rounds_to_target,
+        "final_accuracy": accuracies[-1] if accuracies else None,
+        "startup_latency": startup,
+    }
+
+
+def run_isolated(config, env):
+    """Run ``config`` in a fresh interpreter; returns its result or an ``error`` entry."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-config", json.dumps(config)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def backend_available(backend):
+    if backend != "keras":
+        return True
+    try:
+        import tensorflow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against ``baseline`` as printable strings."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append(f"{key}: failed ({result['error']})")
+            continue
+        for metric in ("rounds_per_sec", "samples_per_sec"):
+            if result[metric] < base[metric] * (1 - tolerance):
+                regressions.append(f"{key}: {metric} {result[metric]:.1f} < baseline {base[metric]:.1f}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak_rss_mb {result['peak_rss_mb']:.0f} > baseline "
+                               f"{base['peak_rss_mb']:.0f}")
+        if base["rounds_to_target"] is not None and (
+                result["rounds_to_target"] is None
+                or result["rounds_to_target"] > base["rounds_to_target"] * (1 + tolerance)):
+            regressions.append(f"{key}: rounds_to_target {result['rounds_to_target']} vs baseline "
+                               f"{base['rounds_to_target']}")
+    return regressions
+
+
+def server_opt_summary(results):
+    """Rounds to the target accuracy of every server optimizer next to plain FedAvg."""
+    lines = []
+    for key, result in results.items():
+        if "/opt=" not in key or "error" in result:
+            continue
+        base_key, opt = key.rsplit("/opt=", 1)
+        base = results.get(base_key)
+        if base is None or "error" in base:
+            continue
+
+        def rounds(r):
+            return r["rounds_to_target"] if r["rounds_to_target"] else f">{r['rounds']}"
+
+        lines.append(f"{base_key}: fedavg {rounds(base)}, {opt} {rounds(result)} rounds "
+                     f"(final accuracy {base['final_accuracy']:.4f} vs {result['final_accuracy']:.4f})")
+    return lines
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stacks", type=_csv_list(str), default=["inproc"],
+                        help="Comma-separated: inproc, flower")
+    parser.add_argument("--backends", type=_csv_list(str), default=["numpy"],
+                        help="Comma-separated: numpy, keras (skipped without TensorFlow)")
+    parser.add_argument("--clients", type=_csv_list(int), default=[2, 8, 32])
+    parser.add_argument("--hidden", type=_hidden_list, default=[(16, 8), (64, 32)],
+                        help="Comma-separated layer widths, e.g. 16x8,64x32")
+    parser.add_argument("--epochs", type=_csv_list(int), default=[1, 3])
+    parser.add_argument("--batch-sizes", type=_csv_list(int), default=[32])
+    parser.add_argument("--dp", type=_csv_list(lambda v: v == "on"), default=[True, False],
+                        help="Comma-separated: on, off")
+    parser.add_argument("--server-opts", type=_csv_list(str), default=["none"],
+                        help="Comma-separated server optimizers: none (FedAvg), avgm, adam, yogi")
+    parser.add_argument("--partition", default="iid",
+                        help="inproc: client partition (iid, dirichlet, quantity, feature_shift)")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--target", type=float, default=0.8, help="Target accuracy")
+    parser.add_argument("--workers", type=int, default=0, help="inproc: worker processes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Runs per configuration; the fastest is kept")
+    parser.add_argument("--data", choices=("synthetic", "real"), default="synthetic")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows of synthetic data")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--save-baseline", help="Write the results as the baseline to this file")
+    parser.add_argument("--check", help="Compare against this baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown/growth before --check fails")
+    parser.add_argument("--run-config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config))))
+        return 0
+
+    env = dict(os.environ, FL_TELEMETRY_DIR="")
+    if args.data == "synthetic":
+        cache_dir = os.path.join(HERE, ".data_cache", "benchmark")
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"synthetic_{args.rows}_{args.seed}.csv")
+        if not os.path.exists(path):
+            synthetic_csv(path, args.rows, args.seed)
+        env.update(FL_DATA_PATH=path, FL_DATA_CACHE=cache_dir)
+    # Build the preprocessed cache up front so no configuration pays for pandas
+    from dataset import load_dataset
+    load_dataset(env.get("FL_DATA_PATH"), env.get("FL_DATA_CACHE"))
+
+    results = {}
+    for config in build_configs(args):
+        key = config_key(config)
+        if not backend_available(config["backend"]):
+            print(f"{key}: skipped (TensorFlow not installed)")
+            continue
+        env["FL_MODEL_BACKEND"] = config["backend"]
+        runs = [run_isolated(config, env) for _ in range(args.repeats)]
+        ok = [run for run in runs if "error" not in run]
+        result = results[key] = max(ok, key=lambda r: r["rounds_per_sec"]) if ok else runs[0]
+        if "error" in result:
+            print(f"{key}: ERROR {result['error']}")
+            continue
+        to_target = (f"{result['time_to_target']:.2f}s/{result['rounds_to_target']} rounds"
+                     if result["rounds_to_target"] else "not reached")
+        print(f"{key}: {result['rounds_per_sec']:.2f} rounds/s, "
+              f"{result['samples_per_sec']:.0f} samples/s, {result['peak_rss_mb']:.0f} MiB peak, "
+              f"target {to_target}, final accuracy {result['final_accuracy']:.4f}"
+              + (f", server up in {result['startup_latency']:.2f}s"
+                 if result.get("startup_latency") is not None else ""))
+
+    summary = server_opt_summary(results)
+    if summary:
+        print(f"\nRounds to {args.target:.0%} accuracy, server optimizers vs FedAvg:")
+        for line in summary:
+            print(f"  {line}")
+
+    report = {"environment": environment(), "data": args.data, "rows": args.rows,
+              "results": results}
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.check}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.check} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
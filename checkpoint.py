@@ -0,0 +1,151 @@
+"""
+Checkpoints of the server state.
+
+A checkpoint is a directory ``round_<NNNNN>_<stamp>/`` holding the flat
+global weights and any array-valued strategy state as ``.npy`` files, which
+are memory-mapped on load, plus ``meta.json`` with the round number, the
+scalar strategy state and the metrics history. It is written into a scratch
+directory and renamed to a name no other checkpoint uses, then the
+``LATEST`` file is atomically replaced to point at it, and only then are
+older checkpoints pruned. A crash at any moment leaves ``LATEST`` pointing at
+a complete checkpoint.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+CHECKPOINT_DIR = os.environ.get("FL_CHECKPOINT_DIR", "checkpoints")
+LATEST = "LATEST"
+
+
+def _json_value(value):
+    # Metrics may hold NumPy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def history_to_dict(history):
+    """Plain-JSON form of a Flower ``History``."""
+    return {
+        "losses_distributed": [[r, _json_value(v)] for r, v in history.losses_distributed],
+        "losses_centralized": [[r, _json_value(v)] for r, v in history.losses_centralized],
+        **{
+            name: {key: [[r, _json_value(v)] for r, v in values]
+                   for key, values in getattr(history, name).items()}
+            for name in ("metrics_distributed_fit", "metrics_distributed", "metrics_centralized")
+        },
+    }
+
+
+def history_from_dict(data):
+    """Rebuild a Flower ``History`` saved with ``history_to_dict``."""
+    from flwr.server import History
+
+    history = History()
+    history.losses_distributed = [tuple(entry) for entry in data["losses_distributed"]]
+    history.losses_centralized = [tuple(entry) for entry in data["losses_centralized"]]
+    for name in ("metrics_distributed_fit", "metrics_distributed", "metrics_centralized"):
+        setattr(history, name, {key: [tuple(entry) for entry in values]
+                                for key, values in data[name].items()})
+    return history
+
+
+class Checkpoint:
+    """A loaded checkpoint; ``weights`` and ``arrays`` are memory-mapped."""
+
+    def __init__(self, path, mmap_mode="r"):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.server_round = meta["round"]
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode=mmap_mode)
+        self.state = meta["state"]
+        for name in meta["arrays"]:
+            self.state[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        self.history = meta["history"]
+        self.created = meta["created"]
+
+
+class CheckpointManager:
+    """Write a checkpoint every ``every`` rounds, keeping the newest ``keep``."""
+
+    def __init__(self, directory=None, every=1, keep=3):
+        self.directory = directory or CHECKPOINT_DIR
+        self.every = every
+        self.keep = keep
+        # Round of the newest checkpoint written or loaded, so it is not written twice
+        self.last_saved = None
+
+    def _round_dir(self, server_round):
+        # Unique, so an existing checkpoint of the same round is never replaced in place
+        return os.path.join(self.directory, f"round_{server_round:05d}_{time.time_ns():x}")
+
+    def save(self, server_round, weights, state, history):
+        """Snapshot the global ``weights``, the strategy ``state`` dict and the ``history``."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp_")
+        np.save(os.path.join(tmp, "weights.npy"), np.asarray(weights, dtype=np.float32))
+        arrays = [name for name, value in state.items() if isinstance(value, np.ndarray)]
+        for name in arrays:
+            np.save(os.path.join(tmp, f"{name}.npy"), state[name])
+        meta = {
+            "round": server_round,
+            "created": time.time(),
+            "arrays": arrays,
+            "state": {name: _json_value(value) for name, value in state.items()
+                      if name not in arrays},
+            "history": history_to_dict(history),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        target = self._round_dir(server_round)
+        os.rename(tmp, target)
+        pointer = os.path.join(self.directory, f".{LATEST}.tmp")
+        with open(pointer, "w") as f:
+            f.write(os.path.basename(target))
+        os.replace(pointer, os.path.join(self.directory, LATEST))
+        self.last_saved = server_round
+        self._prune(target)
+        return target
+
+    def maybe_save(self, server_round, weights, state, history, final=False):
+        if server_round == self.last_saved:
+            return None
+        if self.every > 0 and (final or server_round % self.every == 0):
+            return self.save(server_round, weights, state, history)
+        return None
+
+    def _prune(self, current):
+        """Delete older checkpoints of ``current``'s round and all but the newest ``keep``."""
+        current = os.path.basename(current)
+        round_prefix = current.rsplit("_", 1)[0]
+        older = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("round_") and name != current)
+        superseded = [name for name in older if name.rsplit("_", 1)[0] == round_prefix]
+        older = [name for name in older if name not in superseded]
+        stale = older[:max(0, len(older) - (self.keep - 1))] if self.keep > 0 else []
+        for name in superseded + stale:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def latest(self):
+        """Path of the newest complete checkpoint, or None."""
+        try:
+            with open(os.path.join(self.directory, LATEST)) as f:
+                path = os.path.join(self.directory, f.read().strip())
+        except FileNotFoundError:
+            return None
+        return path if os.path.exists(os.path.join(path, "meta.json")) else None
+
+    def load(self, mmap_mode="r"):
+        """Load the newest checkpoint (memory-mapped), or return None if there is none."""
+        path = self.latest()
+        if path is None:
+            return None
+        checkpoint = Checkpoint(path, mmap_mode)
+        self.last_saved = checkpoint.server_round
+        return checkpoint
@@ -1,39 +1,66 @@
 # client.py
+import time
+
 import flwr as fl
-import tensorflow as tf
+from codec import make_codec
 from dataset import load_data
+from models import WeightSync, as_flat_model, create_model as _create_model
+from params import to_flat
+from telemetry import get_telemetry
 
 # Set this for each client (0, 1, ...)
 CLIENT_ID = 1
 
 # Create MLP model
 def create_model():
-    model = tf.keras.models.Sequential([
-        tf.keras.layers.Dense(64, activation="relu", input_shape=(13,)),  # 13 features in dataset
-        tf.keras.layers.Dense(32, activation="relu"),
-        tf.keras.layers.Dense(1, activation="sigmoid")
-    ])
-    model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
-    return model
-
-# Load data for this client
-X_train, y_train, X_test, y_test = load_data(client_id=CLIENT_ID, num_clients=2)
-model = create_model()
+    # 13 features in dataset; backend chosen by FL_MODEL_BACKEND
+    return _create_model(hidden_units=(64, 32), dp=False)
 
 # Define Flower client
 class FlowerClient(fl.client.NumPyClient):
+    def __init__(self, client_id=CLIENT_ID, num_clients=2):
+        self.client_id = client_id
+        # Data and model are loaded here, not at import time
+        self.X_train, self.y_train, self.X_test, self.y_test = load_data(
+            client_id=client_id, num_clients=num_clients)
+        self.model = create_model()
+        # Weights travel as one flat float32 vector (see params.py), loaded in place;
+        # local epochs run through the backend's trainer (FL_TRAINER, see models.py)
+        self.flat_model = as_flat_model(self.model)
+        self.weights = WeightSync(self.flat_model)
+        # One codec per spec, so error-feedback state persists across rounds
+        self.codecs = {}
+        self.telemetry = get_telemetry("clients")
+
     def get_parameters(self, config=None):
-        return model.get_weights()
+        return [self.weights.get()]
 
     def fit(self, parameters, config):
-        model.set_weights(parameters)
-        model.fit(X_train, y_train, epochs=3, batch_size=32, verbose=0)
-        return model.get_weights(), len(X_train), {}
+        start = time.perf_counter()
+        reference = to_flat(parameters)
+        self.weights.load(reference, config)
+        loaded = time.perf_counter()
+        self.flat_model.train(self.X_train, self.y_train, 3, 32)
+        trained = time.perf_counter()
+        self.weights.modified()
+        spec = config.get("codec", "none")
+        if spec not in self.codecs:
+            self.codecs[spec] = make_codec(spec)
+        update = self.codecs[spec].encode(self.weights.get(), reference)
+        metrics = {"client_id": self.client_id, "deserialize_time": loaded - start,
+                   "fit_time": trained - loaded, "serialize_time": time.perf_counter() - trained}
+        self.telemetry.record("fit", round=config.get("server_round"),
+                              num_examples=len(self.X_train), **metrics)
+        return update, len(self.X_train), metrics
 
     def evaluate(self, parameters, config):
-        model.set_weights(parameters)
-        loss, accuracy = model.evaluate(X_test, y_test, verbose=0)
-        return loss, len(X_test), {"accuracy": accuracy}
+        start = time.perf_counter()
+        self.weights.load(parameters, config)
+        loss, accuracy = self.model.evaluate(self.X_test, self.y_test, verbose=0)
+        self.telemetry.record("evaluate", round=config.get("server_round"), client_id=self.client_id,
+                              evaluate_time=time.perf_counter() - start, loss=float(loss),
+                              accuracy=float(accuracy), num_examples=len(self.X_test))
+        return loss, len(self.X_test), {"accuracy": accuracy}
 
 # Start client
 if __name__ == "__main__":
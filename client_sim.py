@@ -1,83 +1,77 @@
 import flwr as fl
-import numpy as np
-import tensorflow as tf
+from codec import make_codec
 from dataset import load_data
+from launch import SERVER_PORT, wait_for_port
+from models import NOISE_MULTIPLIER, WeightSync, as_flat_model, create_model, is_dp_model
+from params import to_flat
+from privacy import RDPAccountant
+from report import save_metrics
+from telemetry import get_telemetry
 from threading import Thread
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
 import time
 
-# Import DP optimizer
-try:
-    from tensorflow_privacy.privacy.optimizers.dp_optimizer_keras import DPKerasAdamOptimizer
-    DP_AVAILABLE = True
-except ImportError:
-    try:
-        # Try alternative import path
-        from tensorflow_privacy.privacy.optimizers import dp_optimizer_keras
-        DPKerasAdamOptimizer = dp_optimizer_keras.DPKerasAdamOptimizer
-        DP_AVAILABLE = True
-    except ImportError:
-        print("Warning: tensorflow_privacy not available. Using standard Adam optimizer.")
-        DP_AVAILABLE = False
-
 NUM_CLIENTS = 2
+# Clients the data is partitioned over; more than NUM_CLIENTS when this process
+# runs one group of a larger federation (e.g. behind an aggregator.py)
+TOTAL_CLIENTS = NUM_CLIENTS
+FIRST_CLIENT = 0
+SERVER_ADDRESS = f"localhost:{SERVER_PORT}"
 CLIENT_EPOCHS = 3
 round_metrics = {i: [] for i in range(NUM_CLIENTS)}
-
-# DP Parameters
-L2_NORM_CLIP = 1.0
-NOISE_MULTIPLIER = 0.5
-NUM_MICROBATCHES = 32
-LEARNING_RATE = 0.001
-
-def create_model():
-    model = tf.keras.models.Sequential([
-        tf.keras.layers.Dense(16, activation='relu', input_shape=(13,)),
-        tf.keras.layers.Dense(8, activation='relu'),
-        tf.keras.layers.Dense(1, activation='sigmoid')
-    ])
-    
-    # Use DP optimizer if available
-    if DP_AVAILABLE:
-        optimizer = DPKerasAdamOptimizer(
-            l2_norm_clip=L2_NORM_CLIP,
-            noise_multiplier=NOISE_MULTIPLIER,
-            num_microbatches=NUM_MICROBATCHES,
-            learning_rate=LEARNING_RATE
-        )
-    else:
-        optimizer = tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE)
-    
-    model.compile(optimizer=optimizer, loss='binary_crossentropy', metrics=['accuracy'])
-    return model
+telemetry = get_telemetry("clients")
 
 # Flower client class remains the same
 class FlowerClient(fl.client.NumPyClient):
     def __init__(self, client_id):
         self.client_id = client_id
-        self.X_train, self.y_train, self.X_test, self.y_test = load_data(client_id, NUM_CLIENTS)
+        self.X_train, self.y_train, self.X_test, self.y_test = load_data(client_id, TOTAL_CLIENTS)
         self.model = create_model()
+        # Weights travel as one flat float32 vector (see params.py), loaded in place;
+        # local epochs run through the backend's trainer (FL_TRAINER, see models.py)
+        self.flat = as_flat_model(self.model)
+        self.weights = WeightSync(self.flat)
+        # One codec per spec, so error-feedback state persists across rounds
+        self.codecs = {}
+        # Privacy spent by this client so far, updated after every fit
+        self.accountant = RDPAccountant(NOISE_MULTIPLIER) if is_dp_model(self.model) else None
 
     def get_parameters(self, config=None):
-        return self.model.get_weights()
+        return [self.weights.get()]
 
     def fit(self, parameters, config):
-        self.model.set_weights(parameters)
-        history = self.model.fit(
-            self.X_train, self.y_train,
-            epochs=CLIENT_EPOCHS,
-            batch_size=32,
-            verbose=0
-        )
-        loss = history.history['loss'][-1]
+        start = time.perf_counter()
+        reference = to_flat(parameters)
+        self.weights.load(reference, config)
+        loaded = time.perf_counter()
+        loss = self.flat.train(self.X_train, self.y_train, CLIENT_EPOCHS, 32)
+        trained = time.perf_counter()
+        self.weights.modified()
         print(f"[Client {self.client_id}] Training loss: {loss:.4f}")
-        return self.model.get_weights(), len(self.X_train), {}
+        metrics = {"client_id": self.client_id}
+        if self.accountant is not None:
+            self.accountant.step_epochs(len(self.X_train), 32, CLIENT_EPOCHS)
+            metrics["epsilon"] = self.accountant.epsilon
+            print(f"[Client {self.client_id}] Privacy spent: epsilon = {metrics['epsilon']:.4f} "
+                  f"(delta = {self.accountant.delta:g})")
+        spec = config.get("codec", "none")
+        if spec not in self.codecs:
+            self.codecs[spec] = make_codec(spec)
+        encode_start = time.perf_counter()
+        update = self.codecs[spec].encode(self.weights.get(), reference)
+        # Timings travel back with the update so the server can split up the round trip
+        metrics.update(deserialize_time=loaded - start, fit_time=trained - loaded,
+                       serialize_time=time.perf_counter() - encode_start)
+        telemetry.record("fit", round=config.get("server_round"), loss=float(loss),
+                         num_examples=len(self.X_train), **metrics)
+        return update, len(self.X_train), metrics
 
     def evaluate(self, parameters, config):
-        self.model.set_weights(parameters)
+        start = time.perf_counter()
+        self.weights.load(parameters, config)
         loss, accuracy = self.model.evaluate(self.X_test, self.y_test, verbose=0)
+        telemetry.record("evaluate", round=config.get("server_round"), client_id=self.client_id,
+                         evaluate_time=time.perf_counter() - start, loss=float(loss),
+                         accuracy=float(accuracy), num_examples=len(self.X_test))
         print(f"[Client {self.client_id}] Evaluation loss: {loss:.4f}, Accuracy: {accuracy:.4f}")
         if self.client_id in round_metrics:
             round_metrics[self.client_id].append(accuracy)
@@ -87,24 +81,62 @@ def start_client(client_id):
     try:
         print(f"[Client {client_id}] Initializing...")
         client = FlowerClient(client_id)
-        print(f"[Client {client_id}] Connecting to server at localhost:8081...")
-        fl.client.start_numpy_client(server_address="localhost:8081", client=client)
+        print(f"[Client {client_id}] Connecting to server at {SERVER_ADDRESS}...")
+        fl.client.start_numpy_client(server_address=SERVER_ADDRESS, client=client)
         print(f"[Client {client_id}] Connection closed (training completed).")
     except Exception as e:
         print(f"[Client {client_id}] Error: {e}")
-        print(f"[Client {client_id}] Make sure the server is running on localhost:8081")
+        print(f"[Client {client_id}] Make sure the server is running on {SERVER_ADDRESS}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run simulated Flower clients.")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Run the whole FedAvg loop in-process instead of connecting to server.py")
+    parser.add_argument("--num-clients", type=int, default=NUM_CLIENTS)
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds to run with --simulate")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for local training with --simulate")
+    parser.add_argument("--server", default=SERVER_ADDRESS,
+                        help="Server (or aggregator.py) address to connect to")
+    parser.add_argument("--first-client", type=int, default=0,
+                        help="Id of this process's first client within the federation")
+    parser.add_argument("--total-clients", type=int, default=None,
+                        help="Clients the data is partitioned over (default: --num-clients)")
+    args = parser.parse_args()
+
+    if args.simulate:
+        from simulation import run_simulation
+        run_simulation(args.num_clients, args.rounds, CLIENT_EPOCHS, workers=args.workers)
+        raise SystemExit(0)
+
+    NUM_CLIENTS = args.num_clients
+    FIRST_CLIENT = args.first_client
+    TOTAL_CLIENTS = args.total_clients or FIRST_CLIENT + NUM_CLIENTS
+    SERVER_ADDRESS = args.server
+    client_ids = range(FIRST_CLIENT, FIRST_CLIENT + NUM_CLIENTS)
+    if client_ids[-1] >= TOTAL_CLIENTS:
+        parser.error(f"clients {client_ids[0]}-{client_ids[-1]} do not fit in "
+                     f"--total-clients {TOTAL_CLIENTS}")
+    round_metrics = {i: [] for i in client_ids}
+
     print(f"\n=== Starting {NUM_CLIENTS} clients for Federated Learning ===")
-    print("Make sure the server is running on localhost:8081")
-    print("Waiting a moment for server to be ready...\n")
+    print(f"Make sure the server is running on {SERVER_ADDRESS}")
+    print("Waiting for the server to accept connections...")
     
-    time.sleep(3)  # Give server time to start
+    try:
+        host, port = SERVER_ADDRESS.rsplit(":", 1)
+        waited = wait_for_port(int(port), host)
+    except TimeoutError as e:
+        print(f"ERROR: {e}")
+        raise SystemExit(1)
+    print(f"Server ready after {waited:.2f} seconds\n")
 
     threads = []
-    for i in range(NUM_CLIENTS):
+    for i in client_ids:
         t = Thread(target=start_client, args=(i,))
         t.start()
         threads.append(t)
@@ -112,7 +144,7 @@ if __name__ == "__main__":
     for t in threads:
         t.join()
     
-    # Plot client accuracies if available
+    # Summarize client accuracies; they are saved below for the report stage (report.py)
     print("\n" + "=" * 60)
     print("CLIENT ACCURACY SUMMARY")
     print("=" * 60)
@@ -128,24 +160,11 @@ if __name__ == "__main__":
             print(f"Client {client_id}: No metrics collected")
     
     if any(len(accuracies) > 0 for accuracies in round_metrics.values()):
-        plt.figure(figsize=(10, 6))
-        for client_id, accuracies in round_metrics.items():
-            if len(accuracies) > 0:
-                plt.plot(range(1, len(accuracies)+1), accuracies, marker='o', label=f'Client {client_id}', linewidth=2, markersize=8)
-        
-        plt.title("Federated Learning: Client Accuracy per Round (DP Enabled)", fontsize=14, fontweight='bold')
-        plt.xlabel("Round", fontsize=12)
-        plt.ylabel("Accuracy", fontsize=12)
-        plt.ylim(0, 1)
-        plt.grid(True, alpha=0.3)
-        plt.legend(fontsize=11)
-        plt.tight_layout()
-        plt.savefig("client_accuracy.png", dpi=300, bbox_inches='tight')
-        print("\n✓ Client accuracy plot saved as 'client_accuracy.png'")
-        try:
-            plt.show(block=False)
-        except:
-            pass
+        # Plots are rendered separately from the saved metrics (python report.py)
+        # One file per client group, merged again by report.py
+        name = "client" if FIRST_CLIENT == 0 else f"client_{FIRST_CLIENT}"
+        path = save_metrics(name, {"accuracies": round_metrics})
+        print(f"\n✓ Client metrics saved to '{path}' (render plots with: python report.py)")
     else:
         print("\n⚠ No accuracy metrics collected. Check if training completed successfully.")
         print("This may happen if clients couldn't connect to the server.")
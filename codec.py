@@ -0,0 +1,142 @@
+"""
+Codecs for the model updates clients send back to the server.
+
+Every codec turns a client's trained weights into the list of arrays that
+goes over the wire and back again, given the global weights the client
+started from (the "reference"):
+
+- ``none``: the full float32 weights (the default, no reference needed)
+- ``delta``: the float32 difference to the reference
+- ``q8`` / ``q4``: the difference, stochastically quantized to 8 or 4 bits
+  per value with a separate range for every block of values
+- ``topk:<fraction>``: the largest ``fraction`` of the difference by
+  magnitude, with error feedback (what is not sent is carried over to the
+  next round)
+
+The server tells clients which codec to use through the fit config, so both
+sides always agree.
+"""
+
+import numpy as np
+
+CODECS = ("none", "delta", "q8", "q4", "topk:<fraction>")
+
+
+def payload_bytes(arrays):
+    """Bytes of array data in an encoded update."""
+    return int(sum(a.nbytes for a in arrays))
+
+
+class IdentityCodec:
+    """Full float32 weights."""
+
+    name = "none"
+
+    def encode(self, weights, reference=None):
+        return [np.asarray(weights, dtype=np.float32)]
+
+    def decode(self, arrays, reference=None):
+        return arrays[0]
+
+
+class DeltaCodec:
+    """Float32 difference to the reference weights."""
+
+    name = "delta"
+
+    def encode(self, weights, reference):
+        return [np.subtract(weights, reference, dtype=np.float32)]
+
+    def decode(self, arrays, reference):
+        return reference + arrays[0]
+
+
+class QuantizedDeltaCodec:
+    """Blockwise stochastic quantization of the difference to the reference.
+
+    Values are rounded up or down at random in proportion to their distance
+    from the two neighbouring levels, so the decoded update is unbiased.
+    4-bit codes are packed two per byte.
+    """
+
+    def __init__(self, bits=8, block_size=256, seed=None):
+        if bits not in (4, 8):
+            raise ValueError(f"Only 4- and 8-bit quantization is supported, got {bits}")
+        self.bits = bits
+        self.block_size = block_size
+        self.name = f"q{bits}"
+        self.rng = np.random.default_rng(seed)
+
+    def _blocks(self, size):
+        return -(-size // self.block_size)
+
+    def encode(self, weights, reference):
+        delta = np.subtract(weights, reference, dtype=np.float32)
+        size = delta.size
+        num_blocks = self._blocks(size)
+        padded = np.zeros(num_blocks * self.block_size, dtype=np.float32)
+        padded[:size] = delta
+        blocks = padded.reshape(num_blocks, self.block_size)
+
+        levels = (1 << self.bits) - 1
+        low = blocks.min(axis=1)
+        scale = (blocks.max(axis=1) - low) / levels
+        scale[scale == 0] = 1.0
+        codes = (blocks - low[:, None]) / scale[:, None]
+        codes += self.rng.random(codes.shape, dtype=np.float32)
+        codes = np.clip(np.floor(codes), 0, levels).astype(np.uint8).ravel()
+        if self.bits == 4:
+            codes = codes[0::2] | (codes[1::2] << 4)
+        return [codes, low.astype(np.float32), scale.astype(np.float32)]
+
+    def decode(self, arrays, reference):
+        codes, low, scale = arrays
+        if self.bits == 4:
+            unpacked = np.empty(codes.size * 2, dtype=np.uint8)
+            unpacked[0::2] = codes & 0x0F
+            unpacked[1::2] = codes >> 4
+            codes = unpacked
+        blocks = codes.reshape(len(low), -1).astype(np.float32)
+        delta = (blocks * scale[:, None] + low[:, None]).ravel()[:reference.size]
+        return reference + delta
+
+
+class TopKDeltaCodec:
+    """Largest-magnitude entries of the difference, with error feedback."""
+
+    def __init__(self, fraction=0.01, error_feedback=True):
+        self.fraction = fraction
+        self.error_feedback = error_feedback
+        self.name = f"topk:{fraction:g}"
+        self._residual = None
+
+    def encode(self, weights, reference):
+        update = np.subtract(weights, reference, dtype=np.float32)
+        if self.error_feedback and self._residual is not None:
+            update += self._residual
+        k = max(1, int(np.ceil(self.fraction * update.size)))
+        indices = np.argpartition(np.abs(update), update.size - k)[update.size - k:]
+        values = update[indices]
+        if self.error_feedback:
+            update[indices] = 0.0
+            self._residual = update
+        return [indices.astype(np.uint32), values]
+
+    def decode(self, arrays, reference):
+        indices, values = arrays
+        out = np.array(reference, dtype=np.float32)
+        out[indices] += values
+        return out
+
+
+def make_codec(spec="none"):
+    """Build a codec from its name (see ``CODECS``)."""
+    if spec in (None, "", "none"):
+        return IdentityCodec()
+    if spec == "delta":
+        return DeltaCodec()
+    if spec in ("q8", "q4"):
+        return QuantizedDeltaCodec(bits=int(spec[1:]))
+    if spec.startswith("topk:"):
+        return TopKDeltaCodec(float(spec.split(":", 1)[1]))
+    raise ValueError(f"Unknown codec {spec!r}; expected one of {CODECS}")
@@ -1,8 +1,14 @@
 # dataset.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import urllib.request
+
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+
+from partitioner import PartitionPlan, iid_plan
 
 # Download the dataset from UCI
 url = "https://archive.ics.uci.edu/ml/machine-learning-databases/heart-disease/processed.cleveland.data"
@@ -11,33 +17,276 @@ url = "https://archive.ics.uci.edu/ml/machine-learning-databases/heart-disease/p
 columns = ["age","sex","cp","trestbps","chol","fbs","restecg","thalach",
            "exang","oldpeak","slope","ca","thal","target"]
 
-# Load dataset
-df = pd.read_csv(url, names=columns)
+# Local copy of the raw CSV (skips the download) and preprocessed cache location
+DATA_PATH = os.environ.get("FL_DATA_PATH")
+CACHE_DIR = os.environ.get(
+    "FL_DATA_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data_cache"),
+)
+# Saved partition plan (see partitioner.py) used instead of IID shards when set
+PLAN_PATH = os.environ.get("FL_PARTITION_PLAN")
+
+# Bump when the preprocessing below changes so stale bundles are not reused
+PIPELINE_VERSION = 1
+
+
+def _source_key(source):
+    """Key used to find a cached bundle without re-reading the source."""
+    if os.path.exists(source):
+        stat = os.stat(source)
+        return f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return source
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, "index.json"))
+
+
+def fetch_raw(source):
+    """Return the raw CSV bytes from a local path or URL."""
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    with urllib.request.urlopen(source, timeout=30) as response:
+        return response.read()
+
+
+def preprocess(raw):
+    """Run the cleaning and scaling pipeline on raw CSV bytes."""
+    import io
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    # Load dataset
+    df = pd.read_csv(io.BytesIO(raw), names=columns)
+
+    # Replace '?' with NaN and drop missing rows
+    df.replace('?', pd.NA, inplace=True)
+    df.dropna(inplace=True)
+
+    # Convert all columns to numeric
+    df = df.apply(pd.to_numeric)
+
+    # Split features and target
+    X = df.drop("target", axis=1).values
+    y = df["target"].apply(lambda x: 1 if x > 0 else 0).values  # binary classification
+
+    # Standardize features
+    scaler = StandardScaler()
+    X = scaler.fit_transform(X)
+
+    return X.astype(np.float32), y.astype(np.int8)
+
+
+def _bundle_dir(cache_dir, digest):
+    return os.path.join(cache_dir, f"heart_{digest[:16]}")
+
+
+def _load_bundle(bundle, mmap_mode):
+    X = np.load(os.path.join(bundle, "X.npy"), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(bundle, "y.npy"), mmap_mode=mmap_mode)
+    return X, y
+
+
+def load_dataset(source=None, cache_dir=None, mmap_mode="r"):
+    """Return the preprocessed (X, y) arrays, building the cache on first use.
+
+    The raw CSV is read from ``source`` (a local path or URL, defaulting to
+    ``FL_DATA_PATH`` and then the UCI URL), preprocessed once and stored as a
+    pair of ``.npy`` files keyed by the SHA-256 of the raw bytes. Later calls
+    memory-map those files directly, without touching the network or pandas.
+    """
+    source = source or DATA_PATH or url
+    cache_dir = cache_dir or CACHE_DIR
+    key = _source_key(source)
+
+    digest = _read_index(cache_dir).get(key)
+    if digest:
+        bundle = _bundle_dir(cache_dir, digest)
+        if os.path.exists(os.path.join(bundle, "y.npy")):
+            return _load_bundle(bundle, mmap_mode)
 
-# Replace '?' with NaN and drop missing rows
-df.replace('?', pd.NA, inplace=True)
-df.dropna(inplace=True)
+    raw = fetch_raw(source)
+    digest = hashlib.sha256(raw + f":v{PIPELINE_VERSION}".encode()).hexdigest()
+    bundle = _bundle_dir(cache_dir, digest)
 
-# Convert all columns to numeric
-df = df.apply(pd.to_numeric)
+    if not os.path.exists(os.path.join(bundle, "y.npy")):
+        os.makedirs(cache_dir, exist_ok=True)
+        X, y = preprocess(raw)
+        # Write into a scratch directory and rename it so readers never see a partial bundle
+        tmp_bundle = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp_")
+        np.save(os.path.join(tmp_bundle, "X.npy"), X)
+        np.save(os.path.join(tmp_bundle, "y.npy"), y)
+        with open(os.path.join(tmp_bundle, "meta.json"), "w") as f:
+            json.dump({"source": source, "sha256": digest, "rows": int(len(y)),
+                       "pipeline_version": PIPELINE_VERSION}, f, indent=2)
+        try:
+            os.replace(tmp_bundle, bundle)
+        except OSError:
+            # Another process finished the same bundle first
+            import shutil
+            shutil.rmtree(tmp_bundle, ignore_errors=True)
 
-# Split features and target
-X = df.drop("target", axis=1).values
-y = df["target"].apply(lambda x: 1 if x > 0 else 0).values  # binary classification
+    index = _read_index(cache_dir)
+    index[key] = digest
+    _write_index(cache_dir, index)
+    return _load_bundle(bundle, mmap_mode)
+
+
+class DatasetLoader:
+    """Memoized access to the preprocessed dataset.
+
+    Nothing is read until ``arrays()`` is first called; every later call (and
+    every client drawing from the same loader) reuses the same arrays. Client
+    splits are views into one reordered copy per partition plan, so memory
+    does not grow with the number of clients.
+    """
+
+    def __init__(self, source=None, cache_dir=None):
+        self.source = source
+        self.cache_dir = cache_dir
+        self._arrays = None
+        self._partitions = {}
+        self._default_plans = {}
+        self._held_out = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, X, y):
+        """Wrap caller-supplied arrays so they are shared instead of reloaded."""
+        loader = cls()
+        loader._arrays = (np.asarray(X), np.asarray(y))
+        return loader
+
+    def arrays(self):
+        if self._arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    self._arrays = load_dataset(self.source, self.cache_dir)
+        return self._arrays
+
+    def _default_plan(self, num_clients, seed):
+        """The IID plan for ``(num_clients, seed)``, built once."""
+        key = (num_clients, seed)
+        if key not in self._default_plans:
+            _, y = self.arrays()
+            with self._lock:
+                if key not in self._default_plans:
+                    self._default_plans[key] = iid_plan(len(y), num_clients, seed)
+        return self._default_plans[key]
+
+    def partition(self, num_clients, seed=42, plan=None):
+        """Return ``(plan, X, y)`` with the arrays reordered by ``plan.order``.
+
+        Without an explicit ``plan`` the IID plan for ``(num_clients, seed)``
+        is used. Partitions are cached by plan digest, so every caller of the
+        same plan shares one reordered copy.
+        """
+        if plan is None:
+            plan = self._default_plan(num_clients, seed)
+        key = plan.digest
+        if key not in self._partitions:
+            X, y = self.arrays()
+            with self._lock:
+                if key not in self._partitions:
+                    if len(plan.order) != len(y):
+                        raise ValueError(f"Plan covers {len(plan.order)} rows, dataset has {len(y)}")
+                    self._partitions[key] = (plan, X[plan.order], y[plan.order])
+        return self._partitions[key]
+
+    def load_data(self, client_id=0, num_clients=2, seed=42, plan=None):
+        plan, X, y = self.partition(num_clients, seed, plan)
+        if plan.num_clients != num_clients:
+            raise ValueError(f"Plan has {plan.num_clients} clients, requested {num_clients}")
+        train, test = plan.client_slices(client_id)
+        X_train = plan.transform(client_id, X[train])
+        X_test = plan.transform(client_id, X[test])
+        return X_train, y[train], X_test, y[test]
+
+    def held_out(self, num_clients, seed=42, plan=None):
+        """Return ``(X, y)``: every client's test split, concatenated once and cached."""
+        plan, X, y = self.partition(num_clients, seed, plan)
+        if plan.digest not in self._held_out:
+            parts = [self.load_data(client_id, num_clients, seed, plan)
+                     for client_id in range(num_clients)]
+            self._held_out[plan.digest] = (np.concatenate([p[2] for p in parts]),
+                                           np.concatenate([p[3] for p in parts]))
+        return self._held_out[plan.digest]
+
+
+_default_loader = DatasetLoader()
+
+# Loader for the arrays most recently passed to load_data(), as (X, y, loader)
+_array_loader = None
+# Plan loaded from FL_PARTITION_PLAN, if set
+_default_plan = None
+
+
+def get_loader():
+    """Return the process-wide loader used by ``load_data``."""
+    return _default_loader
+
+
+def get_plan():
+    """Return the plan saved at ``FL_PARTITION_PLAN``, or None for IID shards."""
+    global _default_plan
+    if _default_plan is None and PLAN_PATH:
+        _default_plan = PartitionPlan.load(PLAN_PATH)
+    return _default_plan
+
+
+def __getattr__(name):
+    # Keep ``dataset.X`` / ``dataset.y`` working without loading at import time
+    if name in ("X", "y"):
+        X, y = _default_loader.arrays()
+        return X if name == "X" else y
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Standardize features
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
 
 # Function to split dataset among clients
-def load_data(client_id=0, num_clients=2):
-    # Split data among clients
-    X_split = np.array_split(X, num_clients)
-    y_split = np.array_split(y, num_clients)
-    
-    # Train-test split for this client
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_split[client_id], y_split[client_id], test_size=0.2, random_state=42
-    )
-    
-    return X_train, y_train, X_test, y_test
+def load_data(client_id=0, num_clients=2, X=None, y=None, seed=42, plan=None):
+    """Return ``(X_train, y_train, X_test, y_test)`` for one client.
+
+    By default the data comes from the shared, lazily loaded dataset. Pass
+    ``X`` and ``y`` to partition caller-supplied arrays instead; repeated
+    calls with the same arrays share one partitioned copy. ``plan`` (or the
+    plan saved at ``FL_PARTITION_PLAN``) replaces the default IID shards.
+    """
+    plan = plan if plan is not None else get_plan()
+    if X is not None or y is not None:
+        if X is None or y is None:
+            raise ValueError("X and y must be passed together")
+        global _array_loader
+        cached = _array_loader
+        if cached is None or cached[0] is not X or cached[1] is not y:
+            cached = _array_loader = (X, y, DatasetLoader.from_arrays(X, y))
+        return cached[2].load_data(client_id, num_clients, seed, plan)
+    return _default_loader.load_data(client_id, num_clients, seed, plan)
+
+
+def load_held_out(num_clients=2, seed=42, plan=None):
+    """Return ``(X_test, y_test)`` pooled over all clients, for server-side evaluation."""
+    return _default_loader.held_out(num_clients, seed, plan if plan is not None else get_plan())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the preprocessed dataset cache.")
+    parser.add_argument("--source", default=None, help="Local CSV path or URL (default: UCI URL)")
+    parser.add_argument("--cache-dir", default=None, help=f"Cache directory (default: {CACHE_DIR})")
+    args = parser.parse_args()
+
+    X, y = load_dataset(args.source, args.cache_dir)
+    print(f"Cached {X.shape[0]} rows x {X.shape[1]} features in {args.cache_dir or CACHE_DIR}")
@@ -0,0 +1,75 @@
+"""
+Centralized evaluation of the global model on the server.
+
+``CentralizedEvaluator`` is a Flower ``evaluate_fn``: it scores the global
+weights on a held-out set (by default every client's test split, pooled
+once and cached) with batched inference on one server-side model. Per-round
+accuracy then no longer needs an evaluate round trip to every client, which
+can run every N rounds instead (see ``FlatFedAvg(evaluate_every=...)``).
+"""
+
+import numpy as np
+
+from params import to_flat
+
+EVAL_BATCH_SIZE = 1024
+
+
+def binary_metrics(probs, y):
+    """Return ``(binary cross-entropy, accuracy)`` of sigmoid outputs ``probs``."""
+    probs = np.clip(probs, 1e-7, 1 - 1e-7)
+    loss = float(-np.mean(y * np.log(probs) + (1 - y) * np.log(1 - probs)))
+    accuracy = float(np.mean((probs > 0.5) == y))
+    return loss, accuracy
+
+
+def default_eval_model_fn():
+    """Server-side copy of the client model; it only runs inference, so no DP optimizer."""
+    from models import as_flat_model, create_model
+    return as_flat_model(create_model(dp=False))
+
+
+class CentralizedEvaluator:
+    """``evaluate_fn`` scoring flat global weights on a fixed held-out set."""
+
+    def __init__(self, X, y, model_fn=default_eval_model_fn, batch_size=EVAL_BATCH_SIZE):
+        self.X = X
+        self.y = np.asarray(y, dtype=np.float32)
+        self.model_fn = model_fn
+        self.batch_size = batch_size
+        self._model = None
+        self._disabled = False
+
+    @classmethod
+    def from_clients(cls, num_clients, seed=42, plan=None, **kwargs):
+        """Evaluate on the union of the test splits of ``num_clients`` clients."""
+        from dataset import load_held_out
+        X, y = load_held_out(num_clients, seed, plan)
+        return cls(X, y, **kwargs)
+
+    def __call__(self, server_round, parameters, config):
+        if self._disabled:
+            return None
+        flat = to_flat(parameters)
+        if self._model is None:
+            self._model = self.model_fn()
+        if flat.size != self._model.num_params:
+            # Clients run a different architecture than the server-side model
+            print(f"[Server] Centralized evaluation disabled: global model has {flat.size} "
+                  f"parameters, evaluation model {self._model.num_params}")
+            self._disabled = True
+            return None
+
+        self._model.set_flat(flat)
+        loss_sum = 0.0
+        correct = 0.0
+        for start in range(0, len(self.y), self.batch_size):
+            stop = start + self.batch_size
+            probs = self._model.predict_proba(self.X[start:stop])
+            loss, accuracy = binary_metrics(probs, self.y[start:stop])
+            loss_sum += loss * (min(stop, len(self.y)) - start)
+            correct += accuracy * (min(stop, len(self.y)) - start)
+        loss, accuracy = loss_sum / len(self.y), correct / len(self.y)
+        print(f"[Server] Round {server_round} - Centralized loss: {loss:.4f}, "
+              f"accuracy: {accuracy:.4f} ({len(self.y)} held-out examples)")
+        return loss, {"accuracy": accuracy}
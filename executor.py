@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Client executors for the in-process simulation.
+
+``SerialExecutor`` trains clients one after another on the simulation's own
+model. ``ProcessPoolClientExecutor`` shards each round's cohort across worker
+processes that keep a warm model for the whole run; global weights and the
+per-client results are exchanged through shared memory instead of pickling
+weight lists.
+"""
+
+import contextlib
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SerialExecutor:
+    """Train every client of a cohort in the calling process."""
+
+    def start(self, sim):
+        self.sim = sim
+
+    def fit(self, cohort, global_weights):
+        sim = self.sim
+        losses = np.empty(len(cohort))
+        for i, client_id in enumerate(cohort):
+            X_train, y_train, _, _ = sim.client_data(client_id)
+            sim.model.set_flat(global_weights)
+            sim.model.reset_optimizer()
+            losses[i] = sim.model.train(X_train, y_train, sim.epochs, sim.batch_size)
+            sim.model.get_flat(out=sim.client_states[client_id])
+        return losses
+
+    def close(self):
+        pass
+
+
+# Per-process state of a pool worker, set once by _init_worker
+_worker = {}
+
+# Read once when BLAS / TensorFlow load, so they must be set before a worker starts
+THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+               "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+
+def _init_worker(model_fn, global_name, states_name, num_clients, num_params, plan, X, y,
+                 epochs, batch_size):
+    global_shm = shared_memory.SharedMemory(name=global_name)
+    states_shm = shared_memory.SharedMemory(name=states_name)
+    _worker.update(
+        global_shm=global_shm,
+        states_shm=states_shm,
+        global_weights=np.ndarray((num_params,), dtype=np.float32, buffer=global_shm.buf),
+        states=np.ndarray((num_clients, num_params), dtype=np.float32, buffer=states_shm.buf),
+        plan=plan,
+        X=X,
+        y=y,
+        model=model_fn(),
+        epochs=epochs,
+        batch_size=batch_size,
+    )
+
+
+@contextlib.contextmanager
+def _thread_limits(threads):
+    """Set the thread-pool env vars that processes started inside the block inherit."""
+    saved = {var: os.environ.get(var) for var in THREAD_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _fit_clients(cohort):
+    w = _worker
+    model, plan = w["model"], w["plan"]
+    losses = []
+    for client_id in cohort:
+        train, _ = plan.client_slices(client_id)
+        model.set_flat(w["global_weights"])
+        model.reset_optimizer()
+        losses.append(model.train(plan.transform(client_id, w["X"][train]), w["y"][train],
+                                w["epochs"], w["batch_size"]))
+        model.get_flat(out=w["states"][client_id])
+    return losses
+
+
+class ProcessPoolClientExecutor:
+    """Run local training for a cohort on a pool of worker processes.
+
+    Each worker builds its model once and reads the global weights from, and
+    writes its clients' trained weights to, shared-memory buffers. The
+    simulation's ``client_states`` array is rebound to the shared buffer, so
+    aggregation reads the workers' results without any copy.
+    """
+
+    def __init__(self, num_workers=None, chunks_per_worker=4):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self.pool = None
+
+    def start(self, sim):
+        self.sim = sim
+        num_params = sim.global_weights.size
+        self._global_shm = shared_memory.SharedMemory(create=True, size=num_params * 4)
+        self._states_shm = shared_memory.SharedMemory(create=True, size=sim.client_states.nbytes)
+        self.global_weights = np.ndarray((num_params,), dtype=np.float32, buffer=self._global_shm.buf)
+        states = np.ndarray(sim.client_states.shape, dtype=np.float32, buffer=self._states_shm.buf)
+        states[:] = sim.client_states
+        sim.client_states = states
+
+        # Keep each worker to its share of the cores
+        threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        # spawn: TensorFlow is not fork-safe. Workers train on the simulation's own
+        # partition, whichever loader it came from
+        with _thread_limits(threads):
+            self.pool = mp.get_context("spawn").Pool(
+                self.num_workers,
+                initializer=_init_worker,
+                initargs=(sim.model_fn, self._global_shm.name, self._states_shm.name, sim.num_clients,
+                          num_params, sim.plan, sim.X, sim.y, sim.epochs, sim.batch_size),
+            )
+
+    def fit(self, cohort, global_weights):
+        np.copyto(self.global_weights, global_weights)
+        num_chunks = min(len(cohort), self.num_workers * self.chunks_per_worker)
+        chunks = [c.tolist() for c in np.array_split(cohort, num_chunks)]
+        return np.concatenate([np.asarray(l, dtype=np.float64) for l in self.pool.map(_fit_clients, chunks)])
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+        # Detach the simulation from the shared buffer before releasing it
+        self.sim.client_states = np.array(self.sim.client_states)
+        del self.global_weights
+        for shm in (self._global_shm, self._states_shm):
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,98 @@
+"""
+Process launch helpers.
+
+The server is ready once its gRPC port accepts connections, so launchers
+start ``server.py`` and probe the port instead of sleeping for a fixed time:
+clients start as soon as the server is up, and a slow start (e.g. a cold
+TensorFlow import) no longer races them. A server that exits during start-up
+is reported immediately instead of after the timeout.
+
+``spawn`` starts a script with its output drained by a reader thread
+(``LogStream``) into a log file and a bounded in-memory tail, with every line
+handed to a callback as it arrives. Nothing waits on an undrained pipe, so a
+long, chatty run can neither stall nor grow the launcher's memory.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+SERVER_PORT = 8081
+# First port of the edge aggregators (aggregator.py) of a hierarchical run
+EDGE_PORT = SERVER_PORT + 1
+STARTUP_TIMEOUT = 120.0
+
+
+def port_open(port, host="127.0.0.1"):
+    with socket.socket() as sock:
+        return sock.connect_ex((host, port)) == 0
+
+
+def wait_for_port(port=SERVER_PORT, host="127.0.0.1", timeout=STARTUP_TIMEOUT,
+                  process=None, interval=0.02):
+    """Block until ``host:port`` accepts connections and return the seconds waited.
+
+    Raises ``TimeoutError`` after ``timeout`` seconds, or ``RuntimeError`` as
+    soon as ``process`` (the server being waited for) exits.
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    while not port_open(port, host):
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before "
+                               f"listening on port {port}")
+        if time.perf_counter() >= deadline:
+            raise TimeoutError(f"Nothing listening on {host}:{port} after {timeout:.0f} s")
+        time.sleep(interval)
+    return time.perf_counter() - start
+
+
+class LogStream:
+    """Copy a process's text output to ``path`` on a reader thread.
+
+    The last ``tail_lines`` lines are kept in ``lines`` and every line is
+    passed (without its newline) to ``on_line`` as soon as it is read.
+    """
+
+    def __init__(self, stream, path, on_line=None, tail_lines=200):
+        self.path = path
+        self.on_line = on_line
+        self.lines = deque(maxlen=tail_lines)
+        self._stream = stream
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", buffering=1) as log, self._stream:
+            for line in self._stream:
+                log.write(line)
+                line = line.rstrip("\n")
+                self.lines.append(line)
+                if self.on_line is not None:
+                    self.on_line(line)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def tail(self, n=None):
+        lines = list(self.lines)
+        return "\n".join(lines if n is None else lines[-n:])
+
+
+def spawn(args, log_path, on_line=None, env=None, tail_lines=200):
+    """Run ``python *args`` with stdout and stderr streamed through a ``LogStream``.
+
+    Returns ``(process, stream)``. The child runs unbuffered so its lines
+    arrive as they are printed.
+    """
+    env = dict(os.environ if env is None else env, PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(
+        [sys.executable, *args], env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, bufsize=1,
+    )
+    return process, LogStream(process.stdout, log_path, on_line, tail_lines)
@@ -0,0 +1,222 @@
+"""
+Model construction for the federated clients.
+
+``FL_MODEL_BACKEND`` selects between the Keras model (the default, with the
+tensorflow-privacy DP optimizer when available) and the pure-NumPy MLP in
+numpy_mlp.py. TensorFlow is only imported when the Keras backend is used.
+
+``FL_DP_MODE`` selects how per-example gradients are computed for DP
+training: ``vectorized`` (default) computes them in one batched op
+(tensorflow-privacy's vectorized optimizer for Keras, closed-form for the
+NumPy MLP); ``microbatch`` uses the original ``DPKerasAdamOptimizer``, which
+loops over microbatches. Both clip and noise identically.
+
+``FL_TRAINER`` selects how Keras models run their local epochs: ``fit``
+(default) uses ``model.fit``; ``compiled`` runs them all in one traced
+``tf.function`` (see trainer.py; ``FL_XLA=1`` also compiles it with XLA).
+"""
+
+import os
+
+import numpy as np
+
+from params import ParameterLayout, to_flat
+
+MODEL_BACKEND = os.environ.get("FL_MODEL_BACKEND", "keras")
+BACKENDS = ("keras", "numpy")
+DP_MODE = os.environ.get("FL_DP_MODE", "vectorized")
+DP_MODES = ("vectorized", "microbatch")
+TRAINER = os.environ.get("FL_TRAINER", "fit")
+TRAINERS = ("compiled", "fit")
+XLA = os.environ.get("FL_XLA", "0") == "1"
+
+INPUT_DIM = 13
+HIDDEN_UNITS = (16, 8)
+
+# DP Parameters
+L2_NORM_CLIP = 1.0
+NOISE_MULTIPLIER = 0.5
+NUM_MICROBATCHES = 32
+LEARNING_RATE = 0.001
+
+
+def dp_optimizer_class(mode=None):
+    """Return the tensorflow-privacy DP Adam class for ``mode``, or None if unavailable."""
+    mode = mode or DP_MODE
+    if mode not in DP_MODES:
+        raise ValueError(f"Unknown DP mode {mode!r}; expected one of {DP_MODES}")
+    if mode == "vectorized":
+        try:
+            from tensorflow_privacy.privacy.optimizers.dp_optimizer_keras_vectorized import (
+                VectorizedDPKerasAdamOptimizer,
+            )
+            return VectorizedDPKerasAdamOptimizer
+        except ImportError:
+            # Older tensorflow-privacy releases: fall back to the microbatch loop
+            pass
+    try:
+        from tensorflow_privacy.privacy.optimizers.dp_optimizer_keras import DPKerasAdamOptimizer
+        return DPKerasAdamOptimizer
+    except ImportError:
+        try:
+            # Try alternative import path
+            from tensorflow_privacy.privacy.optimizers import dp_optimizer_keras
+            return dp_optimizer_keras.DPKerasAdamOptimizer
+        except ImportError:
+            print("Warning: tensorflow_privacy not available. Using standard Adam optimizer.")
+            return None
+
+
+def create_keras_model(hidden_units=HIDDEN_UNITS, dp=True, dp_mode=None, seed=None):
+    import tensorflow as tf
+
+    if seed is not None:
+        tf.keras.utils.set_random_seed(seed)
+
+    model = tf.keras.models.Sequential(
+        [tf.keras.layers.Dense(hidden_units[0], activation='relu', input_shape=(INPUT_DIM,))]
+        + [tf.keras.layers.Dense(units, activation='relu') for units in hidden_units[1:]]
+        + [tf.keras.layers.Dense(1, activation='sigmoid')]
+    )
+
+    # Use DP optimizer if available
+    optimizer_class = dp_optimizer_class(dp_mode) if dp else None
+    if optimizer_class is not None:
+        optimizer = optimizer_class(
+            l2_norm_clip=L2_NORM_CLIP,
+            noise_multiplier=NOISE_MULTIPLIER,
+            num_microbatches=NUM_MICROBATCHES,
+            learning_rate=LEARNING_RATE
+        )
+    else:
+        optimizer = tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE)
+
+    model.compile(optimizer=optimizer, loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def create_numpy_model(hidden_units=HIDDEN_UNITS, dp=True, seed=None):
+    from numpy_mlp import NumpyMLP
+
+    if not dp:
+        return NumpyMLP(INPUT_DIM, hidden_units, learning_rate=LEARNING_RATE, seed=seed)
+    return NumpyMLP(INPUT_DIM, hidden_units, learning_rate=LEARNING_RATE, seed=seed,
+                    l2_norm_clip=L2_NORM_CLIP, noise_multiplier=NOISE_MULTIPLIER)
+
+
+def create_model(backend=None, hidden_units=HIDDEN_UNITS, dp=True, dp_mode=None, seed=None):
+    """Build the client model for ``backend`` (default: ``FL_MODEL_BACKEND``).
+
+    ``seed`` makes the initial weights (and the NumPy backend's shuffling and
+    DP noise) reproducible.
+    """
+    backend = backend or MODEL_BACKEND
+    if backend == "keras":
+        return create_keras_model(hidden_units, dp, dp_mode, seed)
+    if backend == "numpy":
+        return create_numpy_model(hidden_units, dp, seed)
+    raise ValueError(f"Unknown model backend {backend!r}; expected one of {BACKENDS}")
+
+
+class KerasAdapter:
+    """Flat-vector interface over a compiled Keras model.
+
+    Gives Keras models the same ``get_flat``/``set_flat``/``train``/
+    ``predict_proba`` interface that ``NumpyMLP`` implements natively.
+    """
+
+    def __init__(self, model, trainer=None):
+        trainer = trainer or TRAINER
+        if trainer not in TRAINERS:
+            raise ValueError(f"Unknown trainer {trainer!r}; expected one of {TRAINERS}")
+        self.model = model
+        self.trainer = trainer
+        self._compiled = None
+        # Same order as get_weights(); weights are read and assigned per variable
+        self.variables = list(model.weights)
+        self.layout = ParameterLayout([v.shape for v in self.variables])
+        self.num_params = self.layout.num_params
+
+    def get_flat(self, out=None):
+        if out is None:
+            out = self.layout.empty()
+        for variable, start, stop in zip(self.variables, self.layout.offsets[:-1],
+                                         self.layout.offsets[1:]):
+            out[start:stop] = np.ravel(variable.numpy())
+        return out
+
+    def set_flat(self, flat):
+        # In-place assignment into the existing variables, no new arrays per layer
+        for variable, value in zip(self.variables, self.layout.unpack(flat)):
+            variable.assign(value)
+
+    def reset_optimizer(self):
+        # Every simulated client starts its local epochs with fresh optimizer state
+        import tensorflow as tf
+
+        optimizer = self.model.optimizer
+        variables = optimizer.variables() if callable(optimizer.variables) else optimizer.variables
+        for variable in variables:
+            variable.assign(tf.zeros_like(variable))
+
+    def train(self, X, y, epochs, batch_size):
+        """Run the local epochs and return the last epoch's loss."""
+        if self.trainer == "compiled":
+            if self._compiled is None:
+                from trainer import CompiledTrainer
+                self._compiled = CompiledTrainer(self.model, jit_compile=XLA)
+            return self._compiled.train(X, y, epochs, batch_size)
+        history = self.model.fit(X, y, epochs=epochs, batch_size=batch_size, verbose=0)
+        return history.history["loss"][-1]
+
+    def predict_proba(self, X):
+        return np.asarray(self.model(X, training=False)).reshape(-1)
+
+
+class WeightSync:
+    """Loads the server's global weights into a flat model, skipping redundant loads.
+
+    The server tags the weights it sends with ``weights_id`` in the fit and
+    evaluate config. ``load`` skips the assignment when the model still holds
+    the weights with that tag, e.g. a fit of round r+1 right after evaluating
+    round r's global weights; call ``modified`` once training has changed
+    them. ``get`` returns the model's weights in one reused buffer, which is
+    overwritten by the next call.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.loaded = None
+        self.skipped = 0
+        self._out = None
+
+    def load(self, parameters, config=None):
+        """Set the model to ``parameters``; returns False if it already held them."""
+        weights_id = (config or {}).get("weights_id")
+        if weights_id is not None and weights_id == self.loaded:
+            self.skipped += 1
+            return False
+        self.model.set_flat(to_flat(parameters))
+        self.loaded = weights_id
+        return True
+
+    def modified(self):
+        self.loaded = None
+
+    def get(self):
+        if self._out is None:
+            self._out = np.empty(self.model.num_params, dtype=np.float32)
+        return self.model.get_flat(self._out)
+
+
+def as_flat_model(model):
+    """Return ``model`` with the flat-vector interface (wrapping Keras models)."""
+    return model if hasattr(model, "get_flat") else KerasAdapter(model)
+
+
+def is_dp_model(model):
+    """Whether ``model`` trains with differential privacy."""
+    if hasattr(model, "l2_norm_clip"):
+        return model.l2_norm_clip is not None
+    optimizer = getattr(model, "optimizer", None)
+    return optimizer is not None and "DP" in type(optimizer).__name__
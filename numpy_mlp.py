@@ -0,0 +1,213 @@
+"""
+Pure-NumPy multi-layer perceptron.
+
+A drop-in replacement for the small Keras models used by the clients: the
+same Dense/ReLU/sigmoid layers, binary cross-entropy loss and Adam optimizer
+(with Keras' default hyperparameters and Glorot-uniform initialization).
+All parameters live in one contiguous float32 buffer, with the per-layer
+kernels and biases as views into it, and every forward/backward pass works
+on a whole batch at once.
+
+With ``l2_norm_clip`` set, training is DP-SGD with the same semantics as
+tensorflow-privacy's ``DPKerasAdamOptimizer`` with one example per
+microbatch: every example's gradient is clipped to ``l2_norm_clip``, the
+clipped gradients are summed, Gaussian noise with standard deviation
+``l2_norm_clip * noise_multiplier`` is added once per batch and the result
+is divided by the batch size before the Adam step. For dense layers the
+per-example gradient of a kernel is the outer product of the layer input
+and the output delta, so its norm is the product of their norms and the
+clipped sum is a single matrix product with rescaled deltas; per-example
+gradients are never materialized.
+"""
+
+import numpy as np
+
+from params import ParameterLayout
+
+
+class History:
+    """Minimal stand-in for ``keras.callbacks.History``."""
+
+    def __init__(self):
+        self.history = {"loss": [], "accuracy": []}
+
+
+class NumpyMLP:
+    """Dense ReLU network with a single sigmoid output, trained with Adam."""
+
+    def __init__(self, input_dim=13, hidden_units=(16, 8), learning_rate=0.001,
+                 beta_1=0.9, beta_2=0.999, epsilon=1e-7, seed=None,
+                 l2_norm_clip=None, noise_multiplier=0.0):
+        self.learning_rate = learning_rate
+        self.l2_norm_clip = l2_norm_clip
+        self.noise_multiplier = noise_multiplier
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+
+        dims = [input_dim, *hidden_units, 1]
+        # Same order as Keras get_weights(): kernel, bias for every layer
+        self.shapes = []
+        for fan_in, fan_out in zip(dims[:-1], dims[1:]):
+            self.shapes += [(fan_in, fan_out), (fan_out,)]
+        self.layout = ParameterLayout(self.shapes)
+        self.num_params = self.layout.num_params
+
+        self.params = np.zeros(self.num_params, dtype=np.float32)
+        self.grads = np.zeros_like(self.params)
+        self._m = np.zeros_like(self.params)
+        self._v = np.zeros_like(self.params)
+        self._scratch = np.zeros_like(self.params)
+        self.iterations = 0
+
+        self.weights = self.layout.unpack(self.params)
+        self._grad_views = self.layout.unpack(self.grads)
+        for kernel in self.weights[0::2]:
+            limit = np.sqrt(6.0 / sum(kernel.shape))
+            kernel[:] = self.rng.uniform(-limit, limit, kernel.shape)
+
+    # Keras-compatible weight access
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        for view, w in zip(self.weights, weights):
+            view[...] = w
+
+    # Flat-vector access used by the simulation engine
+
+    def get_flat(self, out=None):
+        if out is None:
+            return self.params.copy()
+        np.copyto(out, self.params)
+        return out
+
+    def set_flat(self, flat):
+        np.copyto(self.params, flat)
+
+    def reset_optimizer(self):
+        self._m.fill(0.0)
+        self._v.fill(0.0)
+        self.iterations = 0
+
+    # Forward / backward
+
+    def _forward(self, X):
+        """Return the inputs of every layer and the output logits."""
+        activations = [X]
+        h = X
+        num_layers = len(self.shapes) // 2
+        for i in range(num_layers):
+            z = h @ self.weights[2 * i] + self.weights[2 * i + 1]
+            if i < num_layers - 1:
+                h = np.maximum(z, 0.0)
+                activations.append(h)
+        return activations, z[:, 0]
+
+    def predict_proba(self, X):
+        _, logits = self._forward(np.asarray(X, dtype=np.float32))
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict(self, X, batch_size=None, verbose=0):
+        return self.predict_proba(X)[:, None]
+
+    @staticmethod
+    def _loss(logits, y):
+        # Binary cross-entropy from logits, stable for large |z|
+        return np.mean(np.maximum(logits, 0) - logits * y + np.log1p(np.exp(-np.abs(logits))))
+
+    def _backward(self, activations, logits, y):
+        """Fill ``self.grads`` with the mean-loss gradient for one batch."""
+        delta = ((1.0 / (1.0 + np.exp(-logits))) - y)[:, None] / len(y)
+        for i in range(len(self.shapes) // 2 - 1, -1, -1):
+            h = activations[i]
+            np.matmul(h.T, delta, out=self._grad_views[2 * i])
+            np.sum(delta, axis=0, out=self._grad_views[2 * i + 1])
+            if i > 0:
+                delta = (delta @ self.weights[2 * i].T) * (h > 0)
+
+    def _backward_dp(self, activations, logits, y):
+        """Fill ``self.grads`` with the clipped, noised DP-SGD gradient for one batch."""
+        num_layers = len(self.shapes) // 2
+        # Per-example output deltas of every layer (unscaled by the batch size)
+        deltas = [None] * num_layers
+        delta = ((1.0 / (1.0 + np.exp(-logits))) - y)[:, None]
+        for i in range(num_layers - 1, -1, -1):
+            deltas[i] = delta
+            if i > 0:
+                delta = (delta @ self.weights[2 * i].T) * (activations[i] > 0)
+
+        # ||dL/dW_i||^2 = ||h_i||^2 ||delta_i||^2 per example, plus ||delta_i||^2 for the bias
+        sq_norms = np.zeros(len(y), dtype=np.float32)
+        for h, delta in zip(activations, deltas):
+            sq_norms += (np.einsum("ij,ij->i", h, h) + 1.0) * np.einsum("ij,ij->i", delta, delta)
+        scale = self.l2_norm_clip / np.maximum(np.sqrt(sq_norms), self.l2_norm_clip)
+
+        for i, (h, delta) in enumerate(zip(activations, deltas)):
+            clipped = delta * scale[:, None]
+            np.matmul(h.T, clipped, out=self._grad_views[2 * i])
+            np.sum(clipped, axis=0, out=self._grad_views[2 * i + 1])
+
+        noise_std = self.l2_norm_clip * self.noise_multiplier
+        if noise_std > 0:
+            self.grads += self.rng.normal(0.0, noise_std, self.num_params).astype(np.float32)
+        self.grads /= len(y)
+
+    def _apply_gradients(self, grads):
+        """One Adam step on the flat parameter buffer, updated in place."""
+        self.iterations += 1
+        b1, b2 = self.beta_1, self.beta_2
+        m, v, scratch = self._m, self._v, self._scratch
+        m *= b1
+        m += (1.0 - b1) * grads
+        np.multiply(grads, grads, out=scratch)
+        v *= b2
+        v += (1.0 - b2) * scratch
+        lr_t = self.learning_rate * np.sqrt(1.0 - b2 ** self.iterations) / (1.0 - b1 ** self.iterations)
+        np.sqrt(v, out=scratch)
+        scratch += self.epsilon
+        np.divide(m, scratch, out=scratch)
+        scratch *= lr_t
+        self.params -= scratch
+
+    def train_batch(self, X, y):
+        """One optimizer step; returns the batch loss and number of correct predictions."""
+        activations, logits = self._forward(X)
+        if self.l2_norm_clip is None:
+            self._backward(activations, logits, y)
+        else:
+            self._backward_dp(activations, logits, y)
+        self._apply_gradients(self.grads)
+        return self._loss(logits, y), int(np.count_nonzero((logits > 0) == (y > 0.5)))
+
+    def fit(self, X, y, epochs=1, batch_size=32, verbose=0, shuffle=True):
+        """Keras-style ``fit``; returns a ``History`` with per-epoch loss and accuracy."""
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32).reshape(-1)
+        history = History()
+        n = len(y)
+        for _ in range(epochs):
+            order = self.rng.permutation(n) if shuffle else np.arange(n)
+            X_epoch, y_epoch = X[order], y[order]
+            total_loss, total_correct = 0.0, 0
+            for start in range(0, n, batch_size):
+                X_batch = X_epoch[start:start + batch_size]
+                y_batch = y_epoch[start:start + batch_size]
+                loss, correct = self.train_batch(X_batch, y_batch)
+                total_loss += loss * len(y_batch)
+                total_correct += correct
+            history.history["loss"].append(total_loss / max(n, 1))
+            history.history["accuracy"].append(total_correct / max(n, 1))
+        return history
+
+    def evaluate(self, X, y, verbose=0, batch_size=None):
+        """Return ``[loss, accuracy]`` like a compiled Keras model."""
+        _, logits = self._forward(np.asarray(X, dtype=np.float32))
+        y = np.asarray(y, dtype=np.float32).reshape(-1)
+        return [float(self._loss(logits, y)), float(np.mean((logits > 0) == (y > 0.5)))]
+
+    def train(self, X, y, epochs, batch_size):
+        """Run local epochs and return the last epoch's training loss."""
+        return self.fit(X, y, epochs, batch_size).history["loss"][-1]
@@ -0,0 +1,63 @@
+"""
+Flat parameter vectors.
+
+Model weights are exchanged as a single contiguous float32 vector instead of
+a list of per-layer arrays. ``ParameterLayout`` holds the shape/offset table
+to pack a weight list into a vector and to view a vector as per-layer arrays
+without copying.
+"""
+
+import io
+
+import numpy as np
+
+
+class ParameterLayout:
+    """Shape and offset table for packing layer weights into one vector."""
+
+    def __init__(self, shapes, dtype=np.float32):
+        self.shapes = [tuple(s) for s in shapes]
+        self.sizes = [int(np.prod(s)) for s in self.shapes]
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)]).astype(np.int64)
+        self.num_params = int(self.offsets[-1])
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def from_weights(cls, weights):
+        return cls([w.shape for w in weights])
+
+    def empty(self):
+        return np.empty(self.num_params, dtype=self.dtype)
+
+    def pack(self, weights, out=None):
+        """Copy ``weights`` into ``out`` (allocated if None) and return it."""
+        if out is None:
+            out = self.empty()
+        for w, start, stop in zip(weights, self.offsets[:-1], self.offsets[1:]):
+            out[start:stop] = np.ravel(w)
+        return out
+
+    def unpack(self, flat):
+        """Return per-layer views into ``flat``."""
+        return [flat[start:stop].reshape(shape)
+                for shape, start, stop in zip(self.shapes, self.offsets[:-1], self.offsets[1:])]
+
+
+def decode_ndarray(tensor):
+    """View a Flower-serialized (``np.save``) tensor without copying its data."""
+    buffer = io.BytesIO(tensor)
+    version = np.lib.format.read_magic(buffer)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(buffer)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(buffer)
+    count = int(np.prod(shape))
+    array = np.frombuffer(tensor, dtype=dtype, count=count, offset=buffer.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def to_flat(arrays):
+    """Return the flat vector for a parameter list (one vector, or per-layer arrays)."""
+    if len(arrays) == 1 and np.ndim(arrays[0]) == 1:
+        return arrays[0]
+    return ParameterLayout.from_weights(arrays).pack(arrays)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Partition plans for splitting the dataset among federated clients.
+
+A plan is a row order plus per-client offsets: after reordering the data
+once, every client owns one contiguous block whose first ``num_train`` rows
+are its training set. Plans can be saved to disk so the server, the client
+simulations and the benchmarks all use identical shards.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+STRATEGIES = ("iid", "dirichlet", "quantity", "feature_shift")
+
+
+def _frozen(array, dtype=None):
+    """Read-only view of ``array``; the caller's own array stays writable."""
+    view = np.asarray(array, dtype=dtype).view()
+    view.flags.writeable = False
+    return view
+
+
+class PartitionPlan:
+    """Row order, client offsets and optional per-client feature transform."""
+
+    def __init__(self, order, offsets, num_train, feature_scale=None,
+                 feature_shift=None, meta=None):
+        self.order = _frozen(order, np.int64)
+        self.offsets = _frozen(offsets, np.int64)
+        self.num_train = _frozen(num_train, np.int64)
+        self.feature_scale = None if feature_scale is None else _frozen(feature_scale)
+        self.feature_shift = None if feature_shift is None else _frozen(feature_shift)
+        self.meta = meta or {}
+        self.num_clients = len(self.offsets) - 1
+        # Plans are immutable once built, so the cache key is computed once
+        self.digest = self._compute_digest()
+
+    def _compute_digest(self):
+        """Hash of everything that shapes the clients' arrays, used as a cache key."""
+        digest = hashlib.sha256()
+        for array in (self.order, self.offsets, self.num_train):
+            digest.update(array.tobytes())
+        if self.feature_scale is not None:
+            digest.update(np.ascontiguousarray(self.feature_scale, dtype=np.float32).tobytes())
+            digest.update(np.ascontiguousarray(self.feature_shift, dtype=np.float32).tobytes())
+        digest.update(str(self.meta.get("strategy")).encode())
+        return digest.hexdigest()[:16]
+
+    @property
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    def client_slices(self, client_id):
+        """Return ``(train, test)`` slices into the reordered arrays."""
+        if not 0 <= client_id < self.num_clients:
+            raise IndexError(f"client_id {client_id} out of range for {self.num_clients} clients")
+        start, stop = self.offsets[client_id], self.offsets[client_id + 1]
+        split = start + self.num_train[client_id]
+        return slice(start, split), slice(split, stop)
+
+    def transform(self, client_id, X):
+        """Apply the client's feature shift to ``X`` (returns ``X`` unchanged if none)."""
+        if self.feature_scale is None:
+            return X
+        return X * self.feature_scale[client_id] + self.feature_shift[client_id]
+
+    def save(self, path):
+        arrays = {"order": self.order, "offsets": self.offsets, "num_train": self.num_train,
+                  "meta": np.array(json.dumps(self.meta))}
+        if self.feature_scale is not None:
+            arrays["feature_scale"] = self.feature_scale
+            arrays["feature_shift"] = self.feature_shift
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["order"], data["offsets"], data["num_train"],
+                data["feature_scale"] if "feature_scale" in data else None,
+                data["feature_shift"] if "feature_shift" in data else None,
+                json.loads(str(data["meta"])),
+            )
+
+
+def _group_by_client(assignment, num_clients, rng, test_size):
+    """Build a plan from a per-row client assignment.
+
+    Rows are shuffled first so the stable (radix) sort by client leaves every
+    client's rows in random order.
+    """
+    perm = rng.permutation(len(assignment))
+    dtype = np.int16 if num_clients < np.iinfo(np.int16).max else np.int32
+    order = perm[np.argsort(assignment[perm].astype(dtype), kind="stable")]
+    sizes = np.bincount(assignment, minlength=num_clients)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    num_train = sizes - np.ceil(sizes * test_size).astype(np.int64)
+    return order, offsets, num_train
+
+
+def _contiguous_sizes(num_rows, num_clients):
+    # Same shard sizes as np.array_split
+    sizes = np.full(num_clients, num_rows // num_clients, dtype=np.int64)
+    sizes[: num_rows % num_clients] += 1
+    return sizes
+
+
+def iid_plan(num_rows, num_clients, seed=42, test_size=0.2):
+    """Contiguous ``np.array_split`` shards, shuffled within each shard."""
+    if not 0 < num_clients <= num_rows:
+        raise ValueError(f"num_clients must be in [1, {num_rows}], got {num_clients}")
+    sizes = _contiguous_sizes(num_rows, num_clients)
+    # Sorting by (shard, random key) shuffles every shard in one pass
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(num_rows), np.repeat(np.arange(num_clients), sizes)))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    num_train = sizes - np.ceil(sizes * test_size).astype(np.int64)
+    return PartitionPlan(order, offsets, num_train,
+                         meta={"strategy": "iid", "seed": seed, "test_size": test_size})
+
+
+def dirichlet_plan(y, num_clients, alpha=0.5, seed=42, test_size=0.2, min_size=2, max_tries=100):
+    """Label skew: each class is spread over clients with Dirichlet(alpha) proportions."""
+    y = np.asarray(y)
+    rng = np.random.default_rng(seed)
+    classes, y_codes = np.unique(y, return_inverse=True)
+    class_rows = [np.flatnonzero(y_codes == c) for c in range(len(classes))]
+
+    for _ in range(max_tries):
+        assignment = np.empty(len(y), dtype=np.int64)
+        for rows in class_rows:
+            proportions = rng.dirichlet(np.full(num_clients, alpha))
+            cuts = (np.cumsum(proportions)[:-1] * len(rows)).astype(np.int64)
+            counts = np.diff(np.concatenate([[0], cuts, [len(rows)]]))
+            assignment[rng.permutation(rows)] = np.repeat(np.arange(num_clients), counts)
+        if np.bincount(assignment, minlength=num_clients).min() >= min_size:
+            break
+    else:
+        raise ValueError(
+            f"Could not give every client {min_size} rows with alpha={alpha}; "
+            "increase alpha or reduce num_clients"
+        )
+
+    order, offsets, num_train = _group_by_client(assignment, num_clients, rng, test_size)
+    return PartitionPlan(order, offsets, num_train,
+                         meta={"strategy": "dirichlet", "alpha": alpha, "seed": seed,
+                               "test_size": test_size})
+
+
+def quantity_plan(num_rows, num_clients, power=1.5, seed=42, test_size=0.2, min_size=2):
+    """Quantity skew: client sizes follow a power law with exponent ``power``."""
+    if num_rows < num_clients * min_size:
+        raise ValueError(f"{num_rows} rows cannot give {num_clients} clients {min_size} rows each")
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(power, num_clients) + 1.0
+    spare = num_rows - num_clients * min_size
+    sizes = min_size + np.floor(weights / weights.sum() * spare).astype(np.int64)
+    # Hand out the rounding remainder to the largest clients
+    sizes[np.argsort(-weights)[: num_rows - sizes.sum()]] += 1
+
+    assignment = np.repeat(np.arange(num_clients), sizes)
+    order, offsets, num_train = _group_by_client(assignment, num_clients, rng, test_size)
+    return PartitionPlan(order, offsets, num_train,
+                         meta={"strategy": "quantity", "power": power, "seed": seed,
+                               "test_size": test_size})
+
+
+def feature_shift_plan(num_rows, num_features, num_clients, strength=0.5, seed=42, test_size=0.2):
+    """Feature shift: IID shards, each seen through a per-client affine transform."""
+    plan = iid_plan(num_rows, num_clients, seed, test_size)
+    rng = np.random.default_rng(seed + 1)
+    shape = (num_clients, num_features)
+    feature_scale = (1.0 + strength * rng.uniform(-0.5, 0.5, shape)).astype(np.float32)
+    feature_shift = (strength * rng.standard_normal(shape)).astype(np.float32)
+    return PartitionPlan(plan.order, plan.offsets, plan.num_train, feature_scale, feature_shift,
+                         meta={"strategy": "feature_shift", "strength": strength, "seed": seed,
+                               "test_size": test_size})
+
+
+def build_plan(strategy, y, num_clients, num_features=13, seed=42, test_size=0.2,
+               alpha=0.5, power=1.5, strength=0.5):
+    """Build a plan for one of ``STRATEGIES``."""
+    num_rows = len(y)
+    if strategy == "iid":
+        return iid_plan(num_rows, num_clients, seed, test_size)
+    if strategy == "dirichlet":
+        return dirichlet_plan(y, num_clients, alpha, seed, test_size)
+    if strategy == "quantity":
+        return quantity_plan(num_rows, num_clients, power, seed, test_size)
+    if strategy == "feature_shift":
+        return feature_shift_plan(num_rows, num_features, num_clients, strength, seed, test_size)
+    raise ValueError(f"Unknown partition strategy {strategy!r}; expected one of {STRATEGIES}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from dataset import get_loader
+
+    parser = argparse.ArgumentParser(description="Build and save a client partition plan.")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="iid")
+    parser.add_argument("--num-clients", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--alpha", type=float, default=0.5, help="Dirichlet concentration")
+    parser.add_argument("--power", type=float, default=1.5, help="Quantity-skew power-law exponent")
+    parser.add_argument("--strength", type=float, default=0.5, help="Feature-shift strength")
+    parser.add_argument("--out", required=True, help="Output .npz path")
+    args = parser.parse_args()
+
+    X, y = get_loader().arrays()
+    plan = build_plan(args.strategy, y, args.num_clients, X.shape[1], args.seed,
+                      args.test_size, args.alpha, args.power, args.strength)
+    plan.save(args.out)
+
+    print(f"Saved {args.strategy} plan for {plan.num_clients} clients to {args.out}")
+    y_ordered = np.asarray(y)[plan.order]
+    for client_id in range(plan.num_clients):
+        start, stop = plan.offsets[client_id], plan.offsets[client_id + 1]
+        positives = int(y_ordered[start:stop].sum())
+        print(f"  Client {client_id}: {stop - start} rows "
+              f"({plan.num_train[client_id]} train), {positives} positive")
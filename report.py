@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Plots of finished runs, rendered outside the training processes.
+
+``server.py`` and ``client_sim.py`` only persist their metrics as JSON
+(``save_metrics``) into ``FL_RESULTS_DIR`` (default ``results/``); they never
+import matplotlib. This script renders the figures of one or more such run
+directories in a single process:
+
+    python report.py                       # results/
+    python report.py telemetry/run_*       # many runs in one batch
+
+Each figure is cached under ``.report_cache/`` by a hash of the data it
+plots (and the figure version and dpi), so re-rendering unchanged runs only
+copies files, and matplotlib is not even imported when everything is cached.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+RESULTS_DIR = os.environ.get("FL_RESULTS_DIR", "results")
+CACHE_DIR = ".report_cache"
+DPI = 150
+# Bump when a figure's appearance changes, to invalidate cached renders
+FIGURE_VERSION = 1
+
+
+def save_metrics(name, data, directory=None):
+    """Atomically write ``data`` to ``<directory>/<name>_metrics.json``; returns the path."""
+    directory = RESULTS_DIR if directory is None else directory
+    os.makedirs(directory or ".", exist_ok=True)
+    path = os.path.join(directory, f"{name}_metrics.json")
+    fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}_", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, default=float)
+    os.replace(tmp, path)
+    return path
+
+
+def load_metrics(directory):
+    """``{name: data}`` of every ``*_metrics.json`` in ``directory``."""
+    metrics = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*_metrics.json"))):
+        with open(path) as f:
+            metrics[os.path.basename(path)[:-len("_metrics.json")]] = json.load(f)
+    return metrics
+
+
+def server_accuracy(metrics):
+    """``(rounds, accuracies, label)`` of the global model; centralized if it ran."""
+    history = metrics.get("server", {}).get("history")
+    if not history:
+        return None
+    for name, label in (("metrics_centralized", "Global accuracy (held-out split)"),
+                        ("metrics_distributed", "Aggregated client accuracy")):
+        accuracy = history[name].get("accuracy")
+        if accuracy:
+            return [r for r, _ in accuracy], [float(a) for _, a in accuracy], label
+    return None
+
+
+def client_accuracy(metrics):
+    """``{client_id: accuracies}`` of the clients that evaluated, over all client groups."""
+    accuracies = {}
+    for name, data in metrics.items():
+        if name == "client" or name.startswith("client_"):
+            accuracies.update(data.get("accuracies", {}))
+    return {client_id: values for client_id, values in accuracies.items() if values} or None
+
+
+def plot_server_accuracy(plt, data):
+    rounds, accuracies, label = data
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(rounds, accuracies, marker='o', label=label, linewidth=2, markersize=8)
+    plt.title("Federated Learning: Server Aggregated Accuracy per Round", fontsize=14, fontweight='bold')
+    plt.xlabel("Federated Round", fontsize=12)
+    return fig
+
+
+def plot_client_accuracy(plt, data):
+    fig = plt.figure(figsize=(10, 6))
+    for client_id, accuracies in sorted(data.items()):
+        plt.plot(range(1, len(accuracies) + 1), accuracies, marker='o',
+                 label=f'Client {client_id}', linewidth=2, markersize=8)
+    plt.title("Federated Learning: Client Accuracy per Round (DP Enabled)", fontsize=14, fontweight='bold')
+    plt.xlabel("Round", fontsize=12)
+    return fig
+
+
+# Figure name -> (extract the plotted data from a run's metrics, draw it)
+FIGURES = {
+    "server_accuracy": (server_accuracy, plot_server_accuracy),
+    "client_accuracy": (client_accuracy, plot_client_accuracy),
+}
+
+
+def figure_key(name, data, dpi):
+    payload = json.dumps([name, FIGURE_VERSION, dpi, data], sort_keys=True, default=float)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class Renderer:
+    """Render figures into a content-addressed cache; matplotlib is loaded on first miss."""
+
+    def __init__(self, cache_dir=CACHE_DIR, dpi=DPI, force=False):
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self.force = force
+        self._plt = None
+
+    @property
+    def plt(self):
+        if self._plt is None:
+            import matplotlib
+            matplotlib.use('Agg')  # Use non-interactive backend
+            import matplotlib.pyplot as plt
+            self._plt = plt
+        return self._plt
+
+    def render(self, name, data, out_path):
+        """Write figure ``name`` of ``data`` to ``out_path``; returns True on a cache hit."""
+        cached = os.path.join(self.cache_dir, f"{name}_{figure_key(name, data, self.dpi)}.png")
+        hit = os.path.exists(cached) and not self.force
+        if not hit:
+            plt = self.plt
+            fig = FIGURES[name][1](plt, data)
+            plt.ylabel("Accuracy", fontsize=12)
+            plt.ylim(0, 1)
+            plt.grid(True, alpha=0.3)
+            plt.legend(fontsize=11)
+            plt.tight_layout()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp.png"
+            fig.savefig(tmp, dpi=self.dpi, bbox_inches='tight')
+            plt.close(fig)
+            os.replace(tmp, cached)
+        shutil.copyfile(cached, out_path)
+        return hit
+
+    def render_run(self, directory, out_dir=None):
+        """Render every figure the metrics in ``directory`` support; returns the written paths."""
+        metrics = load_metrics(directory)
+        out_dir = directory if out_dir is None else out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        written = []
+        for name, (extract, _) in FIGURES.items():
+            data = extract(metrics)
+            if data is None:
+                continue
+            out_path = os.path.join(out_dir, f"{name}.png")
+            hit = self.render(name, data, out_path)
+            print(f"[Report] {out_path}{' (cached)' if hit else ''}")
+            written.append(out_path)
+        return written
+
+
+def render_run(directory=None, out_dir=None, **kwargs):
+    return Renderer(**kwargs).render_run(RESULTS_DIR if directory is None else directory, out_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render plots of finished federated runs.")
+    parser.add_argument("runs", nargs="*", default=[RESULTS_DIR],
+                        help="Run directories holding *_metrics.json (globs allowed)")
+    parser.add_argument("--out-dir", default=None,
+                        help="Write the figures here instead of into each run directory "
+                             "(only with a single run)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--force", action="store_true", help="Ignore cached figures")
+    args = parser.parse_args()
+
+    runs = sorted({path for pattern in args.runs for path in glob.glob(pattern)
+                   if os.path.isdir(path)})
+    if args.out_dir and len(runs) > 1:
+        parser.error("--out-dir needs a single run directory")
+    renderer = Renderer(args.cache_dir, args.dpi, args.force)
+    rendered = sum(len(renderer.render_run(run, args.out_dir)) for run in runs)
+    print(f"[Report] {rendered} figures for {len(runs)} runs")
+    return 0 if rendered else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
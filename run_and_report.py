@@ -8,8 +8,11 @@ import sys
 import time
 import os
 import json
+import re
 from datetime import datetime
 
+from launch import spawn, wait_for_port
+
 def check_dependencies():
     """Check if required packages are installed."""
     missing = []
@@ -63,6 +66,25 @@ def install_dependencies(missing):
                 return False
     return True
 
+class RoundProgress:
+    """Print a line per round from the server's output as it is produced."""
+
+    ROUND_RESULT = re.compile(
+        r"\[Server\] Round (\d+) - Centralized loss: ([\d.]+), accuracy: ([\d.]+)")
+
+    def __init__(self):
+        self.start = time.time()
+
+    def __call__(self, line):
+        match = self.ROUND_RESULT.search(line)
+        if match:
+            server_round, loss, accuracy = match.groups()
+            print(f"  Round {server_round}: global loss {float(loss):.4f}, "
+                  f"accuracy {float(accuracy):.4f} ({time.time() - self.start:.1f}s)",
+                  flush=True)
+        elif line.startswith(("ERROR", "Traceback")):
+            print(f"  [server] {line}", flush=True)
+
 def run_federated_learning():
     """Run the federated learning experiment."""
     print("=" * 70)
@@ -81,100 +103,107 @@ def run_federated_learning():
             return None
     print("All dependencies available.\n")
     
-    # Start server in background
-    print("Starting Flower server...")
-    server_process = subprocess.Popen(
-        [sys.executable, "server.py"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    # Server and clients log structured events here (see telemetry.py),
+    # next to their console output and final metrics (see report.py)
+    telemetry_dir = os.path.join("telemetry", datetime.now().strftime("run_%Y%m%d_%H%M%S"))
+    env = dict(os.environ, FL_TELEMETRY_DIR=telemetry_dir, FL_RESULTS_DIR=telemetry_dir)
+    server_log = os.path.join(telemetry_dir, "server.log")
+    client_log = os.path.join(telemetry_dir, "clients.log")
     
-    # Wait for server to start
-    time.sleep(5)
+    # Start server in background; its output is streamed to server.log and
+    # scanned for round results as it arrives
+    print("Starting Flower server...")
+    progress = RoundProgress()
+    server_process, server_stream = spawn(["server.py"], server_log, on_line=progress, env=env)
     
-    if server_process.poll() is not None:
-        stdout, stderr = server_process.communicate()
-        print(f"ERROR: Server failed to start!")
-        print(f"STDOUT: {stdout}")
-        print(f"STDERR: {stderr}")
+    # Wait until the server accepts connections
+    try:
+        startup_latency = wait_for_port(process=server_process)
+    except (RuntimeError, TimeoutError) as e:
+        server_process.kill()
+        server_process.wait()
+        server_stream.join(timeout=5)
+        print(f"ERROR: Server failed to start! {e}")
+        print(f"Last server output ({server_log}):\n{server_stream.tail(40)}")
         return None
     
-    print("Server started successfully.\n")
+    print(f"Server started successfully in {startup_latency:.2f} seconds.\n")
     
     # Run clients
     print("Starting federated learning clients...")
     print("-" * 70)
     
     start_time = time.time()
+    progress.start = start_time
     
-    client_process = subprocess.Popen(
-        [sys.executable, "client_sim.py"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    
-    stdout, stderr = client_process.communicate()
+    client_process, client_stream = spawn(["client_sim.py"], client_log, env=env)
+    client_process.wait()
+    client_stream.join()
     
     end_time = time.time()
     elapsed_time = end_time - start_time
+    print("-" * 70)
+    if client_process.returncode != 0:
+        print(f"WARNING: Clients exited with code {client_process.returncode}. "
+              f"Last client output ({client_log}):\n{client_stream.tail(20)}")
     
-    # Stop server
-    server_process.terminate()
-    server_stdout, server_stderr = server_process.communicate()
+    # The server exits after its last round; let it write its metrics and summary
+    try:
+        server_process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        server_process.terminate()
+        server_process.wait()
+    server_stream.join(timeout=5)
     
-    # Parse results from output
     results = {
         "experiment_time": elapsed_time,
+        "startup_latency": startup_latency,
+        "telemetry_dir": telemetry_dir,
         "start_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        "client_output": stdout,
-        "client_errors": stderr,
-        "server_output": server_stdout,
-        "server_errors": server_stderr
+        "server_log": server_log,
+        "client_log": client_log,
     }
     
     return results
 
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else 0.0
+
 def extract_metrics(results):
-    """Extract metrics from experiment results."""
+    """Extract metrics from the telemetry the server and clients recorded."""
+    from telemetry import read_events
+
     metrics = {
         "final_accuracies": {},
         "training_losses": {},
         "rounds_completed": 0,
-        "total_time": results["experiment_time"] if results else 0
+        "privacy_spent": {},
+        "server_accuracies": {},
+        "timings": {},
+        "total_time": results["experiment_time"] if results else 0,
+        "startup_latency": results["startup_latency"] if results else 0
     }
     
     if not results:
         return metrics
     
-    # Parse client output for accuracies
-    client_output = results.get("client_output", "")
-    lines = client_output.split('\n')
+    events = read_events(results["telemetry_dir"])
     
+    # Client-side evaluation and training, in time order
     client_accuracies = {}
-    for line in lines:
-        if "[Client" in line and "Accuracy:" in line:
-            try:
-                # Extract client ID and accuracy
-                parts = line.split()
-                client_id = None
-                accuracy = None
-                for i, part in enumerate(parts):
-                    if part == "Client":
-                        client_id = int(parts[i+1].rstrip(']'))
-                    if part == "Accuracy:":
-                        accuracy = float(parts[i+1])
-                
-                if client_id is not None and accuracy is not None:
-                    if client_id not in client_accuracies:
-                        client_accuracies[client_id] = []
-                    client_accuracies[client_id].append(accuracy)
-            except:
-                pass
+    for event in events:
+        name = f"Client_{event.get('client_id')}"
+        if event["event"] == "evaluate":
+            client_accuracies.setdefault(name, []).append(event["accuracy"])
+        elif event["event"] == "fit":
+            metrics["training_losses"].setdefault(name, []).append(event.get("loss"))
+            if "epsilon" in event:
+                # The latest value is the total spent so far
+                metrics["privacy_spent"][name] = event["epsilon"]
     
     metrics["final_accuracies"] = {
-        f"Client_{k}": {
+        k: {
             "all_rounds": v,
             "final": v[-1] if v else 0.0,
             "max": max(v) if v else 0.0,
@@ -184,27 +213,43 @@ def extract_metrics(results):
         for k, v in client_accuracies.items()
     }
     
-    # Count rounds
-    if client_accuracies:
-        metrics["rounds_completed"] = len(list(client_accuracies.values())[0])
-    
-    # Parse server output for aggregated metrics
-    server_output = results.get("server_output", "")
-    server_lines = server_output.split('\n')
-    
-    aggregated_accuracies = []
-    for line in server_lines:
-        if "Round" in line and "Loss" in line:
-            try:
-                # Extract round and loss
-                pass
-            except:
-                pass
+    # Server rounds: centralized accuracy and the timing breakdown
+    rounds = [e for e in events if e["event"] == "round"]
+    client_fits = [e for e in events if e["event"] == "client_fit"]
+    metrics["server_accuracies"] = {e["round"]: e["accuracy"] for e in rounds
+                                    if e.get("accuracy") is not None}
+    metrics["rounds_completed"] = max((e["round"] for e in rounds), default=0)
+    if rounds:
+        metrics["timings"] = {
+            "round_fit_time": _mean(e.get("fit_time") for e in rounds),
+            "aggregate_time": _mean(e.get("aggregate_time") for e in rounds),
+            "evaluate_time": _mean(e.get("evaluate_time") for e in rounds),
+            "client_evaluate_time": _mean(e.get("client_evaluate_time") for e in rounds),
+            "checkpoint_time": _mean(e.get("checkpoint_time") for e in rounds),
+            "client_fit_time": _mean(e.get("fit_time") for e in client_fits),
+            "client_serialize_time": _mean(e.get("serialize_time") for e in client_fits),
+            "client_deserialize_time": _mean(e.get("deserialize_time") for e in client_fits),
+            "network_time": _mean(e.get("network_time") for e in client_fits),
+            "queue_wait": _mean(e.get("queue_wait") for e in client_fits),
+            "bytes_up": sum(e.get("bytes_up") or 0 for e in rounds),
+            "bytes_down": sum(e.get("bytes_down") or 0 for e in rounds),
+        }
     
     return metrics
 
+def render_figures(run_dir):
+    """Plot the run's saved metrics (see report.py); figures are optional."""
+    try:
+        from report import render_run
+        return render_run(run_dir)
+    except Exception as e:
+        print(f"Could not render figures: {e}")
+        return []
+
 def generate_report(metrics, results):
     """Generate comprehensive performance report."""
+    from privacy import DEFAULT_DELTA
+
     report = f"""
 {'=' * 70}
 FEDERATED LEARNING - FINAL PERFORMANCE REPORT
@@ -221,9 +266,20 @@ EXPERIMENT CONFIGURATION:
   * L2 Norm Clip: 1.0
   * Noise Multiplier: 0.5
   * Microbatches: 32
+  * Delta: {DEFAULT_DELTA:g}
+
+PRIVACY BUDGET SPENT (RDP accountant):
+"""
+    if metrics["privacy_spent"]:
+        for client_name, epsilon in sorted(metrics["privacy_spent"].items()):
+            report += f"  - {client_name}: epsilon = {epsilon:.4f}\n"
+    else:
+        report += "  - No privacy accounting reported by the clients\n"
 
+    report += f"""
 PERFORMANCE METRICS:
 {'-' * 70}
+Server Startup Time: {metrics['startup_latency']:.2f} seconds
 Total Training Time: {metrics['total_time']:.2f} seconds ({metrics['total_time']/60:.2f} minutes)
 Rounds Completed: {metrics['rounds_completed']}
 
@@ -252,10 +308,36 @@ AGGREGATED STATISTICS:
   - Overall Best Accuracy: {max(all_maxes):.4f} ({max(all_maxes)*100:.2f}%)
 """
     
+    timings = metrics.get("timings")
+    if timings:
+        report += f"""
+TIMING BREAKDOWN (mean per round / per client update, seconds):
+  - Round fit phase (dispatch to last update): {timings['round_fit_time']:.4f}
+    * Client training: {timings['client_fit_time']:.4f}
+    * Client (de)serialization: {timings['client_deserialize_time']:.4f} / {timings['client_serialize_time']:.4f}
+    * Network and transport: {timings['network_time']:.4f}
+    * Queue wait before aggregation: {timings['queue_wait']:.4f}
+  - Aggregation: {timings['aggregate_time']:.4f}
+  - Centralized evaluation: {timings['evaluate_time']:.4f}
+  - Client evaluation round: {timings['client_evaluate_time']:.4f}
+  - Checkpointing: {timings['checkpoint_time']:.4f}
+  - Bytes transferred: {timings['bytes_up'] / 1024:.1f} KiB up, {timings['bytes_down'] / 1024:.1f} KiB down
+"""
+    
+    if metrics.get("server_accuracies"):
+        progression = [f"{acc:.4f}" for _, acc in sorted(metrics["server_accuracies"].items())]
+        report += f"""
+GLOBAL MODEL (centralized evaluation on the pooled held-out split):
+  - Final Accuracy: {progression[-1]}
+  - Accuracy Progression (by round): {progression}
+"""
+    
+    figures = "".join(f"  - {path}: Accuracy plot\n" for path in results.get("figures", []))
     report += f"""
 FILES GENERATED:
-  - client_accuracy.png: Client accuracy progression plot
-  - server_accuracy.png: Server aggregated accuracy plot
+  - {results.get('telemetry_dir', 'telemetry')}/*.jsonl: Per-round and per-client telemetry
+  - {results.get('telemetry_dir', 'telemetry')}/*_metrics.json: Final server and client metrics
+{figures}  - {results.get('server_log', 'server.log')}, {results.get('client_log', 'clients.log')}: Full server and client output
 
 END TIME: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 {'=' * 70}
@@ -270,6 +352,7 @@ def main():
         
         if results:
             metrics = extract_metrics(results)
+            results["figures"] = render_figures(results["telemetry_dir"])
             report = generate_report(metrics, results)
             
             # Save report
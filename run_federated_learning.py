@@ -6,9 +6,10 @@ This script starts the server and clients in separate processes.
 
 import subprocess
 import sys
-import time
 import os
 
+from launch import spawn, wait_for_port
+
 def main():
     print("=" * 60)
     print("Federated Learning with Privacy Preservation")
@@ -27,26 +28,25 @@ def main():
         sys.exit(1)
     
     try:
-        # Start server in background
+        # Start server in background; its output goes to logs/server.log
         print("Starting server...")
-        server_process = subprocess.Popen(
-            [sys.executable, "server.py"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Wait a bit for server to start
-        time.sleep(3)
+        server_log = os.path.join("logs", "server.log")
+        server_process, server_stream = spawn(["server.py"], server_log)
         
-        # Check if server is still running
-        if server_process.poll() is not None:
-            print("Error: Server failed to start!")
-            stdout, stderr = server_process.communicate()
-            print("Server output:", stdout.decode())
-            print("Server errors:", stderr.decode())
+        # Wait until the server accepts connections
+        try:
+            startup_latency = wait_for_port(process=server_process)
+        except (RuntimeError, TimeoutError) as e:
+            print(f"Error: Server failed to start! {e}")
+            server_process.kill()
+            server_process.wait()
+            server_stream.join(timeout=5)
+            print(f"Server output ({server_log}):")
+            print(server_stream.tail(40))
             sys.exit(1)
         
-        print("Server started successfully!")
+        print(f"Server started successfully in {startup_latency:.2f} seconds!")
+        print(f"Server output is logged to {server_log}")
         print("Starting clients...\n")
         
         # Start clients (this will block until training completes)
@@ -59,12 +59,28 @@ def main():
         # Wait for clients to finish
         client_process.wait()
         
+        # The server exits after its last round; let it write its summary
+        try:
+            server_process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server_process.terminate()
+        server_stream.join(timeout=5)
+        
         print("\n" + "=" * 60)
         print("Federated Learning Training Complete!")
         print("=" * 60)
-        print("\nCheck the generated plots:")
-        print("- client_accuracy.png")
-        print("- server_accuracy.png")
+        
+        # Plots are rendered from the saved metrics, outside the training processes
+        try:
+            from report import render_run
+            figures = render_run()
+        except Exception as e:
+            print(f"Could not render figures: {e}")
+            figures = []
+        if figures:
+            print("\nCheck the generated plots:")
+            for path in figures:
+                print(f"- {path}")
         
     except KeyboardInterrupt:
         print("\n\nStopping all processes...")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Run a hierarchical federation on one machine.
+
+Starts the root ``server.py``, one ``aggregator.py`` per group on ports
+8082, 8083, ... and one ``client_sim.py`` per aggregator, each process
+logging to ``logs/hierarchy/``. The root only sees the aggregators:
+
+    python run_hierarchy.py --aggregators 2 --clients-per-aggregator 4
+    python run_hierarchy.py --aggregators 4 --clients-per-aggregator 8 --server-opt adam
+
+Arguments not listed below are passed on to ``server.py``.
+"""
+
+import argparse
+import os
+import subprocess
+
+from launch import EDGE_PORT, SERVER_PORT, spawn, wait_for_port
+
+LOG_DIR = os.path.join("logs", "hierarchy")
+
+
+def stop(processes):
+    for process, _ in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process, stream in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        stream.join(timeout=5)
+
+
+def progress(name):
+    """Echo a process's round lines to the console as they are logged."""
+    def on_line(line):
+        if line.startswith(("[Server] Round", "[Edge")):
+            print(f"[{name}] {line}")
+    return on_line
+
+
+def start(name, args, port=None):
+    """Spawn ``args`` logging to ``LOG_DIR/<name>.log``; wait for ``port`` if given."""
+    log_path = os.path.join(LOG_DIR, f"{name}.log")
+    process, stream = spawn(args, log_path, on_line=progress(name))
+    if port is not None:
+        try:
+            waited = wait_for_port(port, process=process)
+        except (RuntimeError, TimeoutError) as e:
+            stop([(process, stream)])
+            print(f"Error: {name} failed to start! {e}\n{name} output ({log_path}):")
+            print(stream.tail(40))
+            raise
+        print(f"Started {name} on port {port} in {waited:.2f} seconds")
+    return process, stream
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run server.py, aggregators and client groups locally as a two-level "
+                    "federation. Unknown arguments are passed on to server.py.")
+    parser.add_argument("--aggregators", type=int, default=2)
+    parser.add_argument("--clients-per-aggregator", type=int, default=2)
+    parser.add_argument("--edge-codec", default="none",
+                        help="Compression between clients and aggregators (--codec sets the "
+                             "one between aggregators and the root)")
+    args, server_args = parser.parse_known_args()
+    total = args.aggregators * args.clients_per_aggregator
+
+    print("=" * 60)
+    print(f"Hierarchical federation: root server, {args.aggregators} aggregators, "
+          f"{total} clients")
+    print(f"Logs: {LOG_DIR}/")
+    print("=" * 60)
+
+    processes = []
+    try:
+        processes.append(start("server", [
+            "server.py", "--num-clients", str(args.aggregators),
+            "--min-fit-clients", str(args.aggregators), "--data-clients", str(total),
+            *server_args,
+        ], SERVER_PORT))
+        for index in range(args.aggregators):
+            processes.append(start(f"aggregator_{index}", [
+                "aggregator.py", "--index", str(index), "--port", str(EDGE_PORT + index),
+                "--num-clients", str(args.clients_per_aggregator), "--codec", args.edge_codec,
+            ], EDGE_PORT + index))
+        for index in range(args.aggregators):
+            processes.append(start(f"clients_{index}", [
+                "client_sim.py", "--server", f"localhost:{EDGE_PORT + index}",
+                "--num-clients", str(args.clients_per_aggregator),
+                "--first-client", str(index * args.clients_per_aggregator),
+                "--total-clients", str(total),
+            ]))
+
+        # Clients finish first, then their aggregators, then the root writes its summary
+        failed = []
+        for process, stream in reversed(processes):
+            if process.wait() != 0:
+                failed.append(os.path.basename(stream.path))
+            stream.join(timeout=5)
+    except (RuntimeError, TimeoutError):
+        stop(processes)
+        return 1
+    except KeyboardInterrupt:
+        print("\nStopping all processes...")
+        stop(processes)
+        return 1
+
+    print("\n" + "=" * 60)
+    if failed:
+        print(f"Finished with errors, see {', '.join(failed)} in {LOG_DIR}/")
+    else:
+        print("Hierarchical training complete")
+    print("=" * 60)
+    print(processes[0][1].tail(20))
+
+    # Plots are rendered from the saved metrics, outside the training processes
+    try:
+        from report import render_run
+        render_run()
+    except Exception as e:
+        print(f"Could not render figures: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+"""
+Cohort sampling for large federations.
+
+``ScheduledClientManager`` replaces Flower's ``SimpleClientManager``, whose
+``sample`` builds a list of every connected client each round. Clients are
+kept in an indexed registry instead: idle clients sit in swap-remove index
+sets, bucketed by data size and by observed latency, so drawing a cohort of
+``k`` costs O(k) (plus the handful of buckets) however many clients are
+connected. Clients that are still training (e.g. stragglers from a round that
+closed at its deadline) are marked busy and are not sampled until they return.
+
+Sampling policies (``POLICIES``):
+
+- ``uniform``: every idle client equally likely
+- ``stratified``: the cohort is split across data-size strata (powers of two
+  of ``num_examples``) in proportion to their populations, so small and large
+  clients are always both represented
+- ``latency``: strata by past round-trip time (powers of two of seconds),
+  weighted towards faster tiers; clients without a measurement yet are
+  treated like the fastest tier so they get measured
+
+Statistics come from ``release`` calls made by ``servers.StreamingServer``
+whenever a client's fit returns.
+"""
+
+import math
+import random
+import threading
+
+import flwr as fl
+
+POLICIES = ("uniform", "stratified", "latency")
+
+# Weight of the newest latency measurement in the running average
+LATENCY_SMOOTHING = 0.3
+
+
+class IndexedSet:
+    """Set with O(1) add/discard and O(k) uniform sampling of k members."""
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        position = self.positions.pop(item, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if position < len(self.items):
+            self.items[position] = last
+            self.positions[last] = position
+
+    def sample(self, k, rng, accept=None, exclude=()):
+        """Draw up to ``k`` distinct members satisfying ``accept``."""
+        n = len(self.items)
+        if accept is None and not exclude:
+            return [self.items[i] for i in rng.sample(range(n), min(k, n))]
+        chosen, seen = [], set()
+        while len(chosen) < k and len(seen) < n:
+            i = rng.randrange(n)
+            if i in seen:
+                continue
+            seen.add(i)
+            item = self.items[i]
+            if item not in exclude and (accept is None or accept(item)):
+                chosen.append(item)
+        return chosen
+
+
+class ClientStats:
+    __slots__ = ("num_examples", "latency", "rounds", "dropouts")
+
+    def __init__(self):
+        self.num_examples = None
+        self.latency = None
+        self.rounds = 0
+        self.dropouts = 0
+
+
+def size_stratum(num_examples):
+    return None if not num_examples else int(math.log2(num_examples))
+
+
+def latency_tier(latency):
+    return None if latency is None else math.floor(math.log2(max(latency, 1e-3)))
+
+
+class ClientRegistry:
+    """Idle/busy state and statistics of every connected client, indexed by stratum."""
+
+    def __init__(self):
+        self.stats = {}
+        self.idle = IndexedSet()
+        self.by_size = {}
+        self.by_latency = {}
+        self.lock = threading.Condition()
+
+    def _index(self, cid):
+        stats = self.stats[cid]
+        self.idle.add(cid)
+        self.by_size.setdefault(size_stratum(stats.num_examples), IndexedSet()).add(cid)
+        self.by_latency.setdefault(latency_tier(stats.latency), IndexedSet()).add(cid)
+
+    def _unindex(self, cid):
+        stats = self.stats[cid]
+        self.idle.discard(cid)
+        self.by_size.get(size_stratum(stats.num_examples), IndexedSet()).discard(cid)
+        self.by_latency.get(latency_tier(stats.latency), IndexedSet()).discard(cid)
+
+    def add(self, cid):
+        with self.lock:
+            self.stats[cid] = ClientStats()
+            self._index(cid)
+            self.lock.notify_all()
+
+    def remove(self, cid):
+        with self.lock:
+            if cid in self.stats:
+                self._unindex(cid)
+                del self.stats[cid]
+
+    def acquire(self, cid):
+        """Mark a client busy; it is not sampled again until ``release``."""
+        with self.lock:
+            if cid in self.stats:
+                self._unindex(cid)
+
+    def release(self, cid, latency=None, num_examples=None, failed=False):
+        """Mark a client idle again and fold in what its last fit showed."""
+        with self.lock:
+            stats = self.stats.get(cid)
+            if stats is None:
+                return
+            stats.rounds += 1
+            stats.dropouts += int(failed)
+            if num_examples:
+                stats.num_examples = num_examples
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (
+                    LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * stats.latency)
+            self._index(cid)
+            self.lock.notify_all()
+
+    def wait_idle(self, num_clients, timeout):
+        with self.lock:
+            return self.lock.wait_for(lambda: len(self.idle) >= num_clients, timeout=timeout)
+
+
+def allocate(k, sizes, weights):
+    """Split ``k`` draws across buckets in proportion to ``weights``, capped by ``sizes``."""
+    counts = [0] * len(sizes)
+    active = [i for i in range(len(sizes)) if sizes[i] > 0 and weights[i] > 0]
+    remaining = min(k, sum(sizes[i] for i in active))
+    while remaining > 0 and active:
+        total = sum(weights[i] for i in active)
+        shares = {i: remaining * weights[i] / total for i in active}
+        given = 0
+        for i in active:
+            take = min(sizes[i] - counts[i], int(shares[i]))
+            counts[i] += take
+            given += take
+        if given == 0:
+            # Less than one draw per bucket left: largest fractional shares first
+            for i in sorted(active, key=lambda i: shares[i], reverse=True)[:remaining]:
+                counts[i] += 1
+                given += 1
+        remaining -= given
+        active = [i for i in active if counts[i] < sizes[i]]
+    return counts
+
+
+def _sample_strata(registry, buckets, weights, k, rng, accept):
+    keys = list(buckets)
+    counts = allocate(k, [len(buckets[key]) for key in keys], [weights[key] for key in keys])
+    cohort = []
+    for key, count in zip(keys, counts):
+        if count:
+            cohort += buckets[key].sample(count, rng, accept)
+    if len(cohort) < k:
+        # Some strata were short of acceptable clients: top up from everyone idle
+        cohort += registry.idle.sample(k - len(cohort), rng, accept, exclude=set(cohort))
+    return cohort
+
+
+def sample_uniform(registry, k, rng, accept=None):
+    return registry.idle.sample(k, rng, accept)
+
+
+def sample_stratified(registry, k, rng, accept=None):
+    buckets = registry.by_size
+    return _sample_strata(registry, buckets, {key: len(b) for key, b in buckets.items()},
+                          k, rng, accept)
+
+
+def sample_latency(registry, k, rng, accept=None):
+    buckets = registry.by_latency
+    known = [tier for tier in buckets if tier is not None and len(buckets[tier])]
+    fastest = min(known) if known else 0
+    # Each tier is twice as slow as the one before it and gets half the draws per client
+    weights = {tier: len(bucket) * 2.0 ** -((fastest if tier is None else tier) - fastest)
+               for tier, bucket in buckets.items()}
+    return _sample_strata(registry, buckets, weights, k, rng, accept)
+
+
+SAMPLERS = {"uniform": sample_uniform, "stratified": sample_stratified, "latency": sample_latency}
+
+
+class ScheduledClientManager(fl.server.SimpleClientManager):
+    """Client manager sampling cohorts in O(cohort) under a ``POLICIES`` policy."""
+
+    def __init__(self, policy="uniform", seed=None, idle_timeout=86400):
+        if policy not in SAMPLERS:
+            raise ValueError(f"Unknown sampling policy {policy!r}; expected one of {POLICIES}")
+        super().__init__()
+        self.policy = policy
+        self.registry = ClientRegistry()
+        self.rng = random.Random(seed)
+        self.idle_timeout = idle_timeout
+
+    def register(self, client):
+        registered = super().register(client)
+        if registered:
+            self.registry.add(client.cid)
+        return registered
+
+    def unregister(self, client):
+        super().unregister(client)
+        self.registry.remove(client.cid)
+
+    def acquire(self, cid):
+        self.registry.acquire(cid)
+
+    def release(self, cid, latency=None, num_examples=None, failed=False):
+        self.registry.release(cid, latency, num_examples, failed)
+
+    def sample(self, num_clients, min_num_clients=None, criterion=None):
+        if min_num_clients is None:
+            min_num_clients = num_clients
+        self.wait_for(min_num_clients)
+        # Stragglers from a closed round may still be busy; sample from whoever is idle
+        self.registry.wait_idle(1, self.idle_timeout)
+
+        accept = None
+        if criterion is not None:
+            accept = lambda cid: cid in self.clients and criterion.select(self.clients[cid])
+        with self.registry.lock:
+            cids = SAMPLERS[self.policy](self.registry, num_clients, self.rng, accept)
+        # A client may have disconnected since it was drawn
+        cohort = [self.clients[cid] for cid in cids if cid in self.clients]
+        if len(cohort) < num_clients:
+            print(f"[Server] Sampled {len(cohort)} of {num_clients} clients; the rest are busy "
+                  f"or not eligible")
+        return cohort
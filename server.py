@@ -1,10 +1,78 @@
+import argparse
+
 import flwr as fl
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+from launch import SERVER_PORT
+from checkpoint import CHECKPOINT_DIR, CheckpointManager, history_to_dict
+from servers import AsyncServer, CheckpointServer, StreamingServer
+from codec import CODECS
+from evaluation import CentralizedEvaluator
+from scheduler import POLICIES, ScheduledClientManager
+from server_opt import SERVER_OPTIMIZERS
+from strategy import FedBuff, FlatFedAvg, StreamingFedAvg
+from report import save_metrics
+from telemetry import get_telemetry
 
 NUM_ROUNDS = 5
 
+parser = argparse.ArgumentParser(description="Flower federated learning server.")
+parser.add_argument("--strategy", choices=("fedavg", "streaming", "async"), default="fedavg",
+                    help="fedavg: aggregate once all results are in; "
+                         "streaming: fold each result in as it arrives; "
+                         "async: FedBuff, no synchronous rounds")
+parser.add_argument("--buffer-size", type=int, default=2,
+                    help="async: client updates per global step")
+parser.add_argument("--staleness-exponent", type=float, default=0.5,
+                    help="async: stale updates are weighted by (1 + staleness) ** -exponent")
+parser.add_argument("--max-epsilon", type=float, default=None,
+                    help="Stop sampling clients once their reported epsilon reaches this budget")
+parser.add_argument("--server-opt", choices=list(SERVER_OPTIMIZERS), default="none",
+                    help="Server optimizer stepping along the averaged client update: "
+                         "avgm (FedAvgM), adam (FedAdam), yogi (FedYogi); none is plain FedAvg")
+parser.add_argument("--server-lr", type=float, default=None,
+                    help="Server learning rate (default: 1.0 for avgm, 0.1 for adam/yogi; "
+                         "0.01 for adam/yogi with --strategy async)")
+parser.add_argument("--codec", default="none",
+                    help=f"Compression for client updates: {', '.join(CODECS)}")
+parser.add_argument("--client-eval-every", type=int, default=NUM_ROUNDS,
+                    help="Ask clients to evaluate every N rounds (0: never); per-round accuracy "
+                         "comes from centralized evaluation on the server")
+parser.add_argument("--no-central-eval", action="store_true",
+                    help="Skip centralized evaluation on the pooled held-out split")
+parser.add_argument("--num-clients", type=int, default=2,
+                    help="Clients in the federation; training starts once they are connected")
+parser.add_argument("--data-clients", type=int, default=None,
+                    help="Clients the data is partitioned over, for the centralized held-out "
+                         "split (default: --num-clients; the total client count behind "
+                         "aggregator.py processes)")
+parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+parser.add_argument("--fraction-fit", type=float, default=1.0,
+                    help="Fraction of the connected clients sampled for training each round")
+parser.add_argument("--fraction-evaluate", type=float, default=1.0,
+                    help="Fraction of the connected clients sampled for client evaluation")
+parser.add_argument("--min-fit-clients", type=int, default=2,
+                    help="Minimum cohort size for training and evaluation")
+parser.add_argument("--sampling", choices=POLICIES, default="uniform",
+                    help="Cohort sampling policy (stratified/latency need --strategy streaming)")
+parser.add_argument("--overprovision", type=float, default=0.0,
+                    help="streaming: sample this fraction more clients than needed and close "
+                         "the round once enough updates arrive")
+parser.add_argument("--round-deadline", type=float, default=None,
+                    help="streaming: close a round after this many seconds with the updates so far")
+parser.add_argument("--seed", type=int, default=None, help="Seed for cohort sampling")
+parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR,
+                    help="Directory for server checkpoints (also FL_CHECKPOINT_DIR)")
+parser.add_argument("--checkpoint-every", type=int, default=1,
+                    help="Checkpoint every N rounds (0: never); the last round is always saved")
+parser.add_argument("--resume", action="store_true",
+                    help="Continue from the latest checkpoint in --checkpoint-dir")
+args = parser.parse_args()
+if args.strategy != "streaming" and (args.sampling != "uniform" or args.overprovision
+                                     or args.round_deadline is not None):
+    # Only the streaming server records client statistics and closes rounds early
+    parser.error("--sampling stratified/latency, --overprovision and --round-deadline "
+                 "require --strategy streaming")
+NUM_CLIENTS = args.num_clients
+
 # Collect aggregated metrics
 aggregated_losses = []
 aggregated_accuracies = []
@@ -58,37 +126,85 @@ def aggregate_metrics(metrics):
         traceback.print_exc()
         return {}
 
-# Strategy with callbacks to track progress
-strategy = fl.server.strategy.FedAvg(
-    fraction_fit=1.0,  # all clients participate
-    fraction_evaluate=1.0,  # all clients participate in evaluation
-    min_fit_clients=2,
-    min_evaluate_clients=2,  # Changed from min_eval_clients
-    min_available_clients=2,
+# Strategy with callbacks to track progress (FedAvg over flat weight vectors)
+strategy_class = {"fedavg": FlatFedAvg, "streaming": StreamingFedAvg, "async": FedBuff}[args.strategy]
+strategy_options = {}
+if args.strategy == "async":
+    strategy_options = {"buffer_size": args.buffer_size,
+                        "staleness_exponent": args.staleness_exponent}
+# Score the global model on the clients' pooled test splits, without a client round trip
+evaluate_fn = None if args.no_central_eval else CentralizedEvaluator.from_clients(
+    args.data_clients or NUM_CLIENTS)
+strategy = strategy_class(
+    codec=args.codec,
+    max_epsilon=args.max_epsilon,
+    evaluate_every=args.client_eval_every,
+    overprovision=args.overprovision,
+    server_opt=args.server_opt,
+    server_lr=args.server_lr,
+    **strategy_options,
+    fraction_fit=args.fraction_fit,
+    fraction_evaluate=args.fraction_evaluate,
+    min_fit_clients=args.min_fit_clients,
+    min_evaluate_clients=args.min_fit_clients,  # Changed from min_eval_clients
+    min_available_clients=NUM_CLIENTS,
+    evaluate_fn=evaluate_fn,
     on_fit_config_fn=fit_config,
     on_evaluate_config_fn=evaluate_config,
     evaluate_metrics_aggregation_fn=aggregate_metrics,
 )
 
+# Indexed client registry: cohorts are sampled in O(cohort), not by scanning every client
+client_manager = ScheduledClientManager(policy=args.sampling, seed=args.seed)
+
+# Global weights, strategy state and history are checkpointed as training goes
+checkpoints = CheckpointManager(args.checkpoint_dir, every=args.checkpoint_every)
+resume = None
+if args.resume:
+    resume = checkpoints.load()
+    if resume is None:
+        print(f"No checkpoint found in {args.checkpoint_dir}; starting from scratch")
+    else:
+        print(f"Resuming from {resume.path} (round {resume.server_round} of {NUM_ROUNDS})")
+
+# The streaming strategy needs a server loop that hands over results one by one
+server_options = {"client_manager": client_manager, "strategy": strategy,
+                  "checkpoints": checkpoints if args.checkpoint_every > 0 else None,
+                  "resume": resume, "telemetry": get_telemetry("server")}
+if args.strategy == "streaming":
+    server = StreamingServer(round_deadline=args.round_deadline, **server_options)
+elif args.strategy == "async":
+    server = AsyncServer(**server_options)
+else:
+    server = CheckpointServer(**server_options)
+
 print("Strategy configured:")
+print(f"  - Strategy: {args.strategy}")
+print(f"  - Server optimizer: {args.server_opt}"
+      + (f" (learning rate {strategy.server_opt.learning_rate})" if strategy.server_opt else ""))
 print(f"  - Min fit clients: {strategy.min_fit_clients}")
 print(f"  - Min evaluate clients: {strategy.min_evaluate_clients}")
 print(f"  - Fraction fit: {strategy.fraction_fit}")
-print(f"  - Fraction evaluate: {strategy.fraction_evaluate}\n")
+print(f"  - Fraction evaluate: {strategy.fraction_evaluate}")
+print(f"  - Sampling: {args.sampling}, over-provisioning {args.overprovision:.0%}, "
+      f"round deadline {args.round_deadline or 'none'}")
+print(f"  - Client evaluation every: {args.client_eval_every or 'never'} rounds")
+print(f"  - Centralized evaluation: {'off' if evaluate_fn is None else f'{len(evaluate_fn.y)} held-out examples'}\n")
 
 # Start server
 print("=" * 60)
 print("Federated Learning Server Starting...")
-print(f"Server address: 0.0.0.0:8081")
+print(f"Server address: 0.0.0.0:{args.port}")
 print(f"Number of rounds: {NUM_ROUNDS}")
 print("Waiting for clients to connect...")
 print("=" * 60 + "\n")
 
 try:
     history = fl.server.start_server(
-        server_address="0.0.0.0:8081",
+        server_address=f"0.0.0.0:{args.port}",
         config=fl.server.ServerConfig(num_rounds=NUM_ROUNDS),
-        strategy=strategy
+        server=server,
+        strategy=strategy,
     )
 except Exception as e:
     print(f"\nERROR: Server failed to start: {e}")
@@ -96,56 +212,66 @@ except Exception as e:
     traceback.print_exc()
     history = None
 
+# Privacy budget spent by each client
+if strategy.privacy.epsilons:
+    print("\n" + "=" * 60)
+    print("=== PRIVACY BUDGET (RDP accountant) ===")
+    for client_name, epsilon in sorted(strategy.privacy.report().items()):
+        print(f"  {client_name}: epsilon = {epsilon:.4f}")
+    if args.max_epsilon is not None:
+        print(f"  Budget: epsilon <= {args.max_epsilon}")
+
+# Bytes moved per round (client updates up, global weights down)
+if history and history.metrics_distributed_fit.get("bytes_up"):
+    print("\n" + "=" * 60)
+    print(f"=== TRANSPORT (codec: {args.codec}) ===")
+    bytes_down = dict(history.metrics_distributed_fit.get("bytes_down", []))
+    for round_num, bytes_up in history.metrics_distributed_fit["bytes_up"]:
+        print(f"  Round {round_num}: {bytes_up / 1024:.1f} KiB up, "
+              f"{bytes_down.get(round_num, 0) / 1024:.1f} KiB down")
+
+# Throughput of the asynchronous mode, alongside the accuracy history below
+if history and args.strategy == "async":
+    throughput = strategy.throughput_metrics()
+    print("\n" + "=" * 60)
+    print("=== ASYNC (FedBuff) THROUGHPUT ===")
+    print(f"Global steps: {strategy.version}")
+    print(f"Client updates applied: {throughput['updates_applied']}")
+    print(f"Updates per second: {throughput['updates_per_sec']:.2f}")
+    print(f"Mean staleness: {throughput['mean_staleness']:.2f}")
+    print(f"Bytes transferred: {throughput['bytes_up'] / 1024:.1f} KiB up, "
+          f"{throughput['bytes_down'] / 1024:.1f} KiB down (codec: {args.codec})")
+    print("Staleness histogram:")
+    for staleness, count in throughput["staleness_histogram"].items():
+        print(f"  {staleness}: {count}")
+
 # Extract metrics from history
 if history:
-    # Extract loss and accuracy from history
-    losses_distributed = history.losses_distributed
-    metrics_distributed = history.metrics_distributed
-    
+    # Per-round numbers come from centralized evaluation when it ran, else from the clients
+    centralized = bool(history.metrics_centralized.get("accuracy"))
+    losses = history.losses_centralized if centralized else history.losses_distributed
+    metrics_history = history.metrics_centralized if centralized else history.metrics_distributed
+    source = "centralized, held-out split" if centralized else "distributed, client-side"
+
     print("\n" + "=" * 60)
     print("=== FEDERATED LEARNING TRAINING RESULTS ===")
     print("=" * 60)
-    print(f"Total Rounds Completed: {len(losses_distributed)}")
-    print(f"\nLoss per Round:")
+    print(f"Total Rounds Completed: {max((r for r, _ in losses), default=0)}")
+    print(f"\nLoss per Round ({source}):")
     print("-" * 60)
     
-    for round_num, loss_data in enumerate(losses_distributed, 1):
-        try:
-            if isinstance(loss_data, tuple):
-                loss = loss_data[0]
-            else:
-                loss = loss_data
-            print(f"  Round {round_num}: Loss = {loss:.4f}")
-        except Exception as e:
-            print(f"  Round {round_num}: Loss = {loss_data} (parsing error: {e})")
+    # History entries are (round, value) pairs; round 0 scores the initial weights
+    for round_num, loss in losses:
+        print(f"  Round {round_num}: Loss = {loss:.4f}")
     
-    # Extract accuracy if available
-    accuracies = []
-    if metrics_distributed and "accuracy" in metrics_distributed:
-        try:
-            # Handle different possible structures of metrics
-            accuracy_metrics = metrics_distributed["accuracy"]
-            for metric_tuple in accuracy_metrics:
-                if isinstance(metric_tuple, tuple):
-                    if len(metric_tuple) == 2:
-                        # Format: (round, (value, num_examples))
-                        _, (acc_val, _) = metric_tuple
-                        accuracies.append(acc_val)
-                    else:
-                        # Format might be different
-                        acc = metric_tuple[1] if len(metric_tuple) > 1 else metric_tuple[0]
-                        accuracies.append(acc)
-                else:
-                    accuracies.append(metric_tuple)
-        except Exception as e:
-            print(f"Warning: Could not parse accuracy metrics: {e}")
-            print(f"Metrics structure: {metrics_distributed.get('accuracy', 'N/A')}")
-            accuracies = []
+    accuracy_history = metrics_history.get("accuracy", []) if metrics_history else []
+    rounds = [round_num for round_num, _ in accuracy_history]
+    accuracies = [float(acc) for _, acc in accuracy_history]
     
     if accuracies:
-        print(f"\nAggregated Accuracy per Round:")
+        print(f"\nAggregated Accuracy per Round ({source}):")
         print("-" * 60)
-        for round_num, acc in enumerate(accuracies, 1):
+        for round_num, acc in zip(rounds, accuracies):
             print(f"  Round {round_num}: Accuracy = {acc:.4f} ({acc*100:.2f}%)")
         
         print(f"\n{'=' * 60}")
@@ -155,37 +281,30 @@ if history:
             print(f"ACCURACY IMPROVEMENT: {accuracies[-1] - accuracies[0]:.4f} ({((accuracies[-1] - accuracies[0])*100):.2f}%)")
         print("=" * 60)
         
-        # Plot server metrics
-        rounds = list(range(1, len(accuracies) + 1))
-        
-        plt.figure(figsize=(10, 6))
-        plt.plot(rounds, accuracies, marker='o', label='Server Global Accuracy', linewidth=2, markersize=8)
-        plt.title("Federated Learning: Server Aggregated Accuracy per Round", fontsize=14, fontweight='bold')
-        plt.xlabel("Federated Round", fontsize=12)
-        plt.ylabel("Accuracy", fontsize=12)
-        plt.ylim(0, 1)
-        plt.grid(True, alpha=0.3)
-        plt.legend(fontsize=11)
-        plt.tight_layout()
-        plt.savefig("server_accuracy.png", dpi=300, bbox_inches='tight')
-        print("\n✓ Accuracy plot saved as 'server_accuracy.png'")
-        plt.close()  # Close figure to free memory
     else:
         print("\n⚠ Note: Accuracy metrics not available.")
         print("Debug information:")
-        print(f"  - Metrics distributed exists: {metrics_distributed is not None}")
-        if metrics_distributed:
-            print(f"  - Available metrics keys: {list(metrics_distributed.keys())}")
+        print(f"  - Metrics recorded: {metrics_history is not None}")
+        if metrics_history:
+            print(f"  - Available metrics keys: {list(metrics_history.keys())}")
         print("\nThis may happen if:")
-        print("  1. Clients didn't return accuracy metrics in evaluate()")
+        print("  1. Centralized evaluation was off and clients didn't return accuracy in evaluate()")
         print("  2. Metrics aggregation function had issues")
         print("  3. Clients didn't complete evaluation phase")
         
         # Try to get any available metrics
-        if metrics_distributed:
+        if metrics_history:
             print("\nAvailable metrics:")
-            for key, value in metrics_distributed.items():
+            for key, value in metrics_history.items():
                 print(f"  - {key}: {value}")
+    # Plots are rendered separately from the saved metrics (python report.py)
+    path = save_metrics("server", {
+        "history": history_to_dict(history),
+        "privacy": strategy.privacy.report(),
+        "strategy": args.strategy,
+        "codec": args.codec,
+    })
+    print(f"\n✓ Metrics saved to '{path}' (render plots with: python report.py)")
 else:
     print("\nNo training history available.")
     print("The server may have exited before collecting metrics.")
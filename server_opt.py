@@ -0,0 +1,175 @@
+"""
+Server-side optimizers (adaptive federated optimization, Reddi et al. 2021).
+
+FedAvg replaces the global weights with the clients' weighted average. A
+server optimizer instead treats the difference between that average and the
+current global weights as a pseudo-gradient and takes an optimizer step
+with it, which on skewed client data usually reaches a target accuracy in
+fewer rounds:
+
+- ``avgm`` (FedAvgM): heavy-ball momentum, ``m = beta * m + delta``
+- ``adam`` (FedAdam): ``m``/``v`` moment estimates, step ``m / (sqrt(v) + tau)``
+- ``yogi`` (FedYogi): like Adam, but ``v`` moves towards ``delta ** 2``
+  additively, so it does not grow without bound after a burst of large updates
+
+Moment buffers are flat float32 arrays allocated once. An update walks the
+vectors in cache-sized chunks and applies every elementwise operation to a
+chunk before moving on, so each buffer is streamed from memory once per
+round and the temporaries are chunk-sized.
+"""
+
+import numpy as np
+
+# Elements per chunk: the working set of a few float32 chunks stays in L2
+CHUNK_SIZE = 1 << 15
+
+
+class ServerOptimizer:
+    """Base class: turns the aggregated client weights into the next global weights."""
+
+    name = None
+    # Default server learning rate
+    learning_rate = 1.0
+    # Default under FedBuff, which steps every few (stale) updates instead of once per round
+    async_learning_rate = 1.0
+    moments = ()
+
+    def __init__(self, learning_rate=None):
+        if learning_rate is not None:
+            self.learning_rate = learning_rate
+        self.steps = 0
+        self.state = {}
+        self._scratch = None
+
+    def _allocate(self, size):
+        if self.state and next(iter(self.state.values())).size == size:
+            return
+        self.state = {name: np.zeros(size, dtype=np.float32) for name in self.moments}
+        chunk = min(size, CHUNK_SIZE)
+        self._scratch = (np.empty(chunk, dtype=np.float32), np.empty(chunk, dtype=np.float32))
+
+    def _update(self, chunk, delta, scratch):
+        """Overwrite ``delta`` (one chunk of the pseudo-gradient) with the step to take."""
+        raise NotImplementedError
+
+    def step(self, weights, target, out=None):
+        """Return the next global weights given the current ``weights`` and the clients'
+        aggregate ``target``; ``out`` may be ``target`` itself."""
+        if out is None:
+            out = np.empty(weights.shape, dtype=np.float32)
+        self._allocate(weights.size)
+        self.steps += 1
+        for start in range(0, weights.size, CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            n = min(CHUNK_SIZE, weights.size - start)
+            delta, scratch = self._scratch[0][:n], self._scratch[1][:n]
+            np.subtract(target[chunk], weights[chunk], out=delta)
+            self._update(chunk, delta, scratch)
+            np.add(weights[chunk], delta, out=out[chunk])
+        return out
+
+    def step_delta(self, weights, delta):
+        """Apply the pseudo-gradient ``delta`` to ``weights`` in place."""
+        self._allocate(weights.size)
+        self.steps += 1
+        for start in range(0, weights.size, CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            n = min(CHUNK_SIZE, weights.size - start)
+            step, scratch = self._scratch[0][:n], self._scratch[1][:n]
+            np.copyto(step, delta[chunk], casting="same_kind")
+            self._update(chunk, step, scratch)
+            weights[chunk] += step
+
+    def state_dict(self):
+        return {"server_opt_steps": self.steps,
+                **{f"server_opt_{name}": value for name, value in self.state.items()}}
+
+    def load_state_dict(self, state):
+        self.steps = int(state.get("server_opt_steps", 0))
+        moments = {name: state.get(f"server_opt_{name}") for name in self.moments}
+        if all(value is not None for value in moments.values()) and moments:
+            # Checkpoint arrays are read-only memory maps: copy into owned buffers
+            self._allocate(next(iter(moments.values())).size)
+            for name, value in moments.items():
+                np.copyto(self.state[name], value)
+
+
+class FedAvgM(ServerOptimizer):
+    name = "avgm"
+    moments = ("m",)
+
+    def __init__(self, learning_rate=None, momentum=0.9):
+        super().__init__(learning_rate)
+        self.momentum = momentum
+
+    def _update(self, chunk, delta, scratch):
+        m = self.state["m"][chunk]
+        m *= self.momentum
+        m += delta
+        np.multiply(m, self.learning_rate, out=delta)
+
+
+class FedAdam(ServerOptimizer):
+    name = "adam"
+    learning_rate = 0.1
+    # Adaptive steps are about learning_rate per coordinate however small the buffered
+    # update, so many noisy asynchronous steps at 0.1 diverge
+    async_learning_rate = 0.01
+    moments = ("m", "v")
+
+    def __init__(self, learning_rate=None, beta_1=0.9, beta_2=0.99, tau=1e-3):
+        super().__init__(learning_rate)
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.tau = tau
+
+    def _second_moment(self, v, delta_sq, spare):
+        """Update ``v`` in place; ``delta_sq`` and ``spare`` may be overwritten."""
+        v *= self.beta_2
+        delta_sq *= 1 - self.beta_2
+        v += delta_sq
+
+    def _update(self, chunk, delta, scratch):
+        m, v = self.state["m"][chunk], self.state["v"][chunk]
+        m *= self.beta_1
+        np.multiply(delta, 1 - self.beta_1, out=scratch)
+        m += scratch
+        np.multiply(delta, delta, out=scratch)
+        # delta is no longer needed until it receives the step, so it is the spare buffer
+        self._second_moment(v, scratch, delta)
+        np.sqrt(v, out=scratch)
+        scratch += self.tau
+        np.divide(m, scratch, out=delta)
+        delta *= self.learning_rate
+
+
+class FedYogi(FedAdam):
+    name = "yogi"
+
+    def _second_moment(self, v, delta_sq, spare):
+        # v -= (1 - beta_2) * delta**2 * sign(v - delta**2)
+        np.subtract(v, delta_sq, out=spare)
+        np.sign(spare, out=spare)
+        delta_sq *= spare
+        delta_sq *= 1 - self.beta_2
+        v -= delta_sq
+
+
+SERVER_OPTIMIZERS = {"none": None, "avgm": FedAvgM, "adam": FedAdam, "yogi": FedYogi}
+
+
+def make_server_optimizer(name, learning_rate=None, asynchronous=False):
+    """Return the optimizer called ``name`` (None for plain FedAvg).
+
+    Without a ``learning_rate``, ``asynchronous`` (FedBuff) picks the
+    optimizer's ``async_learning_rate`` default.
+    """
+    if name not in SERVER_OPTIMIZERS:
+        raise ValueError(f"Unknown server optimizer {name!r}; expected one of "
+                         f"{', '.join(SERVER_OPTIMIZERS)}")
+    cls = SERVER_OPTIMIZERS[name]
+    if cls is None:
+        return None
+    if learning_rate is None and asynchronous:
+        learning_rate = cls.async_learning_rate
+    return cls(learning_rate)
@@ -0,0 +1,488 @@
+"""
+Flower server loops beyond the stock synchronous round.
+
+``StreamingServer`` hands every fit result to the strategy as soon as its
+client finishes, instead of collecting the whole cohort first, and can close
+a round early: once the strategy's ``fit_target`` results are in or a
+deadline passes, stragglers are left to finish in the background.
+``AsyncServer`` drops rounds altogether and keeps every client training,
+applying buffered updates as they arrive (FedBuff). Both checkpoint the
+server state as they go and can resume from the last checkpoint (see
+``CheckpointServer``). ``EdgeServer`` is the intermediate tier of a
+hierarchical federation: it runs a round over its own clients whenever the
+root asks for one (see aggregator.py).
+"""
+
+import concurrent.futures
+import inspect
+import queue
+import time
+import timeit
+
+import flwr as fl
+from flwr.common import Code, ndarrays_to_parameters
+
+from checkpoint import history_from_dict
+from strategy import parameters_bytes, parameters_vector
+from telemetry import Telemetry
+
+
+# Older Flower releases have no group_id argument on ClientProxy.fit
+_FIT_TAKES_GROUP_ID = "group_id" in inspect.signature(
+    fl.server.client_proxy.ClientProxy.fit).parameters
+
+
+def fit_client(client, ins, timeout, group_id):
+    """Call ``client.fit`` across Flower versions with and without ``group_id``."""
+    if _FIT_TAKES_GROUP_ID:
+        return client, client.fit(ins, timeout=timeout, group_id=group_id)
+    return client, client.fit(ins, timeout=timeout)
+
+
+def _returns_elapsed():
+    # Server.fit returns (History, elapsed) from flwr 1.5 on, a bare History before
+    return "float" in str(inspect.signature(fl.server.Server.fit).return_annotation)
+
+
+class CheckpointServer(fl.server.Server):
+    """Flower's synchronous round loop with checkpointing and resume.
+
+    After every round the global weights, ``strategy.state_dict()`` and the
+    history so far are handed to ``checkpoints`` (a
+    ``checkpoint.CheckpointManager``). Given ``resume`` (a loaded
+    ``checkpoint.Checkpoint``), ``fit`` restores that state and continues
+    with the next round instead of starting over.
+    """
+
+    def __init__(self, *, checkpoints=None, resume=None, telemetry=None, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpoints = checkpoints
+        self.resume = resume
+        # Per-client and per-round timings (see telemetry.py); disabled when None
+        self.telemetry = telemetry or Telemetry()
+        self._round_timings = {}
+
+    def _record_client_fit(self, server_round, client, fit_res, round_trip, queue_wait, **fields):
+        if not self.telemetry.enabled:
+            return
+        metrics = fit_res.metrics
+        client_time = sum(float(metrics.get(key, 0.0))
+                          for key in ("fit_time", "serialize_time", "deserialize_time"))
+        self.telemetry.record(
+            "client_fit",
+            round=server_round,
+            cid=client.cid,
+            client_id=metrics.get("client_id"),
+            num_examples=fit_res.num_examples,
+            bytes_up=parameters_bytes(fit_res.parameters),
+            round_trip=round_trip,
+            queue_wait=queue_wait,
+            network_time=max(0.0, round_trip - client_time) if client_time else None,
+            fit_time=metrics.get("fit_time"),
+            serialize_time=metrics.get("serialize_time"),
+            deserialize_time=metrics.get("deserialize_time"),
+            **fields,
+        )
+
+    def _record_round(self, server_round, history, **timings):
+        if not self.telemetry.enabled:
+            return
+        fit_metrics = {key: values[-1][1] for key, values in history.metrics_distributed_fit.items()
+                       if values and values[-1][0] == server_round}
+        centralized = {key: values[-1][1] for key, values in history.metrics_centralized.items()
+                       if values and values[-1][0] == server_round}
+        losses = [loss for r, loss in history.losses_centralized if r == server_round]
+        self.telemetry.record(
+            "round",
+            round=server_round,
+            **self._round_timings,
+            **timings,
+            bytes_up=fit_metrics.get("bytes_up", centralized.get("bytes_up")),
+            bytes_down=fit_metrics.get("bytes_down", centralized.get("bytes_down")),
+            loss=losses[-1] if losses else None,
+            accuracy=centralized.get("accuracy"),
+        )
+        self._round_timings = {}
+
+    def _restore(self):
+        """Load ``resume`` into the server and strategy; returns ``(history, its round)``."""
+        history = history_from_dict(self.resume.history)
+        self.parameters = ndarrays_to_parameters([self.resume.weights])
+        self.strategy.load_state_dict(self.resume.state)
+        print(f"[Server] Resuming after round {self.resume.server_round} from {self.resume.path}")
+        return history, self.resume.server_round
+
+    def _checkpoint(self, server_round, history, final=False, parameters=None):
+        if self.checkpoints is None:
+            return
+        weights = parameters_vector(parameters or self.parameters)
+        path = self.checkpoints.maybe_save(server_round, weights, self.strategy.state_dict(),
+                                           history, final)
+        if path:
+            print(f"[Server] Round {server_round}: checkpoint written to {path}")
+
+    def fit(self, num_rounds, timeout):
+        if self.resume is not None:
+            history, start_round = self._restore()
+        else:
+            history, start_round = fl.server.History(), 0
+            self.parameters = self._get_initial_parameters(server_round=0, timeout=timeout)
+            res = self.strategy.evaluate(0, parameters=self.parameters)
+            if res is not None:
+                history.add_loss_centralized(server_round=0, loss=res[0])
+                history.add_metrics_centralized(server_round=0, metrics=res[1])
+
+        start_time = timeit.default_timer()
+        for current_round in range(start_round + 1, num_rounds + 1):
+            res_fit = self.fit_round(server_round=current_round, timeout=timeout)
+            if res_fit is not None:
+                parameters_prime, fit_metrics, _ = res_fit
+                if parameters_prime:
+                    self.parameters = parameters_prime
+                history.add_metrics_distributed_fit(server_round=current_round, metrics=fit_metrics)
+
+            evaluate_start = time.perf_counter()
+            res_cen = self.strategy.evaluate(current_round, parameters=self.parameters)
+            if res_cen is not None:
+                loss_cen, metrics_cen = res_cen
+                history.add_loss_centralized(server_round=current_round, loss=loss_cen)
+                history.add_metrics_centralized(server_round=current_round, metrics=metrics_cen)
+
+            client_evaluate_start = time.perf_counter()
+            res_fed = self.evaluate_round(server_round=current_round, timeout=timeout)
+            if res_fed is not None and res_fed[0] is not None:
+                loss_fed, metrics_fed, _ = res_fed
+                history.add_loss_distributed(server_round=current_round, loss=loss_fed)
+                history.add_metrics_distributed(server_round=current_round, metrics=metrics_fed)
+
+            checkpoint_start = time.perf_counter()
+            self._checkpoint(current_round, history, final=current_round == num_rounds)
+            self._record_round(
+                current_round, history,
+                evaluate_time=client_evaluate_start - evaluate_start,
+                client_evaluate_time=checkpoint_start - client_evaluate_start,
+                checkpoint_time=time.perf_counter() - checkpoint_start,
+            )
+
+        elapsed = timeit.default_timer() - start_time
+        self.telemetry.flush()
+        return (history, elapsed) if _returns_elapsed() else history
+
+    def fit_round(self, server_round, timeout):
+        """Flower's synchronous fit round, timing every client's result."""
+        client_instructions = self.strategy.configure_fit(
+            server_round=server_round,
+            parameters=self.parameters,
+            client_manager=self._client_manager,
+        )
+        if not client_instructions:
+            print(f"[Server] Round {server_round}: no clients selected, skipping fit")
+            return None
+
+        results, failures, arrivals = [], [], []
+        dispatched = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(fit_client, client, ins, timeout, server_round)
+                for client, ins in client_instructions
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                if future.exception() is not None:
+                    failures.append(future.exception())
+                    continue
+                client, fit_res = future.result()
+                if fit_res.status.code != Code.OK:
+                    failures.append((client, fit_res))
+                    continue
+                results.append((client, fit_res))
+                arrivals.append(time.perf_counter())
+
+        aggregate_start = time.perf_counter()
+        parameters, metrics = self.strategy.aggregate_fit(server_round, results, failures)
+        aggregate_end = time.perf_counter()
+        for (client, fit_res), arrived in zip(results, arrivals):
+            self._record_client_fit(server_round, client, fit_res, round_trip=arrived - dispatched,
+                                    queue_wait=aggregate_start - arrived)
+        self._round_timings = {"clients": len(results), "failures": len(failures),
+                               "fit_time": aggregate_start - dispatched,
+                               "aggregate_time": aggregate_end - aggregate_start}
+        return parameters, metrics, (results, failures)
+
+
+class StreamingServer(CheckpointServer):
+    """Server whose fit rounds fold results into the strategy as they arrive.
+
+    The strategy must provide ``begin_aggregation``, ``accumulate`` and
+    ``end_aggregation`` (see ``strategy.StreamingFedAvg``); results are not
+    retained after being accumulated.
+
+    A round closes as soon as ``strategy.fit_target`` results have arrived
+    (the strategy may over-provision the cohort) or ``round_deadline``
+    seconds have passed. With a ``scheduler.ScheduledClientManager``, clients
+    are marked busy while training and their latency and data size are
+    recorded when they return, including stragglers from closed rounds.
+    """
+
+    def __init__(self, *, round_deadline=None, **kwargs):
+        super().__init__(**kwargs)
+        self.round_deadline = round_deadline
+
+    def _dispatched(self, client):
+        acquire = getattr(self._client_manager, "acquire", None)
+        if acquire is not None:
+            acquire(client.cid)
+
+    def _returned(self, client, started, future):
+        latency = time.perf_counter() - started
+        failed = future.exception() is not None or future.result()[1].status.code != Code.OK
+        if not failed:
+            # The client spent privacy whether or not its update made the round, so
+            # stragglers are accounted for too (observing an aggregated result again is a no-op)
+            self.strategy.privacy.observe(client.cid, future.result()[1].metrics)
+        release = getattr(self._client_manager, "release", None)
+        if release is None:
+            return
+        if failed:
+            release(client.cid, latency, failed=True)
+        else:
+            release(client.cid, latency, num_examples=future.result()[1].num_examples)
+
+    def fit_round(self, server_round, timeout):
+        client_instructions = self.strategy.configure_fit(
+            server_round=server_round,
+            parameters=self.parameters,
+            client_manager=self._client_manager,
+        )
+        if not client_instructions:
+            print(f"[Server] Round {server_round}: no clients selected, skipping fit")
+            return None
+
+        failures = []
+        num_results = 0
+        aggregate_time = 0.0
+        target = getattr(self.strategy, "fit_target", None) or len(client_instructions)
+        dispatched = time.perf_counter()
+        self.strategy.begin_aggregation(server_round)
+        max_workers = getattr(self, "max_workers", None)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        futures = []
+        for client, ins in client_instructions:
+            self._dispatched(client)
+            future = executor.submit(fit_client, client, ins, timeout, server_round)
+            future.add_done_callback(
+                lambda f, client=client, started=time.perf_counter(): self._returned(client, started, f)
+            )
+            futures.append(future)
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=self.round_deadline):
+                if future.exception() is not None:
+                    failures.append(future.exception())
+                    continue
+                client, fit_res = future.result()
+                if fit_res.status.code != Code.OK:
+                    failures.append((client, fit_res))
+                    continue
+                arrived = time.perf_counter()
+                self.strategy.accumulate(client, fit_res)
+                aggregate_time += time.perf_counter() - arrived
+                self._record_client_fit(server_round, client, fit_res,
+                                        round_trip=arrived - dispatched, queue_wait=0.0)
+                num_results += 1
+                if num_results >= target:
+                    break
+        except concurrent.futures.TimeoutError:
+            print(f"[Server] Round {server_round}: deadline of {self.round_deadline}s reached")
+        # Stragglers keep training in the background; their results are dropped
+        stragglers = sum(not future.done() for future in futures)
+        executor.shutdown(wait=False)
+
+        print(f"[Server] Round {server_round}: aggregated {num_results} results, "
+              f"{len(failures)} failures, {stragglers} stragglers")
+        fit_end = time.perf_counter()
+        parameters, metrics = self.strategy.end_aggregation(server_round, failures)
+        self._round_timings = {"clients": num_results, "failures": len(failures),
+                               "stragglers": stragglers, "fit_time": fit_end - dispatched,
+                               "aggregate_time": aggregate_time + time.perf_counter() - fit_end}
+        return parameters, metrics, ([], failures)
+
+
+class AsyncServer(CheckpointServer):
+    """Asynchronous training loop for ``strategy.FedBuff``.
+
+    Every connected client is kept training: as soon as one returns, its
+    update goes into the strategy's buffer and the client is immediately
+    dispatched again with the latest global weights. A "round" is one
+    buffered global step. Clients are busy throughout, so per-round accuracy
+    comes from the strategy's centralized ``evaluate``; a distributed
+    evaluation runs once all in-flight work has drained.
+    """
+
+    def fit(self, num_rounds, timeout):
+        if self.resume is not None:
+            history, _ = self._restore()
+        else:
+            history = fl.server.History()
+            self.parameters = self._get_initial_parameters(server_round=0, timeout=timeout)
+        self.strategy.start(self.parameters)
+        self._client_manager.wait_for(self.strategy.min_available_clients)
+        clients = list(self._client_manager.all().values())
+        print(f"[Server] Async training with {len(clients)} clients, "
+              f"buffer size {self.strategy.buffer_size}")
+
+        start_time = timeit.default_timer()
+        in_flight = {}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(clients))
+
+        def dispatch(client):
+            version, ins = self.strategy.dispatch(client)
+            future = executor.submit(fit_client, client, ins, timeout, version)
+            in_flight[future] = (client, version, time.perf_counter())
+
+        if self.strategy.version < num_rounds:
+            for client in clients:
+                dispatch(client)
+
+        while self.strategy.version < num_rounds and in_flight:
+            done, _ = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                client, version, dispatched = in_flight.pop(future)
+                if future.exception() is not None or future.result()[1].status.code != Code.OK:
+                    self.strategy.discard(version)
+                    print(f"[Server] Client {client.cid} failed; not redispatching it")
+                    continue
+                arrived = time.perf_counter()
+                stepped = self.strategy.submit(client, version, future.result()[1])
+                self._record_client_fit(version + 1, client, future.result()[1],
+                                        round_trip=arrived - dispatched, queue_wait=0.0,
+                                        staleness=self.strategy.version - version - int(stepped))
+                if stepped:
+                    self._record_step(history)
+                if self.strategy.privacy.exhausted(client.cid):
+                    print(f"[Server] Client {client.cid} exhausted its privacy budget; stopping it")
+                elif self.strategy.version < num_rounds:
+                    dispatch(client)
+
+        # Let in-flight clients finish so they can take the final evaluation; their
+        # updates are not applied, but the privacy they spent still counts
+        concurrent.futures.wait(in_flight)
+        executor.shutdown()
+        for future, (client, version, _) in in_flight.items():
+            self.strategy.discard(version)
+            if future.exception() is None and future.result()[1].status.code == Code.OK:
+                self.strategy.privacy.observe(client.cid, future.result()[1].metrics)
+        self.parameters = self.strategy.current_parameters()
+
+        res_fed = self.evaluate_round(server_round=self.strategy.version, timeout=timeout)
+        if res_fed is not None and res_fed[0] is not None:
+            loss_fed, metrics_fed, _ = res_fed
+            history.add_loss_distributed(server_round=self.strategy.version, loss=loss_fed)
+            history.add_metrics_distributed(server_round=self.strategy.version, metrics=metrics_fed)
+        self._checkpoint(self.strategy.version, history, final=True, parameters=self.parameters)
+        self.telemetry.flush()
+
+        elapsed = timeit.default_timer() - start_time
+        return (history, elapsed) if _returns_elapsed() else history
+
+    def _record_step(self, history):
+        version = self.strategy.version
+        throughput = self.strategy.throughput_metrics()
+        metrics = {
+            "updates_applied": throughput["updates_applied"],
+            "updates_per_sec": throughput["updates_per_sec"],
+            "mean_staleness": throughput["mean_staleness"],
+            "bytes_up": throughput["bytes_up"],
+            "bytes_down": throughput["bytes_down"],
+        }
+        evaluate_start = time.perf_counter()
+        res_cen = self.strategy.evaluate(version, parameters=self.strategy.current_parameters())
+        if res_cen is not None:
+            loss_cen, metrics_cen = res_cen
+            history.add_loss_centralized(server_round=version, loss=loss_cen)
+            metrics.update(metrics_cen)
+        history.add_metrics_centralized(server_round=version, metrics=metrics)
+        checkpoint_start = time.perf_counter()
+        self._checkpoint(version, history, parameters=self.strategy.current_parameters())
+        self._record_round(version, history, updates_applied=throughput["updates_applied"],
+                           evaluate_time=checkpoint_start - evaluate_start,
+                           checkpoint_time=time.perf_counter() - checkpoint_start)
+        print(f"[Server] Global step {version}: {throughput['updates_applied']} updates, "
+              f"{throughput['updates_per_sec']:.2f} updates/s, "
+              f"mean staleness {throughput['mean_staleness']:.2f}")
+
+
+class EdgeServer(StreamingServer):
+    """Aggregator between the root server and a subset of the clients.
+
+    The server runs no rounds of its own. Requests from the root are queued
+    with ``submit`` (the upstream client in aggregator.py calls it) and
+    ``fit`` serves them one at a time on the locally connected clients:
+    a fit request becomes one streaming round whose pre-averaged result goes
+    back to the root, an evaluate request one evaluate round. The root's
+    round config is passed on to the clients. ``close`` ends the loop once
+    the root has hung up.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.config = {}
+        self.strategy.on_fit_config_fn = self.root_config
+        self.strategy.on_evaluate_config_fn = self.root_config
+        self._requests = queue.Queue()
+
+    def root_config(self, server_round):
+        return dict(self.config)
+
+    def submit(self, method, parameters, config):
+        """Queue ``method`` (get_parameters, fit or evaluate); returns a Future of its result."""
+        future = concurrent.futures.Future()
+        self._requests.put((method, parameters, config, future))
+        return future
+
+    def close(self):
+        self._requests.put(None)
+
+    def fit(self, num_rounds, timeout):
+        history = fl.server.History()
+        start_time = timeit.default_timer()
+        while (request := self._requests.get()) is not None:
+            method, parameters, config, future = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(getattr(self, f"_serve_{method}")(parameters, config,
+                                                                     timeout, history))
+            except Exception as e:
+                future.set_exception(e)
+        self.telemetry.flush()
+        elapsed = timeit.default_timer() - start_time
+        return (history, elapsed) if _returns_elapsed() else history
+
+    def _serve_get_parameters(self, parameters, config, timeout, history):
+        return self._get_initial_parameters(server_round=0, timeout=timeout)
+
+    def _serve_fit(self, parameters, config, timeout, history):
+        """``(partial aggregate, examples behind it, fit metrics)``, or None without results."""
+        server_round = int(config.get("server_round", 0))
+        self.parameters, self.config = parameters, config
+        res_fit = self.fit_round(server_round=server_round, timeout=timeout)
+        if res_fit is None or res_fit[0] is None:
+            return None
+        aggregate, fit_metrics, _ = res_fit
+        history.add_metrics_distributed_fit(server_round=server_round, metrics=fit_metrics)
+        metrics = {**fit_metrics, **self._round_timings}
+        self._record_round(server_round, history)
+        return aggregate, self.strategy.num_examples, metrics
+
+    def _serve_evaluate(self, parameters, config, timeout, history):
+        """``(loss, examples evaluated, metrics)``, or None without results."""
+        server_round = int(config.get("server_round", 0))
+        self.parameters, self.config = parameters, config
+        res_fed = self.evaluate_round(server_round=server_round, timeout=timeout)
+        if res_fed is None or res_fed[0] is None:
+            return None
+        loss, metrics, (results, _) = res_fed
+        history.add_loss_distributed(server_round=server_round, loss=loss)
+        history.add_metrics_distributed(server_round=server_round, metrics=metrics)
+        return loss, sum(res.num_examples for _, res in results), metrics
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+In-process federated simulation.
+
+Runs the whole FedAvg loop in a single process without sockets or threads:
+one shared model is trained on each sampled client's shard in turn (or a
+pool of worker processes with one warm model each, see executor.py), and the
+per-client results are kept as rows of a stacked NumPy array so aggregation
+is a single weighted matrix-vector product.
+"""
+
+import time
+
+import numpy as np
+
+from codec import CODECS, make_codec, payload_bytes
+from dataset import get_loader, get_plan
+from evaluation import binary_metrics
+from executor import ProcessPoolClientExecutor, SerialExecutor
+from server_opt import SERVER_OPTIMIZERS, make_server_optimizer
+
+
+def default_model_fn():
+    """Build the client model for ``FL_MODEL_BACKEND`` with the flat-vector interface."""
+    from models import as_flat_model, create_model
+    return as_flat_model(create_model())
+
+
+def build_flat_model(backend=None, hidden_units=None, dp=True, seed=None):
+    """Like ``default_model_fn`` with explicit options; bind them with ``functools.partial``
+    to get a ``model_fn`` that can be sent to worker processes."""
+    from models import HIDDEN_UNITS, as_flat_model, create_model
+    return as_flat_model(create_model(backend, hidden_units or HIDDEN_UNITS, dp, seed=seed))
+
+
+class Simulation:
+    """FedAvg over ``num_clients`` simulated clients in the current process."""
+
+    def __init__(self, num_clients, model_fn=default_model_fn, epochs=3, batch_size=32,
+                 fraction_fit=1.0, seed=42, plan=None, loader=None, executor=None,
+                 codec="none", server_opt="none", server_lr=None):
+        self.num_clients = num_clients
+        self.codec = codec
+        # Server optimizer stepping along the averaged update (None: plain FedAvg)
+        self.server_opt = make_server_optimizer(server_opt, server_lr)
+        # Per-client codecs, created on first use (top-k keeps per-client residuals)
+        self.codecs = {}
+        self.model_fn = model_fn
+        self.seed = seed
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.fraction_fit = fraction_fit
+        self.rng = np.random.default_rng(seed)
+
+        loader = loader or get_loader()
+        self.plan, self.X, self.y = loader.partition(num_clients, seed, plan or get_plan())
+        self.model = model_fn()
+
+        sizes = self.plan.sizes
+        self.num_train = self.plan.num_train
+        self.num_test = sizes - self.num_train
+        # Rows that belong to some client's test split, for one-pass evaluation
+        self.test_mask = np.ones(len(self.y), dtype=bool)
+        for client_id in range(num_clients):
+            self.test_mask[self.plan.client_slices(client_id)[0]] = False
+
+        self.global_weights = self.model.get_flat()
+        # Last local model of every client, one row per client
+        self.client_states = np.tile(self.global_weights, (num_clients, 1))
+        self.history = []
+
+        self.executor = executor or SerialExecutor()
+        self.executor.start(self)
+
+    def client_data(self, client_id):
+        train, test = self.plan.client_slices(client_id)
+        return (self.plan.transform(client_id, self.X[train]), self.y[train],
+                self.plan.transform(client_id, self.X[test]), self.y[test])
+
+    def sample_cohort(self):
+        size = max(1, int(round(self.fraction_fit * self.num_clients)))
+        if size >= self.num_clients:
+            return np.arange(self.num_clients)
+        return np.sort(self.rng.choice(self.num_clients, size, replace=False))
+
+    def fit_round(self, cohort):
+        """Train every client in ``cohort`` from the global weights.
+
+        Returns the clients' losses and the bytes their updates would take on
+        the wire with the configured codec.
+        """
+        losses = self.executor.fit(cohort, self.global_weights)
+        if self.codec == "none":
+            return losses, self.global_weights.nbytes * len(cohort)
+        bytes_up = 0
+        for client_id in cohort:
+            if client_id not in self.codecs:
+                self.codecs[client_id] = make_codec(self.codec)
+            codec = self.codecs[client_id]
+            update = codec.encode(self.client_states[client_id], self.global_weights)
+            bytes_up += payload_bytes(update)
+            self.client_states[client_id] = codec.decode(update, self.global_weights)
+        return losses, bytes_up
+
+    def aggregate(self, cohort):
+        weights = self.num_train[cohort].astype(np.float32)
+        weights /= weights.sum()
+        average = weights @ self.client_states[cohort]
+        if self.server_opt is None:
+            self.global_weights = average
+        else:
+            self.global_weights = self.server_opt.step(self.global_weights, average, out=average)
+
+    def evaluate(self):
+        """Score the global model on every client's test split in one pass."""
+        self.model.set_flat(self.global_weights)
+        if self.plan.feature_scale is None:
+            X_test, y_test = self.X[self.test_mask], self.y[self.test_mask]
+        else:
+            parts = [self.client_data(client_id) for client_id in range(self.num_clients)]
+            X_test = np.concatenate([p[2] for p in parts])
+            y_test = np.concatenate([p[3] for p in parts])
+        return binary_metrics(self.model.predict_proba(X_test), y_test)
+
+    def run(self, num_rounds, verbose=True):
+        for server_round in range(1, num_rounds + 1):
+            round_start = time.perf_counter()
+            cohort = self.sample_cohort()
+            losses, bytes_up = self.fit_round(cohort)
+            fit_time = time.perf_counter() - round_start
+
+            aggregate_start = time.perf_counter()
+            self.aggregate(cohort)
+            aggregate_time = time.perf_counter() - aggregate_start
+
+            loss, accuracy = self.evaluate()
+            wall_time = time.perf_counter() - round_start
+            record = {
+                "round": server_round,
+                "clients": int(len(cohort)),
+                "train_loss": float(np.average(losses, weights=self.num_train[cohort])),
+                "loss": loss,
+                "accuracy": accuracy,
+                "fit_time": fit_time,
+                "aggregate_time": aggregate_time,
+                "wall_time": wall_time,
+                "bytes_up": int(bytes_up),
+                "bytes_down": int(self.global_weights.nbytes * len(cohort)),
+            }
+            self.history.append(record)
+            if verbose:
+                print(f"[Sim] Round {server_round}: {len(cohort)} clients, "
+                      f"loss {loss:.4f}, accuracy {accuracy:.4f}, "
+                      f"wall {wall_time:.2f}s (fit {fit_time:.2f}s, aggregate {aggregate_time * 1000:.1f}ms), "
+                      f"{bytes_up / 1024:.1f} KiB up")
+        return self.history
+
+    def close(self):
+        self.executor.close()
+
+
+def run_simulation(num_clients=2, num_rounds=5, epochs=3, batch_size=32, fraction_fit=1.0,
+                   seed=42, model_fn=default_model_fn, verbose=True, workers=0, codec="none",
+                   server_opt="none", server_lr=None):
+    """Build a ``Simulation`` and run it; returns the per-round history.
+
+    ``workers > 0`` trains clients on that many worker processes.
+    """
+    executor = ProcessPoolClientExecutor(workers) if workers > 0 else None
+    sim = Simulation(num_clients, model_fn, epochs, batch_size, fraction_fit, seed,
+                     executor=executor, codec=codec, server_opt=server_opt, server_lr=server_lr)
+    try:
+        return sim.run(num_rounds, verbose)
+    finally:
+        sim.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run FedAvg in-process without a server.")
+    parser.add_argument("--num-clients", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--fraction-fit", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for local training (0 = train in this process)")
+    parser.add_argument("--codec", default="none",
+                        help=f"Compression for client updates: {', '.join(CODECS)}")
+    parser.add_argument("--server-opt", choices=list(SERVER_OPTIMIZERS), default="none",
+                        help="Server optimizer applied to the averaged update")
+    parser.add_argument("--server-lr", type=float, default=None,
+                        help="Server learning rate (default: the optimizer's own)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    history = run_simulation(args.num_clients, args.rounds, args.epochs, args.batch_size,
+                             args.fraction_fit, args.seed, workers=args.workers, codec=args.codec,
+                             server_opt=args.server_opt, server_lr=args.server_lr)
+    total = time.perf_counter() - start
+    print(f"\n[Sim] {args.rounds} rounds with {args.num_clients} clients in {total:.2f}s "
+          f"({args.rounds / total:.2f} rounds/s)")
+    print(f"[Sim] Final accuracy: {history[-1]['accuracy']:.4f}")
+    print(f"[Sim] Bytes up: {sum(r['bytes_up'] for r in history) / 1024:.1f} KiB "
+          f"(codec: {args.codec})")
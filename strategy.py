@@ -0,0 +1,388 @@
+"""
+Federated aggregation strategies working on flat parameter vectors.
+
+Clients exchange their weights as a single float32 vector (see params.py),
+so aggregation decodes every update straight into a row of one stacked
+buffer and averages them with a single matrix-vector product. Updates may
+arrive compressed (see codec.py); the strategy picks the codec, announces it
+to clients in the fit config and counts the bytes moved each round.
+"""
+
+import hashlib
+import math
+import time
+
+import flwr as fl
+import numpy as np
+from flwr.common import FitIns, ndarrays_to_parameters
+
+from codec import make_codec
+from params import decode_ndarray, to_flat
+from privacy import PrivacyBudget
+from server_opt import make_server_optimizer
+
+
+def parameters_vector(parameters):
+    """Return the flat vector carried by a Flower ``Parameters`` (a view when possible)."""
+    tensors = parameters.tensors
+    if len(tensors) == 1:
+        return decode_ndarray(tensors[0])
+    # Clients still sending per-layer weights
+    return to_flat([decode_ndarray(t) for t in tensors])
+
+
+def fit_result_vector(fit_res):
+    """Return the flat update carried by a ``FitRes`` (a view when possible)."""
+    return parameters_vector(fit_res.parameters)
+
+
+def parameters_bytes(parameters):
+    return sum(len(t) for t in parameters.tensors)
+
+
+def weights_id(parameters):
+    """Content digest of ``parameters``, sent to clients so they can skip reloading them."""
+    digest = hashlib.blake2b(digest_size=16)
+    for tensor in parameters.tensors:
+        digest.update(tensor)
+    return digest.hexdigest()
+
+
+class WithinBudget(fl.server.criterion.Criterion):
+    """Select only clients that have not exhausted their privacy budget."""
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def select(self, client):
+        return not self.budget.exhausted(client.cid)
+
+
+class FlatFedAvg(fl.server.strategy.FedAvg):
+    """FedAvg over flat parameter vectors with one BLAS call per round."""
+
+    # Steps the server optimizer every few updates rather than once per round
+    asynchronous = False
+
+    def __init__(self, *args, codec="none", max_epsilon=None, evaluate_every=1, overprovision=0.0,
+                 server_opt="none", server_lr=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Optimizer stepping along the averaged update (see server_opt.py); None is plain FedAvg
+        self.server_opt = make_server_optimizer(server_opt, server_lr, self.asynchronous)
+        # Sample this fraction more clients than needed; a server with a round deadline
+        # (servers.StreamingServer) closes the round once ``fit_target`` results are in
+        self.overprovision = overprovision
+        self.fit_target = None
+        self.codec = make_codec(codec)
+        # Distributed (client) evaluation only every N rounds; 0 turns it off
+        self.evaluate_every = evaluate_every
+        # Epsilon reported by each client; clients at max_epsilon are no longer sampled
+        self.privacy = PrivacyBudget(max_epsilon)
+        self._stacked = None
+        self._reference = None
+        self._bytes_up = 0
+        self._bytes_down = 0
+        self._weights_id = (None, None)
+
+    def configure_fit(self, server_round, parameters, client_manager):
+        if self.privacy.max_epsilon is None:
+            instructions = super().configure_fit(server_round, parameters, client_manager)
+        else:
+            instructions = self._configure_fit_within_budget(server_round, parameters, client_manager)
+        # Global weights the clients start from; compressed updates are relative to them
+        self._reference = parameters_vector(parameters)
+        self._bytes_up = 0
+        self._bytes_down = parameters_bytes(parameters) * len(instructions)
+        tag = self.weights_id(parameters)
+        for _, fit_ins in instructions:
+            fit_ins.config["codec"] = self.codec.name
+            fit_ins.config["weights_id"] = tag
+        return instructions
+
+    def weights_id(self, parameters):
+        # The evaluate of round r and the fit of round r+1 send the same Parameters
+        if self._weights_id[0] is not parameters:
+            self._weights_id = (parameters, weights_id(parameters))
+        return self._weights_id[1]
+
+    def num_fit_clients(self, num_available_clients):
+        sample_size, min_num_clients = super().num_fit_clients(num_available_clients)
+        self.fit_target = sample_size
+        if self.overprovision > 0:
+            sample_size = max(sample_size, min(num_available_clients,
+                                               math.ceil(sample_size * (1 + self.overprovision))))
+        return sample_size, min_num_clients
+
+    def _configure_fit_within_budget(self, server_round, parameters, client_manager):
+        # Size the cohort from the running exhausted count instead of scanning every client;
+        # the sampler's criterion skips exhausted clients (exhausted clients that have since
+        # disconnected make this an underestimate, never an overestimate)
+        eligible = max(1, client_manager.num_available() - self.privacy.num_exhausted)
+        config = {}
+        if self.on_fit_config_fn is not None:
+            config = self.on_fit_config_fn(server_round)
+        fit_ins = FitIns(parameters, config)
+        sample_size, min_num_clients = self.num_fit_clients(eligible)
+        clients = client_manager.sample(
+            num_clients=sample_size,
+            min_num_clients=min_num_clients,
+            criterion=WithinBudget(self.privacy),
+        )
+        if not clients:
+            print(f"[Server] Round {server_round}: no client within its privacy budget")
+        return [(client, fit_ins) for client in clients]
+
+    def configure_evaluate(self, server_round, parameters, client_manager):
+        if self.evaluate_every <= 0 or server_round % self.evaluate_every != 0:
+            return []
+        instructions = super().configure_evaluate(server_round, parameters, client_manager)
+        tag = self.weights_id(parameters)
+        for _, evaluate_ins in instructions:
+            evaluate_ins.config["weights_id"] = tag
+        return instructions
+
+    def evaluate(self, server_round, parameters):
+        """Run ``evaluate_fn`` on the global weights as one flat vector, without a copy."""
+        if self.evaluate_fn is None:
+            return None
+        return self.evaluate_fn(server_round, [parameters_vector(parameters)], {})
+
+    def update_vector(self, fit_res, reference=None):
+        """Decode a client's update into its full flat weight vector."""
+        self._bytes_up += parameters_bytes(fit_res.parameters)
+        if self.codec.name == "none":
+            return fit_result_vector(fit_res)
+        arrays = [decode_ndarray(t) for t in fit_res.parameters.tensors]
+        return self.codec.decode(arrays, self._reference if reference is None else reference)
+
+    def transport_metrics(self):
+        return {"bytes_up": self._bytes_up, "bytes_down": self._bytes_down}
+
+    def state_dict(self):
+        """Strategy state to checkpoint besides the global weights (arrays or JSON values)."""
+        return {} if self.server_opt is None else self.server_opt.state_dict()
+
+    def load_state_dict(self, state):
+        if self.server_opt is not None:
+            self.server_opt.load_state_dict(state)
+
+    def server_step(self, aggregated):
+        """Next global weights from the clients' average (overwritten in place)."""
+        if self.server_opt is None or self._reference is None:
+            return aggregated
+        return self.server_opt.step(self._reference, aggregated, out=aggregated)
+
+    def aggregate_fit(self, server_round, results, failures):
+        if not results:
+            return None, {}
+        if not self.accept_failures and failures:
+            return None, {}
+
+        first = self.update_vector(results[0][1])
+        shape = (len(results), first.size)
+        # Reuse the stacking buffer while the cohort size and model stay the same
+        if self._stacked is None or self._stacked.shape != shape:
+            self._stacked = np.empty(shape, dtype=np.float32)
+        num_examples = np.empty(len(results), dtype=np.float32)
+        for row, (client, fit_res) in enumerate(results):
+            self._stacked[row] = first if row == 0 else self.update_vector(fit_res)
+            num_examples[row] = fit_res.num_examples
+            self.privacy.observe(client.cid, fit_res.metrics)
+
+        aggregated = self.server_step((num_examples / num_examples.sum()) @ self._stacked)
+
+        metrics_aggregated = {}
+        if self.fit_metrics_aggregation_fn:
+            fit_metrics = [(res.num_examples, res.metrics) for _, res in results]
+            metrics_aggregated = self.fit_metrics_aggregation_fn(fit_metrics)
+        metrics_aggregated.update(self.transport_metrics())
+        return ndarrays_to_parameters([aggregated]), metrics_aggregated
+
+
+class StreamingFedAvg(FlatFedAvg):
+    """FedAvg that folds each update into a running weighted sum as it arrives.
+
+    Used with ``servers.StreamingServer``, every result is accumulated into
+    preallocated buffers the moment its client finishes and then dropped, so
+    aggregation memory does not depend on the number of clients and only the
+    final division remains after the slowest client reports. ``aggregate_fit``
+    folds a complete result list the same way, so the strategy also works with
+    the stock Flower server.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sum = None
+        self._scratch = None
+        self._out = None
+        self._total_examples = 0.0
+        self._fit_metrics = []
+
+    @property
+    def num_examples(self):
+        """Examples behind the updates accumulated this round."""
+        return int(self._total_examples)
+
+    def begin_aggregation(self, server_round):
+        self._total_examples = 0.0
+        self._fit_metrics = []
+        if self._sum is not None:
+            self._sum.fill(0.0)
+
+    def accumulate(self, client, fit_res):
+        self.privacy.observe(client.cid, fit_res.metrics)
+        vector = self.update_vector(fit_res)
+        if self._sum is None or self._sum.shape != vector.shape:
+            self._sum = np.zeros(vector.shape, dtype=np.float64)
+            self._scratch = np.empty(vector.shape, dtype=np.float64)
+            self._out = np.empty(vector.shape, dtype=np.float32)
+        np.multiply(vector, fit_res.num_examples, out=self._scratch)
+        self._sum += self._scratch
+        self._total_examples += fit_res.num_examples
+        if self.fit_metrics_aggregation_fn:
+            self._fit_metrics.append((fit_res.num_examples, fit_res.metrics))
+
+    def end_aggregation(self, server_round, failures):
+        if self._total_examples == 0:
+            return None, {}
+        if not self.accept_failures and failures:
+            return None, {}
+        np.divide(self._sum, self._total_examples, out=self._out, casting="same_kind")
+        self.server_step(self._out)
+
+        metrics_aggregated = {}
+        if self.fit_metrics_aggregation_fn:
+            metrics_aggregated = self.fit_metrics_aggregation_fn(self._fit_metrics)
+        metrics_aggregated.update(self.transport_metrics())
+        return ndarrays_to_parameters([self._out]), metrics_aggregated
+
+    def aggregate_fit(self, server_round, results, failures):
+        self.begin_aggregation(server_round)
+        for client, fit_res in results:
+            self.accumulate(client, fit_res)
+        return self.end_aggregation(server_round, failures)
+
+
+class FedBuff(FlatFedAvg):
+    """Buffered asynchronous aggregation (FedBuff) for ``servers.AsyncServer``.
+
+    Clients train from whatever global version was current when they were
+    dispatched. Each returned update is turned into a delta against that base
+    version, down-weighted by its staleness ``tau`` (the number of global
+    versions published since) as ``(1 + tau) ** -staleness_exponent``, and
+    added to a buffer. Every ``buffer_size`` arrivals the buffered mean is
+    applied to the global model with step ``server_learning_rate``, or fed to
+    the server optimizer as its pseudo-gradient when one is set (adaptive
+    optimizers then default to their smaller ``async_learning_rate``).
+    """
+
+    asynchronous = True
+
+    def __init__(self, *args, buffer_size=2, staleness_exponent=0.5, server_learning_rate=1.0,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer_size = buffer_size
+        self.staleness_exponent = staleness_exponent
+        self.server_learning_rate = server_learning_rate
+        self.version = 0
+        self.global_weights = None
+        # Base weights still referenced by in-flight clients: version -> [vector, refcount]
+        self._bases = {}
+        self._buffer = None
+        self._buffered = 0
+        self.updates_applied = 0
+        self.staleness_histogram = {}
+        self._start_time = None
+        self._current = (None, None)
+
+    def start(self, parameters):
+        self.global_weights = np.array(parameters_vector(parameters), dtype=np.float32)
+        self._buffer = np.zeros(self.global_weights.shape, dtype=np.float64)
+        self._start_time = time.perf_counter()
+        self._current = (None, None)
+
+    def current_parameters(self):
+        # Serialized once per global step and shared by every client dispatched at it
+        if self._current[0] != self.version:
+            self._current = (self.version, ndarrays_to_parameters([self.global_weights]))
+        return self._current[1]
+
+    def dispatch(self, client):
+        """Return ``(version, FitIns)`` for a client about to start training."""
+        base = self._bases.get(self.version)
+        if base is None:
+            self._bases[self.version] = [self.global_weights.copy(), 1]
+        else:
+            base[1] += 1
+        config = {}
+        if self.on_fit_config_fn is not None:
+            config = self.on_fit_config_fn(self.version + 1)
+        config["codec"] = self.codec.name
+        parameters = self.current_parameters()
+        config["weights_id"] = self.weights_id(parameters)
+        self._bytes_down += parameters_bytes(parameters)
+        return self.version, FitIns(parameters, config)
+
+    def _release(self, version):
+        base = self._bases[version]
+        base[1] -= 1
+        if base[1] == 0:
+            del self._bases[version]
+
+    def discard(self, version):
+        """Forget a dispatch whose client failed."""
+        self._release(version)
+
+    def submit(self, client, version, fit_res):
+        """Buffer one client update; returns True when it triggered a global step."""
+        self.privacy.observe(client.cid, fit_res.metrics)
+        staleness = self.version - version
+        self.staleness_histogram[staleness] = self.staleness_histogram.get(staleness, 0) + 1
+        weight = (1.0 + staleness) ** -self.staleness_exponent
+        base = self._bases[version][0]
+        self._buffer += weight * (self.update_vector(fit_res, base) - base)
+        self._release(version)
+        self._buffered += 1
+        if self._buffered < self.buffer_size:
+            return False
+
+        if self.server_opt is None:
+            self._buffer *= self.server_learning_rate / self._buffered
+            self.global_weights += self._buffer.astype(np.float32)
+        else:
+            self._buffer /= self._buffered
+            self.server_opt.step_delta(self.global_weights, self._buffer)
+        self._buffer.fill(0.0)
+        # Only updates that reached the global model count as applied
+        self.updates_applied += self._buffered
+        self._buffered = 0
+        self.version += 1
+        return True
+
+    def state_dict(self):
+        return {
+            **super().state_dict(),
+            "version": self.version,
+            "updates_applied": self.updates_applied,
+            "staleness_histogram": self.staleness_histogram,
+        }
+
+    def load_state_dict(self, state):
+        super().load_state_dict(state)
+        self.version = state["version"]
+        self.updates_applied = state["updates_applied"]
+        self.staleness_histogram = {int(k): v for k, v in state["staleness_histogram"].items()}
+
+    def throughput_metrics(self):
+        """Updates applied per second, mean staleness and the staleness histogram."""
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        total = sum(self.staleness_histogram.values())
+        mean_staleness = (sum(t * c for t, c in self.staleness_histogram.items()) / total
+                          if total else 0.0)
+        return {
+            "updates_applied": self.updates_applied,
+            "updates_per_sec": self.updates_applied / elapsed if elapsed > 0 else 0.0,
+            "mean_staleness": mean_staleness,
+            "staleness_histogram": dict(sorted(self.staleness_histogram.items())),
+            **self.transport_metrics(),
+        }
@@ -0,0 +1,99 @@
+"""
+Structured telemetry.
+
+Every process appends its events to ``<FL_TELEMETRY_DIR>/<name>.jsonl``, one
+JSON object per line (``server.jsonl``, ``clients.jsonl``). Events are
+buffered in memory and written in batches with a single append, so recording
+costs a dict and a list append. Each event has ``event``, ``time`` (Unix
+seconds) and ``pid`` fields; the rest depend on the event:
+
+- ``client_fit`` (server): round, cid, client_id, num_examples, bytes_up,
+  round_trip (dispatch to result), queue_wait (result to aggregation),
+  network_time (round trip minus the client's own timings), plus the
+  client-reported fit_time, serialize_time and deserialize_time
+- ``round`` (server): round, clients, failures, fit_time, aggregate_time,
+  evaluate_time, client_evaluate_time, checkpoint_time, bytes_up,
+  bytes_down, loss, accuracy
+- ``fit`` / ``evaluate`` (clients): round, client_id and the client-side
+  timings, loss, accuracy and epsilon
+
+Set ``FL_TELEMETRY_DIR`` to an empty string to turn telemetry off.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+TELEMETRY_DIR = os.environ.get("FL_TELEMETRY_DIR", "telemetry")
+
+
+class Telemetry:
+    """Buffered, append-only JSONL event log (a no-op when ``path`` is None)."""
+
+    def __init__(self, path=None, flush_every=64):
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def record(self, event, **fields):
+        if self.path is None:
+            return
+        fields["event"] = event
+        fields["time"] = time.time()
+        fields["pid"] = self._pid
+        with self._lock:
+            self._buffer.append(fields)
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+        lines = "".join(json.dumps(record, default=float) + "\n" for record in records)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+
+_instances = {}
+
+
+def get_telemetry(name, directory=None):
+    """Process-wide telemetry writing to ``<directory>/<name>.jsonl``, flushed at exit."""
+    directory = TELEMETRY_DIR if directory is None else directory
+    key = (name, directory)
+    if key not in _instances:
+        path = os.path.join(directory, f"{name}.jsonl") if directory else None
+        telemetry = _instances[key] = Telemetry(path)
+        atexit.register(telemetry.flush)
+    return _instances[key]
+
+
+def read_events(directory=None, event=None):
+    """All events recorded under ``directory`` (optionally of one type), in time order."""
+    directory = TELEMETRY_DIR if directory is None else directory
+    events = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path) as f:
+            for line in f:
+                # A process killed mid-write can leave a truncated last line
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if event is None or record.get("event") == event:
+                    events.append(record)
+    events.sort(key=lambda record: record["time"])
+    return events
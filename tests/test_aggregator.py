@@ -0,0 +1,50 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from flwr.common import EvaluateIns, FitIns, ndarrays_to_parameters
+
+import aggregator
+from aggregator import EdgeClient, EdgeRoundError
+
+
+class EmptyEdge:
+    """An edge server whose rounds return no client results."""
+
+    strategy = SimpleNamespace(privacy=SimpleNamespace(epsilons={}))
+
+    def __init__(self):
+        self.closed = False
+
+    def submit(self, kind, parameters, config):
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+def test_empty_edge_round_fails():
+    client = EdgeClient(0, EmptyEdge())
+    parameters = ndarrays_to_parameters([np.zeros(4, dtype=np.float32)])
+    with pytest.raises(EdgeRoundError, match="no client results to fit round 3"):
+        client.fit(FitIns(parameters, {"server_round": 3}))
+    with pytest.raises(EdgeRoundError, match="no client results to evaluate"):
+        client.evaluate(EvaluateIns(parameters, {"server_round": 3}))
+
+
+def test_edge_reconnects_after_a_failed_round(monkeypatch):
+    calls = []
+
+    def start_client(server_address, client):
+        calls.append(server_address)
+        if len(calls) == 1:
+            raise EdgeRoundError("no client results")
+
+    monkeypatch.setattr(aggregator.fl.client, "start_client", start_client)
+    server = EmptyEdge()
+    aggregator.connect_upstream("localhost:8080", EdgeClient(0, server), server)
+    assert calls == ["localhost:8080", "localhost:8080"]
+    assert server.closed
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+from flwr.server import History
+
+from checkpoint import LATEST, CheckpointManager
+
+
+def rounds_on_disk(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("round_"))
+
+
+def test_save_and_load(tmp_path):
+    manager = CheckpointManager(str(tmp_path))
+    history = History()
+    history.add_loss_centralized(server_round=1, loss=0.5)
+    weights = np.arange(10, dtype=np.float32)
+    manager.save(1, weights, {"server_opt_m": np.ones(10, dtype=np.float32), "steps": 3}, history)
+
+    checkpoint = CheckpointManager(str(tmp_path)).load()
+    assert checkpoint.server_round == 1
+    assert isinstance(checkpoint.weights, np.memmap)
+    np.testing.assert_array_equal(checkpoint.weights, weights)
+    np.testing.assert_array_equal(checkpoint.state["server_opt_m"], 1.0)
+    assert checkpoint.state["steps"] == 3
+    assert checkpoint.history["losses_centralized"] == [[1, 0.5]]
+
+
+def test_resaving_a_round_never_leaves_latest_dangling(tmp_path):
+    manager = CheckpointManager(str(tmp_path))
+    first = manager.save(2, np.zeros(4), {}, History())
+    second = manager.save(2, np.ones(4), {}, History())
+    assert first != second and not os.path.exists(first)
+    with open(tmp_path / LATEST) as f:
+        assert os.path.join(str(tmp_path), f.read()) == second
+    np.testing.assert_array_equal(manager.load().weights, 1.0)
+
+
+def test_prune_keeps_newest(tmp_path):
+    manager = CheckpointManager(str(tmp_path), keep=2)
+    paths = [manager.save(r, np.zeros(4), {}, History()) for r in range(1, 5)]
+    assert rounds_on_disk(tmp_path) == [os.path.basename(p) for p in paths[-2:]]
+    assert manager.latest() == paths[-1]
+
+
+def test_maybe_save_skips_saved_round(tmp_path):
+    manager = CheckpointManager(str(tmp_path), every=2)
+    assert manager.maybe_save(1, np.zeros(4), {}, History()) is None
+    assert manager.maybe_save(2, np.zeros(4), {}, History()) is not None
+    # The final save of a round that was just checkpointed is not written again
+    assert manager.maybe_save(2, np.zeros(4), {}, History(), final=True) is None
+    assert len(rounds_on_disk(tmp_path)) == 1
+
+    # Nor is the round a resumed run starts from
+    resumed = CheckpointManager(str(tmp_path), every=2)
+    resumed.load()
+    assert resumed.maybe_save(2, np.zeros(4), {}, History(), final=True) is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from codec import TopKDeltaCodec, make_codec, payload_bytes
+
+
+@pytest.fixture
+def weights():
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal(1000).astype(np.float32)
+    return reference + 0.01 * rng.standard_normal(1000).astype(np.float32), reference
+
+
+@pytest.mark.parametrize("spec", ["none", "delta"])
+def test_lossless_round_trip(weights, spec):
+    trained, reference = weights
+    codec = make_codec(spec)
+    np.testing.assert_allclose(codec.decode(codec.encode(trained, reference), reference),
+                               trained, atol=1e-6)
+
+
+@pytest.mark.parametrize("spec, ratio", [("q8", 0.3), ("q4", 0.2)])
+def test_quantized_round_trip(weights, spec, ratio):
+    trained, reference = weights
+    codec = make_codec(spec)
+    arrays = codec.encode(trained, reference)
+    assert payload_bytes(arrays) < ratio * trained.nbytes
+    _, _, scale = arrays
+    decoded = codec.decode(arrays, reference)
+    assert decoded.shape == trained.shape
+    # Every value lands on one of the two levels around it
+    assert np.all(np.abs(decoded - trained) <= scale.max() + 1e-6)
+
+
+def test_quantization_is_unbiased(weights):
+    trained, reference = weights
+    codec = make_codec("q4")
+    mean = np.mean([codec.decode(codec.encode(trained, reference), reference)
+                    for _ in range(400)], axis=0)
+    scale = codec.encode(trained, reference)[2].max()
+    assert np.abs(mean - trained).max() < 0.25 * scale
+
+
+def test_topk_sends_the_largest_entries(weights):
+    trained, reference = weights
+    codec = make_codec("topk:0.05")
+    indices, values = codec.encode(trained, reference)
+    assert len(indices) == 50
+    delta = trained - reference
+    assert np.abs(values).min() >= np.sort(np.abs(delta))[-50] - 1e-7
+    decoded = codec.decode([indices, values], reference)
+    np.testing.assert_allclose(decoded[indices], trained[indices], atol=1e-6)
+    untouched = np.setdiff1d(np.arange(delta.size), indices)
+    np.testing.assert_array_equal(decoded[untouched], reference[untouched])
+
+
+def test_topk_error_feedback_conserves_the_update():
+    rng = np.random.default_rng(1)
+    reference = np.zeros(500, dtype=np.float32)
+    codec = TopKDeltaCodec(0.02)
+    total_update = np.zeros(500, dtype=np.float32)
+    total_sent = np.zeros(500, dtype=np.float32)
+    for _ in range(10):
+        update = rng.standard_normal(500).astype(np.float32)
+        total_update += update
+        indices, values = codec.encode(reference + update, reference)
+        total_sent[indices] += values
+    # What was not sent is still owed in the residual
+    np.testing.assert_allclose(total_sent + codec._residual, total_update, atol=1e-4)
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        make_codec("zip")
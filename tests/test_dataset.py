@@ -0,0 +1,29 @@
+import numpy as np
+
+from dataset import DatasetLoader
+from partitioner import iid_plan
+
+
+def make_loader(rows=120):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((rows, 13)).astype(np.float32)
+    y = (rng.random(rows) < 0.5).astype(np.float32)
+    return DatasetLoader.from_arrays(X, y)
+
+
+def test_default_plan_shares_one_partition():
+    loader = make_loader()
+    X_train, _, _, _ = loader.load_data(0, 3)
+    loader.held_out(3)
+    loader.load_data(1, 3, plan=iid_plan(120, 3, 42))
+    assert len(loader._partitions) == 1
+    # Client splits are views into the cached reordered copy
+    assert np.shares_memory(X_train, loader.partition(3)[1])
+
+
+def test_held_out_is_every_test_split():
+    loader = make_loader()
+    X, y = loader.held_out(4)
+    tests = [loader.load_data(client_id, 4) for client_id in range(4)]
+    np.testing.assert_array_equal(X, np.concatenate([t[2] for t in tests]))
+    np.testing.assert_array_equal(y, np.concatenate([t[3] for t in tests]))
@@ -0,0 +1,34 @@
+import functools
+import os
+
+import numpy as np
+
+from dataset import DatasetLoader
+from executor import THREAD_VARS, ProcessPoolClientExecutor, _thread_limits
+from simulation import Simulation, build_flat_model
+
+
+def test_thread_limits_are_restored():
+    before = {var: os.environ.get(var) for var in THREAD_VARS}
+    with _thread_limits(3):
+        assert all(os.environ[var] == "3" for var in THREAD_VARS)
+    assert {var: os.environ.get(var) for var in THREAD_VARS} == before
+
+
+def test_pool_trains_on_the_simulation_loader():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((80, 13)).astype(np.float32)
+    y = (rng.random(80) < 0.5).astype(np.float32)
+    model_fn = functools.partial(build_flat_model, "numpy", dp=False, seed=0)
+    executor = ProcessPoolClientExecutor(num_workers=2)
+    sim = Simulation(4, model_fn=model_fn, epochs=1, loader=DatasetLoader.from_arrays(X, y),
+                     executor=executor)
+    try:
+        # Workers start with the limits set in the parent, before BLAS loads
+        threads = str(max(1, (os.cpu_count() or 1) // 2))
+        assert executor.pool.apply(os.getenv, ("OMP_NUM_THREADS",)) == threads
+        losses, _ = sim.fit_round(np.arange(4))
+        assert np.isfinite(losses).all()
+        assert not np.allclose(sim.client_states, sim.global_weights)
+    finally:
+        sim.close()
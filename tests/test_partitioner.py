@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from dataset import DatasetLoader
+from partitioner import PartitionPlan, build_plan
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((200, 13)).astype(np.float32)
+    y = (rng.random(200) < 0.4).astype(np.float32)
+    return X, y
+
+
+@pytest.mark.parametrize("strategy", ["iid", "dirichlet", "quantity", "feature_shift"])
+def test_plan_covers_every_row_once(data, strategy):
+    _, y = data
+    plan = build_plan(strategy, y, 4)
+    assert np.array_equal(np.sort(plan.order), np.arange(len(y)))
+    assert plan.offsets[0] == 0 and plan.offsets[-1] == len(y)
+    assert np.all(plan.num_train <= plan.sizes)
+
+
+def test_feature_shift_digest_differs_from_iid(data):
+    X, y = data
+    iid = build_plan("iid", y, 4)
+    shifted = build_plan("feature_shift", y, 4)
+    assert np.array_equal(iid.order, shifted.order)
+    assert iid.digest != shifted.digest
+
+    # One loader caches partitions by digest: the shifted plan must not get the IID arrays
+    loader = DatasetLoader.from_arrays(X, y)
+    iid_train = loader.load_data(1, 4, plan=iid)[0]
+    shifted_train = loader.load_data(1, 4, plan=shifted)[0]
+    assert not np.allclose(iid_train, shifted_train)
+    np.testing.assert_allclose(
+        shifted_train, iid_train * shifted.feature_scale[1] + shifted.feature_shift[1], rtol=1e-6)
+
+
+def test_plan_is_read_only(data):
+    _, y = data
+    plan = build_plan("feature_shift", y, 4)
+    before = plan.digest
+    for array in (plan.order, plan.offsets, plan.num_train, plan.feature_scale, plan.feature_shift):
+        with pytest.raises(ValueError):
+            array[0] += 1
+    assert plan.digest == before
+
+
+def test_plan_does_not_freeze_caller_arrays():
+    order = np.arange(10)
+    PartitionPlan(order, [0, 10], [8])
+    order[0] = 1
+
+
+def test_save_load_round_trip(data, tmp_path):
+    _, y = data
+    plan = build_plan("feature_shift", y, 4)
+    path = tmp_path / "plan.npz"
+    plan.save(path)
+    loaded = PartitionPlan.load(path)
+    assert loaded.digest == plan.digest
+    assert loaded.meta == plan.meta
+
+
+def test_dirichlet_is_seeded(data):
+    _, y = data
+    assert build_plan("dirichlet", y, 4, seed=3).digest == build_plan("dirichlet", y, 4, seed=3).digest
+    assert build_plan("dirichlet", y, 4, seed=3).digest != build_plan("dirichlet", y, 4, seed=4).digest
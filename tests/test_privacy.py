@@ -0,0 +1,81 @@
+import math
+import time
+
+import numpy as np
+import pytest
+from flwr.common import Code, FitRes, Status, ndarrays_to_parameters
+
+from privacy import ORDERS, PrivacyBudget, RDPAccountant, rdp_to_epsilon, step_rdp
+from scheduler import ScheduledClientManager
+from servers import StreamingServer
+from strategy import StreamingFedAvg
+
+
+def test_full_batch_rdp_is_gaussian_mechanism():
+    # Without subsampling the RDP of the Gaussian mechanism is alpha / (2 sigma^2)
+    np.testing.assert_allclose(step_rdp(1.0, 2.0), np.array(ORDERS) / 8.0)
+
+
+def test_subsampled_rdp_matches_binomial_expansion():
+    q, sigma = 0.01, 1.1
+    curve = step_rdp(q, sigma)
+    for i, alpha in enumerate(ORDERS[:6]):
+        a = sum(math.comb(alpha, k) * (1 - q) ** (alpha - k) * q ** k
+                * math.exp((k * k - k) / (2 * sigma ** 2)) for k in range(alpha + 1))
+        assert curve[i] == pytest.approx(math.log(a) / (alpha - 1), rel=1e-9)
+
+
+def test_epsilon_matches_tensorflow_privacy_mnist_tutorial():
+    # 60 epochs over 60000 examples, batch 256, noise 1.1, delta 1e-5: tensorflow-privacy
+    # reports epsilon = 3.01 with the classic conversion min(rdp - log(delta) / (alpha - 1))
+    accountant = RDPAccountant(1.1)
+    accountant.step(256 / 60000, 60 * 60000 // 256)
+    orders = np.array(ORDERS, dtype=np.float64)
+    assert np.min(accountant.rdp - np.log(1e-5) / (orders - 1)) == pytest.approx(3.01, abs=0.01)
+    # The tighter conversion used for reporting is never larger
+    assert accountant.epsilon <= 3.01
+
+
+def test_incremental_accounting_matches_one_shot():
+    incremental = RDPAccountant(0.8)
+    for _ in range(5):
+        incremental.step_epochs(300, 32, 3)
+    one_shot = RDPAccountant(0.8)
+    one_shot.step(32 / 300, 5 * 3 * math.ceil(300 / 32))
+    np.testing.assert_allclose(incremental.rdp, one_shot.rdp)
+    assert incremental.epsilon == pytest.approx(rdp_to_epsilon(one_shot.rdp, 1e-5))
+
+
+def test_budget_never_decreases():
+    budget = PrivacyBudget(max_epsilon=2.0)
+    budget.observe("a", {"epsilon": 2.5})
+    budget.observe("a", {"epsilon": 1.0})
+    assert budget.epsilons["a"] == 2.5 and budget.exhausted("a")
+    assert budget.num_exhausted == 1
+
+
+class SleepyClient:
+    def __init__(self, cid, delay, epsilon):
+        self.cid = cid
+        self.delay = delay
+        self.epsilon = epsilon
+
+    def fit(self, ins, timeout=None, group_id=None):
+        time.sleep(self.delay)
+        return FitRes(status=Status(Code.OK, ""), parameters=ins.parameters, num_examples=10,
+                      metrics={"epsilon": self.epsilon})
+
+
+def test_stragglers_spend_privacy():
+    manager = ScheduledClientManager(seed=0)
+    manager.register(SleepyClient("fast", 0.0, 1.0))
+    manager.register(SleepyClient("slow", 0.5, 3.0))
+    strategy = StreamingFedAvg(max_epsilon=2.0, min_fit_clients=2, min_available_clients=2)
+    server = StreamingServer(client_manager=manager, strategy=strategy, round_deadline=0.1)
+    server.parameters = ndarrays_to_parameters([np.zeros(4, dtype=np.float32)])
+
+    server.fit_round(server_round=1, timeout=None)
+    assert "slow" not in strategy.privacy.epsilons
+    time.sleep(1.0)
+    assert strategy.privacy.epsilons == {"fast": 1.0, "slow": 3.0}
+    assert strategy.privacy.exhausted("slow")
@@ -0,0 +1,50 @@
+import numpy as np
+from flwr.common import ndarrays_to_parameters
+
+from privacy import PrivacyBudget
+from scheduler import ScheduledClientManager
+from strategy import FlatFedAvg
+
+
+class FakeClient:
+    def __init__(self, cid):
+        self.cid = cid
+
+
+def manager_with(num_clients, **kwargs):
+    manager = ScheduledClientManager(seed=0, **kwargs)
+    for i in range(num_clients):
+        manager.register(FakeClient(str(i)))
+    return manager
+
+
+def test_uniform_sample_is_distinct():
+    manager = manager_with(50)
+    cohort = manager.sample(10)
+    assert len({client.cid for client in cohort}) == 10
+
+
+def test_privacy_budget_counts_exhausted_clients():
+    budget = PrivacyBudget(max_epsilon=1.0)
+    budget.observe("a", {"epsilon": 0.5})
+    budget.observe("b", {"epsilon": 1.5})
+    budget.observe("a", {"epsilon": 1.2})
+    budget.observe("b", {"epsilon": 2.0})
+    assert budget.num_exhausted == 2
+    assert PrivacyBudget().num_exhausted == 0
+
+
+def test_cohort_skips_exhausted_clients():
+    manager = manager_with(10)
+    strategy = FlatFedAvg(max_epsilon=1.0, fraction_fit=1.0, min_fit_clients=1,
+                          min_available_clients=1)
+    for cid in ("0", "3", "7"):
+        strategy.privacy.observe(cid, {"epsilon": 5.0})
+    parameters = ndarrays_to_parameters([np.zeros(4, dtype=np.float32)])
+    instructions = strategy.configure_fit(1, parameters, manager)
+    cids = {client.cid for client, _ in instructions}
+    assert len(cids) == 7 and not cids & {"0", "3", "7"}
+
+    for cid in map(str, range(10)):
+        strategy.privacy.observe(cid, {"epsilon": 5.0})
+    assert strategy.configure_fit(2, parameters, manager) == []
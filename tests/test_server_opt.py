@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from server_opt import CHUNK_SIZE, FedAdam, FedYogi, make_server_optimizer
+from strategy import FedBuff, FlatFedAvg
+
+
+def reference_step(opt, weights, target, m, v):
+    """One unchunked step with NumPy temporaries."""
+    delta = target - weights
+    m = opt.beta_1 * m + (1 - opt.beta_1) * delta
+    if isinstance(opt, FedYogi):
+        v = v - (1 - opt.beta_2) * delta ** 2 * np.sign(v - delta ** 2)
+    else:
+        v = opt.beta_2 * v + (1 - opt.beta_2) * delta ** 2
+    return weights + opt.learning_rate * m / (np.sqrt(v) + opt.tau), m, v
+
+
+@pytest.mark.parametrize("cls", [FedAdam, FedYogi])
+def test_chunked_step_matches_reference(cls):
+    rng = np.random.default_rng(0)
+    size = 2 * CHUNK_SIZE + 123
+    weights = rng.standard_normal(size).astype(np.float32)
+    opt = cls()
+    m, v = np.zeros(size), np.zeros(size)
+    for _ in range(3):
+        target = weights + 0.1 * rng.standard_normal(size).astype(np.float32)
+        expected, m, v = reference_step(opt, weights.astype(np.float64), target, m, v)
+        weights = opt.step(weights, target)
+        np.testing.assert_allclose(weights, expected, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(opt.state["v"], v, rtol=1e-4, atol=1e-7)
+
+
+def test_async_default_learning_rate():
+    assert make_server_optimizer("yogi").learning_rate == 0.1
+    assert make_server_optimizer("yogi", asynchronous=True).learning_rate == 0.01
+    assert make_server_optimizer("yogi", 0.3, asynchronous=True).learning_rate == 0.3
+    assert make_server_optimizer("avgm", asynchronous=True).learning_rate == 1.0
+    assert FedBuff(server_opt="adam").server_opt.learning_rate == 0.01
+    assert FlatFedAvg(server_opt="adam").server_opt.learning_rate == 0.1
@@ -0,0 +1,19 @@
+import pytest
+
+from servers import fit_client
+
+
+class RaisingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def fit(self, ins, timeout=None, group_id=None):
+        self.calls += 1
+        raise TypeError("bad config")
+
+
+def test_fit_client_does_not_retry_on_type_error():
+    client = RaisingClient()
+    with pytest.raises(TypeError, match="bad config"):
+        fit_client(client, None, None, 1)
+    assert client.calls == 1
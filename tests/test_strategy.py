@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+import numpy as np
+from flwr.common import Code, FitRes, Status, ndarrays_to_parameters
+
+from strategy import FedBuff
+
+
+def fit_res(weights):
+    return FitRes(status=Status(Code.OK, ""), parameters=ndarrays_to_parameters([weights]),
+                  num_examples=10, metrics={})
+
+
+def test_fedbuff_counts_only_applied_updates():
+    strategy = FedBuff(buffer_size=3)
+    strategy.start(ndarrays_to_parameters([np.zeros(4, dtype=np.float32)]))
+    for i in range(5):
+        client = SimpleNamespace(cid=str(i))
+        version, _ = strategy.dispatch(client)
+        stepped = strategy.submit(client, version, fit_res(np.ones(4, dtype=np.float32)))
+        assert stepped == (i == 2)
+        assert strategy.updates_applied == (3 if i >= 2 else 0)
+    assert strategy.version == 1
+
+    resumed = FedBuff(buffer_size=3)
+    resumed.load_state_dict(strategy.state_dict())
+    assert resumed.updates_applied == 3
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from trainer import CompiledTrainer
+
+
+class DPKerasAdamOptimizer:
+    _num_microbatches = 8
+
+
+class FakeModel:
+    trainable_variables = []
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+
+
+def test_dp_batch_is_a_multiple_of_microbatches():
+    trainer = CompiledTrainer(FakeModel(DPKerasAdamOptimizer()))
+    assert trainer.dp and trainer.num_microbatches == 8
+    assert trainer.batch_size(1000, 32) == 32
+    assert trainer.batch_size(1000, 30) == 24
+    # Small clients: all rows, rounded down to a multiple of the microbatches
+    assert trainer.batch_size(21, 32) == 16
+    assert trainer.batch_size(8, 32) == 8
+
+
+def test_dp_rejects_clients_smaller_than_one_batch():
+    trainer = CompiledTrainer(FakeModel(DPKerasAdamOptimizer()))
+    with pytest.raises(ValueError, match="at least one full batch"):
+        trainer.batch_size(5, 32)
+
+
+def test_non_dp_batch_is_capped_by_rows():
+    trainer = CompiledTrainer(FakeModel(object()))
+    assert not trainer.dp
+    assert trainer.batch_size(21, 32) == 21
+
+
+def test_tensor_cache_key_matches_fresh_views():
+    data = np.arange(40, dtype=np.float32).reshape(10, 4)
+    assert CompiledTrainer._key(data[2:6]) == CompiledTrainer._key(data[2:6])
+    assert CompiledTrainer._key(data[2:6]) != CompiledTrainer._key(data[3:7])
+    assert CompiledTrainer._key(data[2:6]) != CompiledTrainer._key(data[2:6].copy())
+
+
+def test_compiled_loop_matches_model_fit():
+    tf = pytest.importorskip("tensorflow")
+    from models import create_keras_model
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(64, 13)).astype(np.float32)
+    y = (rng.random(64) < 0.5).astype(np.float32)
+    fitted, compiled = (create_keras_model(dp=False, seed=0) for _ in range(2))
+    np.testing.assert_array_equal(fitted.get_weights()[0], compiled.get_weights()[0])
+
+    # One full batch per epoch: both loops take the same steps whatever the shuffle
+    history = fitted.fit(X, y, epochs=3, batch_size=len(X), verbose=0)
+    loss = CompiledTrainer(compiled).train(X, y, epochs=3, batch_size=len(X))
+    assert loss == pytest.approx(history.history["loss"][-1], rel=1e-4)
+    for expected, actual in zip(fitted.get_weights(), compiled.get_weights()):
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-6)
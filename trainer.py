@@ -0,0 +1,118 @@
+"""
+Compiled local training for Keras client models.
+
+Keras ``model.fit`` rebuilds a data adapter, callbacks and progress
+bookkeeping on every call, which dominates a round's training on the few
+hundred rows a client holds. ``CompiledTrainer`` traces one ``tf.function``
+per model that runs *all* local epochs: every epoch draws a random
+permutation in-graph, reshapes it into full batches and applies one
+optimizer step per batch, so a round is a single call into TensorFlow. The
+training data is converted to tensors once and cached across rounds.
+With ``jit_compile`` (``FL_XLA=1``) the loop is compiled with XLA.
+
+Differences from ``model.fit``: the last partial batch of each epoch is
+dropped (the permutation changes every epoch, so every example is still
+used), which also keeps batch shapes static for XLA and for DP optimizers,
+which need the batch to split into microbatches. With a DP optimizer the
+batch size is rounded down to a multiple of the microbatch count; a client
+with fewer rows than microbatches cannot form one full batch and is
+rejected, since repeating its rows would put each example into a clipped,
+noised step more than once. DP optimizers compute their clipped, noised gradients from the
+per-example losses as in ``model.fit``.
+"""
+
+import numpy as np
+
+
+class CompiledTrainer:
+    """Runs a compiled Keras model's local epochs in one traced call."""
+
+    def __init__(self, model, jit_compile=False):
+        from models import NUM_MICROBATCHES, is_dp_model
+
+        self.model = model
+        self.optimizer = model.optimizer
+        self.dp = is_dp_model(model)
+        self.num_microbatches = getattr(self.optimizer, "_num_microbatches", None) or NUM_MICROBATCHES
+        self.jit_compile = jit_compile
+        self._variables = model.trainable_variables
+        if hasattr(self.optimizer, "build"):
+            # Create the optimizer slots outside the traced function
+            self.optimizer.build(self._variables)
+        self._functions = {}
+        self._data = None
+
+    @staticmethod
+    def _key(array):
+        # Same memory, shape and layout: callers may pass a fresh view of the same rows
+        # every round. The cache keeps the arrays referenced, so their memory is not reused
+        interface = array.__array_interface__
+        return interface["data"][0], array.shape, array.strides, array.dtype.str
+
+    def _tensors(self, X, y):
+        import tensorflow as tf
+
+        # A client trains on the same rows every round: convert them once
+        key = (self._key(X), self._key(y))
+        if self._data is None or self._data[0] != key:
+            self._data = (key, X, y, tf.constant(X, dtype=tf.float32),
+                          tf.constant(np.reshape(y, (-1, 1)), dtype=tf.float32))
+        return self._data[3], self._data[4]
+
+    def batch_size(self, num_rows, batch_size):
+        """Batch size actually used for ``num_rows`` rows."""
+        # Fewer rows than a batch: train on all of them as one batch
+        batch_size = min(batch_size, num_rows)
+        if self.dp:
+            # DP optimizers split every batch into num_microbatches equal parts
+            if num_rows < self.num_microbatches:
+                raise ValueError(f"DP training needs at least one full batch of {self.num_microbatches} "
+                                 f"rows (one per microbatch); the client has {num_rows}")
+            batch_size -= batch_size % self.num_microbatches
+        return batch_size
+
+    def _step(self, xb, yb):
+        import tensorflow as tf
+
+        with tf.GradientTape() as tape:
+            probs = self.model(xb, training=True)
+            losses = tf.keras.losses.binary_crossentropy(yb, probs)
+        if self.dp:
+            # The DP optimizer clips and noises per-example (microbatch) gradients of the vector loss
+            self.optimizer.minimize(losses, self._variables, tape=tape)
+        else:
+            gradients = tape.gradient(tf.reduce_mean(losses), self._variables)
+            self.optimizer.apply_gradients(zip(gradients, self._variables))
+        return tf.reduce_mean(losses)
+
+    def _function(self, epochs, batch_size):
+        """Traced loop for ``epochs`` x full batches of ``batch_size``, any number of rows."""
+        import tensorflow as tf
+
+        key = (epochs, batch_size)
+        if key in self._functions:
+            return self._functions[key]
+
+        @tf.function(jit_compile=self.jit_compile, reduce_retracing=True)
+        def train(X, y):
+            n = tf.shape(X)[0]
+            steps = n // batch_size
+            epoch_loss = tf.constant(0.0)
+            for _ in tf.range(epochs):
+                order = tf.argsort(tf.random.uniform([n]))
+                batches = tf.reshape(order[:steps * batch_size], [steps, batch_size])
+                epoch_loss = tf.constant(0.0)
+                for step in tf.range(steps):
+                    indices = batches[step]
+                    epoch_loss += self._step(tf.gather(X, indices), tf.gather(y, indices))
+            return epoch_loss / tf.cast(steps, tf.float32)
+
+        self._functions[key] = train
+        return train
+
+    def train(self, X, y, epochs, batch_size):
+        """Run ``epochs`` local epochs and return the mean loss of the last one."""
+        X, y = np.asarray(X), np.asarray(y)
+        batch_size = self.batch_size(len(X), batch_size)
+        X, y = self._tensors(X, y)
+        return float(self._function(epochs, batch_size)(X, y))